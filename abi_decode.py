@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Batch ABI decoding of static calldata, return data, log data and topics.
+
+decode() turns a list of hex payloads (or raw bytes) into one NumPy
+structured array in a single pass: the payloads are joined and parsed with
+one bytes.fromhex() and viewed through a dtype with one field per 32-byte
+word. uint256/int256 words become four big-endian uint64 limbs, addresses
+20 fixed bytes. as_float / as_ints / as_addresses turn fields back into
+plain Python values without per-item int(x, 16).
+
+columns() is the convenience entry point the scripts use: {name: list} for
+a batch, plus a "valid" list (payload long enough). It needs no NumPy:
+small batches, or hosts without NumPy, take the equivalent scalar path.
+
+    cols = columns([log["data"] for log in logs],
+                   [("token_id", "uint256"), ("value", "uint256"), ("ts", "uint256")],
+                   decimals={"value": 18})
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+WORD = 32
+VECTOR_MIN = 64  # below this many payloads the scalar path is faster
+LIMB = {"uint256", "int256"}
+SIGNED = {"int256"}
+
+
+def _hex(payload):
+    """Payload as a hex string without 0x ('' for None)."""
+    if not payload:
+        return ""
+    if isinstance(payload, (bytes, bytearray)):
+        return payload.hex()
+    return payload[2:] if payload.startswith("0x") else payload
+
+
+def _body(payloads, skip, size):
+    """(bytes of size per payload, valid flags); short payloads are zero-padded."""
+    start, width = 2 * skip, 2 * size
+    chunks, valid = [], []
+    for payload in payloads:
+        body = _hex(payload)[start:start + width]
+        valid.append(len(body) == width)
+        chunks.append(body.ljust(width, "0"))
+    return bytes.fromhex("".join(chunks)), valid
+
+
+def dtype_for(types):
+    """Structured dtype over consecutive words; `types` is [(name, abi_type) or None]
+    (None = a word that must be present but is not decoded)."""
+    names, formats, offsets = [], [], []
+    for i, entry in enumerate(types):
+        if entry is None:
+            continue
+        name, abi_type = entry
+        names.append(name)
+        if abi_type in LIMB:
+            formats.append((">u8", (4,)))
+            offsets.append(i * WORD)
+        elif abi_type == "address":
+            formats.append(("u1", (20,)))
+            offsets.append(i * WORD + 12)
+        elif abi_type == "bytes32":
+            formats.append(("u1", (32,)))
+            offsets.append(i * WORD)
+        else:
+            raise ValueError(f"unsupported ABI type {abi_type!r}")
+    return np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": WORD * len(types)})
+
+
+def decode(payloads, types, skip=0):
+    """(structured array with one record per payload, bool array of payloads
+    long enough). `skip` bytes (e.g. 4 for a selector) are dropped first."""
+    raw, valid = _body(payloads, skip, WORD * len(types))
+    return np.frombuffer(raw, dtype=dtype_for(types)), np.array(valid, dtype=bool)
+
+
+def _negate(limbs):
+    """Two's complement of (N, 4) uint64 limbs."""
+    out = ~limbs
+    carry = np.ones(len(out), dtype=bool)
+    for i in range(3, -1, -1):
+        out[:, i] += carry.astype(np.uint64)
+        carry &= out[:, i] == 0
+    return out
+
+
+def as_float(limbs, decimals=0, signed=False):
+    """float64 array of a uint256/int256 field, divided by 10**decimals."""
+    limbs = limbs.astype(np.uint64)
+    negative = np.zeros(len(limbs), dtype=bool)
+    if signed:
+        negative = limbs[:, 0] >= np.uint64(1 << 63)
+        limbs[negative] = _negate(limbs[negative])
+    value = np.zeros(len(limbs))
+    for i in range(4):
+        value = value * 2.0 ** 64 + limbs[:, i].astype(np.float64)
+    value = np.where(negative, -value, value)
+    return value / 10 ** decimals if decimals else value
+
+
+def as_ints(limbs, signed=False):
+    """Exact Python ints of a uint256/int256 field."""
+    limbs = limbs.astype(np.uint64)
+    if not signed and not limbs[:, :3].any():
+        return limbs[:, 3].tolist()
+    out = []
+    for a, b, c, d in limbs.tolist():
+        value = (((a << 64 | b) << 64 | c) << 64) | d
+        out.append(value - (1 << 256) if signed and a >> 63 else value)
+    return out
+
+
+def as_addresses(field):
+    """Lower-case 0x addresses of an address field."""
+    text = np.ascontiguousarray(field).tobytes().hex()
+    return ["0x" + text[i:i + 40] for i in range(0, len(text), 40)]
+
+
+def _scalar_columns(payloads, types, skip, decimals):
+    size = WORD * len(types)
+    cols = {entry[0]: [] for entry in types if entry}
+    cols["valid"] = []
+    for payload in payloads:
+        body = _hex(payload)[2 * skip:2 * (skip + size)]
+        cols["valid"].append(len(body) == 2 * size)
+        body = body.ljust(2 * size, "0")
+        for i, entry in enumerate(types):
+            if entry is None:
+                continue
+            name, abi_type = entry
+            word = body[64 * i:64 * (i + 1)]
+            if abi_type == "address":
+                value = "0x" + word[24:]
+            elif abi_type == "bytes32":
+                value = bytes.fromhex(word)
+            else:
+                value = int(word, 16)
+                if abi_type in SIGNED and value >> 255:
+                    value -= 1 << 256
+                if name in decimals:
+                    value /= 10.0 ** decimals[name]
+            cols[name].append(value)
+    return cols
+
+
+def columns(payloads, types, skip=0, decimals=None):
+    """{name: [value per payload]} plus "valid": [bool]. Integer fields are
+    exact ints, or floats divided by 10**decimals[name] when given; addresses
+    are lower-case hex; bytes32 fields are bytes. Short payloads are
+    zero-padded (and not valid)."""
+    decimals = decimals or {}
+    if np is None or len(payloads) < VECTOR_MIN:
+        return _scalar_columns(payloads, types, skip, decimals)
+    records, valid = decode(payloads, types, skip)
+    cols = {"valid": valid.tolist()}
+    for entry in types:
+        if entry is None:
+            continue
+        name, abi_type = entry
+        field = records[name]
+        if abi_type == "address":
+            cols[name] = as_addresses(field)
+        elif abi_type == "bytes32":
+            cols[name] = [bytes(row) for row in field]
+        elif name in decimals:
+            cols[name] = as_float(field, decimals[name], abi_type in SIGNED).tolist()
+        else:
+            cols[name] = as_ints(field, abi_type in SIGNED)
+    return cols
+
+
+def uints(payloads, decimals=0):
+    """First word of each payload as an unsigned number (float when decimals),
+    0 for empty payloads. Short quantities like "0x5" read as numbers."""
+    words = [_hex(p)[:64].rjust(64, "0") for p in payloads]
+    cols = columns(words, [("value", "uint256")], decimals={"value": decimals} if decimals else None)
+    return cols["value"]
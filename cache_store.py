@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+On-disk cache store for the data jobs (stdlib sqlite3, one file).
+
+Replaces the JSON caches that were rewritten in full on every checkpoint:
+  - locks: typed table keyed by veNFT token ID (locked() amount / end),
+  - kv:    JSON values by (namespace, key), e.g. early-exit receipts by tx hash,
+           plus small run metadata such as the lock-change checkpoint block,
+  - reads: eth_call results at a pinned block, keyed by (block, to, calldata)
+           — immutable, so a resumed run can reuse them (see snapshot.py),
+  - receipts: mined tx receipts by tx hash, logs stored compactly
+           (see receipt_store.py),
+  - logs:  event logs of a named getLogs scan in (block, log index) order
+           (see log_scanner.py).
+
+Upserts touch only their own rows; writes are batched in a transaction until
+commit(), so a checkpoint costs one fsync instead of a full-file rewrite.
+Existing JSON caches are imported once with migrate_locks_json() /
+migrate_json().
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DB = os.path.join(DATA_DIR, "cache.db")
+
+SQL_MAX_VARS = 900  # stay below SQLITE_MAX_VARIABLE_NUMBER on old builds
+BUSY_TIMEOUT = 120  # seconds to wait for another connection's batched commit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS locks (
+    token_id    INTEGER PRIMARY KEY,
+    amount      REAL    NOT NULL,
+    unlock_time INTEGER NOT NULL,
+    error       INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS kv (
+    ns    TEXT NOT NULL,
+    key   TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reads (
+    block    INTEGER NOT NULL,
+    target   TEXT    NOT NULL,
+    calldata TEXT    NOT NULL,
+    result   TEXT    NOT NULL,
+    PRIMARY KEY (block, target, calldata)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS receipts (
+    tx_hash TEXT    PRIMARY KEY,
+    block   INTEGER NOT NULL,
+    status  INTEGER NOT NULL,
+    logs    TEXT    NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS logs (
+    scan      TEXT    NOT NULL,
+    block     INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    log       TEXT    NOT NULL,
+    PRIMARY KEY (scan, block, log_index)
+) WITHOUT ROWID;
+"""
+
+
+def _chunks(items, size=SQL_MAX_VARS):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class CacheStore:
+    """Thread-safe handle on the cache database (writes go through one lock)."""
+
+    def __init__(self, path=CACHE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    # ----- veNFT locks -----
+
+    def get_locks(self, token_ids=None):
+        """{str(token_id): {"amount", "end"[, "error"]}} — the locked_cache.json
+        shape — for the given IDs (all rows if token_ids is None)."""
+        sql = "SELECT token_id, amount, unlock_time, error FROM locks"
+        with self._lock:
+            if token_ids is None:
+                rows = self._db.execute(sql).fetchall()
+            else:
+                rows = []
+                for part in _chunks(token_ids):
+                    rows += self._db.execute(
+                        f"{sql} WHERE token_id IN ({','.join('?' * len(part))})", part).fetchall()
+
+        out = {}
+        for tid, amount, end, error in rows:
+            entry = {"amount": amount, "end": end}
+            if error:
+                entry["error"] = True
+            out[str(tid)] = entry
+        return out
+
+    def put_locks(self, locks):
+        """Upsert {token_id: {"amount", "end"[, "error"]}} (not committed yet)."""
+        rows = [(int(tid), v.get("amount", 0), v.get("end", 0), int(bool(v.get("error"))))
+                for tid, v in locks.items()]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO locks (token_id, amount, unlock_time, error) VALUES (?, ?, ?, ?)",
+                rows)
+
+    def lock_count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM locks").fetchone()[0]
+
+    # ----- generic namespaced JSON values -----
+
+    def get(self, ns, key, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM kv WHERE ns = ? AND key = ?", (ns, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def put(self, ns, key, value):
+        self.put_many(ns, {key: value})
+
+    def get_many(self, ns, keys=None):
+        """{key: value} for the given keys in ns (the whole namespace if keys is None)."""
+        with self._lock:
+            if keys is None:
+                rows = self._db.execute("SELECT key, value FROM kv WHERE ns = ?", (ns,)).fetchall()
+            else:
+                rows = []
+                for part in _chunks(keys):
+                    rows += self._db.execute(
+                        f"SELECT key, value FROM kv WHERE ns = ? AND key IN ({','.join('?' * len(part))})",
+                        [ns, *part]).fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def put_many(self, ns, items):
+        """Upsert {key: JSON-serialisable value} into ns (not committed yet)."""
+        rows = [(ns, str(k), json.dumps(v, separators=(",", ":"))) for k, v in items.items()]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO kv (ns, key, value) VALUES (?, ?, ?)", rows)
+
+    def keys(self, ns):
+        with self._lock:
+            return [k for (k,) in self._db.execute("SELECT key FROM kv WHERE ns = ?", (ns,))]
+
+    # ----- block-pinned eth_call results -----
+
+    def get_reads(self, block, calls):
+        """{(to, calldata): result_hex} for the calls already read at block."""
+        by_target = {}
+        for to, data in calls:
+            by_target.setdefault(to.lower(), []).append(data)
+        out = {}
+        with self._lock:
+            for target, datas in by_target.items():
+                for part in _chunks(datas):
+                    rows = self._db.execute(
+                        "SELECT calldata, result FROM reads WHERE block = ? AND target = ? "
+                        f"AND calldata IN ({','.join('?' * len(part))})", [block, target, *part])
+                    out.update(((target, data), result) for data, result in rows)
+        return out
+
+    def put_reads(self, block, results):
+        """Store {(to, calldata): result_hex} read at block (not committed yet)."""
+        rows = [(block, to.lower(), data, result) for (to, data), result in results.items()]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO reads (block, target, calldata, result) VALUES (?, ?, ?, ?)", rows)
+
+    def drop_reads(self, keep_block=None):
+        """Delete cached reads of every block except keep_block."""
+        with self._lock:
+            self._db.execute("DELETE FROM reads WHERE block IS NOT ?", (keep_block,))
+            self._db.commit()
+
+    # ----- mined transaction receipts -----
+
+    def get_receipts(self, tx_hashes):
+        """{tx_hash: (block, status, logs_json)} for the hashes stored."""
+        rows = []
+        with self._lock:
+            for part in _chunks({h.lower() for h in tx_hashes}):
+                rows += self._db.execute(
+                    "SELECT tx_hash, block, status, logs FROM receipts "
+                    f"WHERE tx_hash IN ({','.join('?' * len(part))})", part).fetchall()
+        return {tx_hash: (block, status, logs) for tx_hash, block, status, logs in rows}
+
+    def put_receipts(self, rows):
+        """Store {tx_hash: (block, status, logs_json)} (not committed yet)."""
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO receipts (tx_hash, block, status, logs) VALUES (?, ?, ?, ?)",
+                [(h.lower(), *row) for h, row in rows.items()])
+
+    # ----- event logs of getLogs scans -----
+
+    def get_logs(self, scan, from_block=0, to_block=None):
+        """Raw logs of a scan in [from_block, to_block], in chain order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT log FROM logs WHERE scan = ? AND block >= ? AND block <= ? ORDER BY block, log_index",
+                (scan, from_block, to_block if to_block is not None else 2 ** 62)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def put_logs(self, scan, logs):
+        """Store raw logs (with hex blockNumber / logIndex) for a scan (not committed yet)."""
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO logs (scan, block, log_index, log) VALUES (?, ?, ?, ?)",
+                [(scan, int(log["blockNumber"], 16), int(log["logIndex"], 16),
+                  json.dumps(log, separators=(",", ":"))) for log in logs])
+
+    def drop_logs(self, scan, after_block=-1):
+        """Delete a scan's logs above after_block (all of them by default; not committed yet)."""
+        with self._lock:
+            self._db.execute("DELETE FROM logs WHERE scan = ? AND block > ?", (scan, after_block))
+
+    # ----- migration from the JSON caches -----
+
+    def migrate_locks_json(self, path):
+        """Import a locked_cache.json file if the locks table is still empty."""
+        if self.lock_count() or not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            locks = json.load(f)
+        self.put_locks(locks)
+        self.commit()
+        return len(locks)
+
+    def migrate_json(self, ns, path):
+        """Import a flat {key: value} JSON cache into ns if ns is still empty."""
+        with self._lock:
+            populated = self._db.execute("SELECT 1 FROM kv WHERE ns = ? LIMIT 1", (ns,)).fetchone()
+        if populated or not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            items = json.load(f)
+        self.put_many(ns, items)
+        self.commit()
+        return len(items)
+
+    # -----
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_store(path=CACHE_DB):
+    """Process-wide CacheStore for jobs that only need short, self-committed
+    writes (explorer pages, receipts) — one connection per file."""
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = CacheStore(path)
+        return _shared[path]
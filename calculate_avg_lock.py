@@ -3,84 +3,85 @@
 Calculate average lock duration from oDOLO exercise transactions.
 Scans all exercise txs on the Vester contract, extracts lock_end from input data,
 computes lock_duration = lock_end - tx_timestamp, and outputs average lock stats.
+
+Lock duration, price per veDOLO and USDC size are kept as streaming
+statistics (stream_stats.py) in cache.db with a block checkpoint, so each run
+only folds in the exercises added to the Vester index since the last one.
+`--full` rebuilds them from every exercise.
 """
 
-import requests
-import time
 import json
+import math
 import os
+import sys
 from datetime import datetime, timezone
 
-ROUTESCAN_API = "https://api.routescan.io/v2/network/mainnet/evm/80094/etherscan/api"
-VESTER_CONTRACT = "0x3E9b9A16743551DA49b5e136C716bBa7932d2cEc"
-EXERCISE_METHOD_ID = "0xa88f8139"
-PAGE_SIZE = 100
-RATE_LIMIT_DELAY = 0.3
+from cache_store import shared_store
+from stream_stats import StreamStats
+from vester_index import (exercise_amounts, load as load_vester_index, lock_durations,
+                          unresolved_exercises, with_retries)
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_FILE = os.path.join(SCRIPT_DIR, "avg_lock_data.json")
 
-
-def get_all_exercise_txs():
-    """Fetch ALL exercise transactions from the Vester contract."""
-    all_txs = []
-    page = 1
-
-    while True:
-        params = {
-            "module": "account",
-            "action": "txlist",
-            "address": VESTER_CONTRACT,
-            "startblock": 0,
-            "endblock": 99999999,
-            "page": page,
-            "offset": PAGE_SIZE,
-            "sort": "asc"
-        }
-
-        resp = requests.get(ROUTESCAN_API, params=params)
-        data = resp.json()
-
-        if data.get("status") != "1" or not data.get("result"):
-            break
-
-        txs = data["result"]
-        # Filter for successful exercise txs
-        exercise = [
-            tx for tx in txs
-            if tx.get("methodId") == EXERCISE_METHOD_ID
-            and tx.get("isError") == "0"
-            and tx.get("txreceipt_status") == "1"
-        ]
-        all_txs.extend(exercise)
-
-        print(f"  Page {page}: {len(txs)} txs, {len(exercise)} exercises (total: {len(all_txs)})")
-
-        if len(txs) < PAGE_SIZE:
-            break
-
-        page += 1
-        time.sleep(RATE_LIMIT_DELAY)
-
-    return all_txs
-
-
-def extract_lock_duration(tx):
-    """Extract lock duration in seconds from exercise tx input data."""
-    inp = tx["input"]
-    if len(inp) < 266:  # 2 + 8 + 4*64
-        return None
-
-    # Param 2 (index 2) = lock_end timestamp
-    params_hex = inp[10:]
-    lock_end = int(params_hex[2*64:3*64], 16)
-    tx_time = int(tx["timeStamp"])
-
-    duration_seconds = lock_end - tx_time
-    if duration_seconds <= 0 or duration_seconds > 3 * 365 * 86400:  # sanity: max 3 years
-        return None
-
-    return duration_seconds
+STATS_NS = "exercise_stats"
+STATS_VERSION = 1  # bump when the buckets below change
+LOCK_BUCKETS = [("< 1 month", 30), ("1-3 months", 90), ("3-6 months", 180),
+                ("6-12 months", 365), ("1-2 years", math.inf)]
+USDC_BUCKETS = [("< $100", 100), ("$100-1k", 1_000), ("$1k-10k", 10_000),
+                ("$10k-100k", 100_000), ("$100k+", math.inf)]
+
+
+def new_state():
+    return {"version": STATS_VERSION, "last_block": 0, "boundary": [], "unresolved": [],
+            "lock_days": StreamStats(LOCK_BUCKETS), "price": StreamStats(),
+            "usdc": StreamStats(USDC_BUCKETS)}
+
+
+def load_state(index, full=False):
+    """Persisted stats, or a fresh state when missing, stale or out of step with the index."""
+    saved = None if full else shared_store().get(STATS_NS, "state")
+    if not saved or saved.get("version") != STATS_VERSION or saved["last_block"] > index["last_block"]:
+        print("  📊 Lock stats: full rebuild")
+        return new_state()
+    state = dict(saved)
+    for name in ("lock_days", "price", "usdc"):
+        state[name] = StreamStats.from_dict(saved[name])
+    return state
+
+
+def save_state(state):
+    store = shared_store()
+    store.put(STATS_NS, "state", {k: v.to_dict() if isinstance(v, StreamStats) else v
+                                  for k, v in state.items()})
+    store.commit()
+
+
+def fold_in(state, txs, retry=()):
+    """Add the exercises in txs to the stats and move the checkpoint past them.
+    Txs whose USDC amount does not resolve are kept in state["unresolved"];
+    passed back in `retry` (their lock duration is already counted), they
+    only add their price and size once resolved."""
+    amounts = exercise_amounts(txs) if txs else {}
+    last_block, boundary = state["last_block"], set(state["boundary"])
+    for tx, dur in zip(txs, lock_durations(txs)):
+        when = int(tx["timeStamp"])
+        retried = tx["hash"] in retry
+        if dur is not None and not retried:
+            state["lock_days"].add(dur / 86400, when)
+        usdc, vedolo = amounts.get(tx["hash"].lower(), (None, None))
+        if usdc is not None:
+            state["usdc"].add(usdc, when)
+            if vedolo:
+                state["price"].add(usdc / vedolo, when)
+        if retried:
+            continue
+        block = int(tx["blockNumber"])
+        if block > last_block:
+            last_block, boundary = block, set()
+        boundary.add(tx["hash"])
+    state["last_block"], state["boundary"] = last_block, sorted(boundary)
+    state["unresolved"] = unresolved_exercises(txs, amounts)
 
 
 def main():
@@ -88,40 +89,33 @@ def main():
     print("oDOLO Average Lock Duration Calculator")
     print("=" * 55)
 
-    print("\n  Fetching all exercise transactions...")
-    txs = get_all_exercise_txs()
+    print("\n  Loading exercise transactions from the Vester index...")
+    index = load_vester_index()
+    txs = index["txs"]
     print(f"\n  Total exercise transactions: {len(txs)}")
 
-    durations = []
-    for tx in txs:
-        dur = extract_lock_duration(tx)
-        if dur is not None:
-            durations.append(dur)
-
-    if not durations:
+    state = load_state(index, full="--full" in sys.argv)
+    last_block, known = state["last_block"], set(state["boundary"])
+    retry = set(state.get("unresolved", []))
+    new_txs = with_retries(index, [tx for tx in txs
+                                   if int(tx["blockNumber"]) > last_block
+                                   or (int(tx["blockNumber"]) == last_block and tx["hash"] not in known)],
+                           retry)
+    print(f"  📊 Folding {len(new_txs):,} new exercises into the lock stats (checkpoint block {last_block:,}, "
+          f"{len(retry)} retried)")
+    fold_in(state, new_txs, retry)
+    if new_txs:
+        save_state(state)
+
+    lock = state["lock_days"]
+    if not lock.count:
         print("  No valid durations found!")
         return
 
-    avg_seconds = sum(durations) / len(durations)
-    avg_days = avg_seconds / 86400
+    avg_days = lock.total / lock.count
     avg_months = avg_days / 30.44
     avg_years = avg_days / 365.25
-
-    # Distribution buckets
-    buckets = {"< 1 month": 0, "1-3 months": 0, "3-6 months": 0,
-               "6-12 months": 0, "1-2 years": 0}
-    for d in durations:
-        days = d / 86400
-        if days < 30:
-            buckets["< 1 month"] += 1
-        elif days < 90:
-            buckets["1-3 months"] += 1
-        elif days < 180:
-            buckets["3-6 months"] += 1
-        elif days < 365:
-            buckets["6-12 months"] += 1
-        else:
-            buckets["1-2 years"] += 1
+    buckets = lock.summary()["buckets"]
 
     # Average discount (linear: 5% at 7 days, 50% at 730 days)
     avg_discount = 5 + (avg_days - 7) * (50 - 5) / (730 - 7)
@@ -129,26 +123,24 @@ def main():
 
     # Load exercised USD for avg price
     usd_file = os.path.join(SCRIPT_DIR, "exercised_usd.json")
-    avg_price = None
     if os.path.exists(usd_file):
         with open(usd_file) as f:
             usd_data = json.load(f)
         total_usdc = usd_data.get("total_usdc", 0)
-        # We need total veDOLO exercised - read from contract or approximate
-        # For now, use total_txs to see if it matches
         print(f"\n  Exercised USD data: ${total_usdc:,.2f} across {usd_data.get('total_txs', 0)} txs")
 
     print(f"\n  ╔═══════════════════════════════════════════╗")
-    print(f"  ║  Valid durations: {len(durations):>6} / {len(txs)} txs       ║")
+    print(f"  ║  Valid durations: {lock.count:>6} / {len(txs)} txs       ║")
     print(f"  ║  Average lock:   {avg_days:>6.1f} days             ║")
     print(f"  ║  Average lock:   {avg_months:>6.1f} months           ║")
     print(f"  ║  Average lock:   {avg_years:>6.2f} years            ║")
+    print(f"  ║  Median lock:    {lock.quantile(0.5):>6.1f} days             ║")
     print(f"  ║  Avg discount:   {avg_discount:>6.1f}%                ║")
     print(f"  ╚═══════════════════════════════════════════╝")
 
     print(f"\n  Distribution:")
     for bucket, count in buckets.items():
-        pct = count / len(durations) * 100
+        pct = count / lock.count * 100
         bar = "█" * int(pct / 2)
         print(f"    {bucket:>15}: {count:>5} ({pct:>5.1f}%) {bar}")
 
@@ -158,8 +150,11 @@ def main():
         "avg_lock_months": round(avg_months, 1),
         "avg_discount_pct": round(avg_discount, 1),
         "total_exercises": len(txs),
-        "valid_durations": len(durations),
+        "valid_durations": lock.count,
         "distribution": buckets,
+        "lock_days": lock.summary(1),
+        "price_per_vedolo": state["price"].summary(6),
+        "usdc_per_exercise": state["usdc"].summary(2),
         "last_updated": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
     }
 
@@ -4,107 +4,10 @@ Calculate total Exercised Volume in USD by scanning all closePositionAndBuyToken
 transactions on the Vester contract and summing USDC.e Transfer amounts.
 """
 
-import requests
 import time
 import json
 
-ROUTESCAN_API = "https://api.routescan.io/v2/network/mainnet/evm/80094/etherscan/api"
-VESTER_CONTRACT = "0x3E9b9A16743551DA49b5e136C716bBa7932d2cEc"
-USDC_E_CONTRACT = "0x549943e04f40284185054145c6e4e9568c1d3241".lower()
-# ERC20 Transfer event topic
-TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
-# closePositionAndBuyTokens method ID
-EXERCISE_METHOD_ID = "0xa88f8139"
-# USDC.e has 6 decimals
-USDC_DECIMALS = 6
-
-PAGE_SIZE = 100
-RATE_LIMIT_DELAY = 0.3  # seconds between API calls
-
-
-def get_all_transactions():
-    """Fetch all transactions to the Vester contract."""
-    all_txs = []
-    page = 1
-    
-    while True:
-        print(f"  Fetching transactions page {page}...")
-        params = {
-            "module": "account",
-            "action": "txlist",
-            "address": VESTER_CONTRACT,
-            "startblock": 0,
-            "endblock": 99999999,
-            "page": page,
-            "offset": PAGE_SIZE,
-            "sort": "asc"
-        }
-        
-        resp = requests.get(ROUTESCAN_API, params=params)
-        data = resp.json()
-        
-        if data["status"] != "1" or not data["result"]:
-            break
-        
-        txs = data["result"]
-        all_txs.extend(txs)
-        print(f"    Got {len(txs)} transactions (total: {len(all_txs)})")
-        
-        if len(txs) < PAGE_SIZE:
-            break
-        
-        page += 1
-        time.sleep(RATE_LIMIT_DELAY)
-    
-    return all_txs
-
-
-def get_exercise_transactions(all_txs):
-    """Filter only successful closePositionAndBuyTokens transactions."""
-    exercise_txs = []
-    for tx in all_txs:
-        if (tx.get("methodId") == EXERCISE_METHOD_ID and 
-            tx.get("isError") == "0" and
-            tx.get("txreceipt_status") == "1"):
-            exercise_txs.append(tx)
-    return exercise_txs
-
-
-def get_usdc_amount_from_receipt(tx_hash):
-    """Get the USDC.e payment amount from a transaction receipt."""
-    params = {
-        "module": "proxy",
-        "action": "eth_getTransactionReceipt",
-        "txhash": tx_hash
-    }
-    
-    resp = requests.get(ROUTESCAN_API, params=params)
-    data = resp.json()
-    
-    if "result" not in data or data["result"] is None:
-        return None
-    
-    receipt = data["result"]
-    logs = receipt.get("logs", [])
-    
-    # Find USDC.e Transfer event FROM user TO Vester contract
-    # This is the payment: user sends USDC.e to Vester
-    for log in logs:
-        if (log["address"].lower() == USDC_E_CONTRACT and
-            len(log["topics"]) >= 3 and
-            log["topics"][0] == TRANSFER_TOPIC):
-            
-            # topics[1] = from, topics[2] = to
-            to_addr = "0x" + log["topics"][2][26:].lower()
-            
-            # Payment is FROM user TO vester contract
-            if to_addr == VESTER_CONTRACT.lower():
-                amount_hex = log["data"]
-                amount_raw = int(amount_hex, 16)
-                amount_usd = amount_raw / (10 ** USDC_DECIMALS)
-                return amount_usd
-    
-    return None
+from vester_index import exercise_amounts, exercise_txs as get_exercise_transactions
 
 
 def main():
@@ -113,20 +16,19 @@ def main():
     print("=" * 60)
     print()
     
-    # Step 1: Get all transactions
-    print("[1/3] Fetching all Vester contract transactions...")
-    all_txs = get_all_transactions()
-    print(f"  Total transactions: {len(all_txs)}")
+    # Step 1: Sync the local Vester index
+    print("[1/3] Syncing the Vester index...")
+    exercise_txs = get_exercise_transactions()
     print()
     
-    # Step 2: Filter exercise transactions
-    print("[2/3] Filtering exercise (closePositionAndBuyTokens) transactions...")
-    exercise_txs = get_exercise_transactions(all_txs)
+    # Step 2: The index only holds exercise transactions
+    print("[2/3] Exercise (closePositionAndBuyTokens) transactions...")
     print(f"  Exercise transactions: {len(exercise_txs)}")
     print()
     
-    # Step 3: Get USDC.e amounts from each receipt
-    print("[3/3] Scanning receipts for USDC.e payments...")
+    # Step 3: USDC.e payments (Transfer logs joined by tx hash, receipts as fallback)
+    print("[3/3] Matching USDC.e payments...")
+    amounts = exercise_amounts(exercise_txs)
     total_usdc = 0.0
     processed = 0
     errors = 0
@@ -137,7 +39,7 @@ def main():
         timestamp = int(tx["timeStamp"])
         date_str = time.strftime("%Y-%m-%d %H:%M", time.gmtime(timestamp))
         
-        amount = get_usdc_amount_from_receipt(tx_hash)
+        amount = amounts[tx_hash.lower()][0]
         
         if amount is not None:
             total_usdc += amount
@@ -152,8 +54,6 @@ def main():
         else:
             errors += 1
             print(f"  [{i+1}/{len(exercise_txs)}] {date_str} | ⚠️ No USDC.e transfer found | tx: {tx_hash[:16]}...")
-        
-        time.sleep(RATE_LIMIT_DELAY)
     
     # Summary
     print()
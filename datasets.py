@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Process-wide shared resources for the data jobs.
+
+When several jobs run in one process (see run_jobs.py) they share:
+  - http_session(): one keep-alive requests.Session for the REST APIs
+    (Etherscan, Routescan, CoinGecko, DeFi Llama),
+  - shared(key, loader): an in-memory dataset loaded once by whichever job
+    asks first — concurrent callers wait for that load instead of
+    refetching (e.g. the Vester txlist used by several oDOLO jobs).
+
+Run standalone, a script simply gets a fresh session and loads its own data.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+_datasets = {}
+_dataset_locks = {}
+_datasets_lock = threading.Lock()
+
+
+def http_session():
+    """Shared pooled requests.Session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def shared(key, loader):
+    """Return the dataset `key`, calling loader() only on first use."""
+    with _datasets_lock:
+        if key in _datasets:
+            return _datasets[key]
+        lock = _dataset_locks.setdefault(key, threading.Lock())
+    with lock:
+        with _datasets_lock:
+            if key in _datasets:
+                return _datasets[key]
+        value = loader()
+        with _datasets_lock:
+            _datasets[key] = value
+        return value
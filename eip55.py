@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+EIP-55 mixed-case address checksums without web3.
+
+to_checksum_address() matches Web3.to_checksum_address byte for byte.
+keccak-256 comes from pycryptodome or pysha3 when one is installed,
+otherwise from the pure-Python implementation below. Results are memoised.
+
+to_checksum_addresses() converts a whole list, leaving malformed entries
+untouched the way the old per-address try/except around web3 did. With
+NumPy available it hashes every address in one vectorised keccak pass
+(a 40-char address is a single keccak block), which is much faster than
+the scalar pure-Python path.
+"""
+
+import re
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_ADDRESS_RE = re.compile(r"^(0x)?[0-9a-fA-F]{40}$")
+
+# ----- keccak-256 (original Keccak padding, as used by Ethereum) -----
+
+_RC = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+_ROT = [  # rotation offsets, lane index x + 5*y
+    0, 1, 62, 28, 27,
+    36, 44, 6, 55, 20,
+    3, 10, 43, 25, 39,
+    41, 45, 15, 21, 8,
+    18, 2, 61, 56, 14,
+]
+_MASK = (1 << 64) - 1
+_RATE = 136  # bytes, for a 256-bit output
+# rho+pi: lane i is rotated by _ROT[i] and moves to _PI[i]
+_PI = [y + 5 * ((2 * x + 3 * y) % 5) for y in range(5) for x in range(5)]
+_RHO_PI = [(i, _PI[i], _ROT[i], 64 - _ROT[i]) for i in range(25) if _ROT[i]]
+# chi: lane i ^= ~lane(x+1, y) & lane(x+2, y)
+_CHI = [(i, i - i % 5 + (i + 1) % 5, i - i % 5 + (i + 2) % 5) for i in range(25)]
+
+
+def _keccak_f(a):
+    mask = _MASK
+    for rc in _RC:
+        # theta
+        c0 = a[0] ^ a[5] ^ a[10] ^ a[15] ^ a[20]
+        c1 = a[1] ^ a[6] ^ a[11] ^ a[16] ^ a[21]
+        c2 = a[2] ^ a[7] ^ a[12] ^ a[17] ^ a[22]
+        c3 = a[3] ^ a[8] ^ a[13] ^ a[18] ^ a[23]
+        c4 = a[4] ^ a[9] ^ a[14] ^ a[19] ^ a[24]
+        d = (
+            c4 ^ (((c1 << 1) | (c1 >> 63)) & mask),
+            c0 ^ (((c2 << 1) | (c2 >> 63)) & mask),
+            c1 ^ (((c3 << 1) | (c3 >> 63)) & mask),
+            c2 ^ (((c4 << 1) | (c4 >> 63)) & mask),
+            c3 ^ (((c0 << 1) | (c0 >> 63)) & mask),
+        ) * 5
+        a = [x ^ y for x, y in zip(a, d)]
+        # rho + pi (lane 0 neither rotates nor moves)
+        b = [a[0]] * 25
+        for src, dst, left, right in _RHO_PI:
+            v = a[src]
+            b[dst] = ((v << left) | (v >> right)) & mask
+        # chi
+        a = [b[i] ^ (~b[j] & b[k]) for i, j, k in _CHI]
+        # iota
+        a[0] ^= rc
+    return a
+
+
+def _keccak256_py(data):
+    padded = bytearray(data)
+    padded.append(0x01)
+    padded.extend(b"\x00" * (-len(padded) % _RATE))
+    padded[-1] |= 0x80
+    state = [0] * 25
+    for off in range(0, len(padded), _RATE):
+        block = padded[off:off + _RATE]
+        for i in range(_RATE // 8):
+            state[i] ^= int.from_bytes(block[8 * i:8 * i + 8], "little")
+        state = _keccak_f(state)
+    return b"".join(lane.to_bytes(8, "little") for lane in state[:4])
+
+
+try:
+    from Crypto.Hash import keccak as _pycryptodome_keccak
+
+    def keccak256(data):
+        return _pycryptodome_keccak.new(digest_bits=256, data=data).digest()
+except ImportError:
+    try:
+        import sha3 as _pysha3
+
+        def keccak256(data):
+            return _pysha3.keccak_256(data).digest()
+    except ImportError:
+        keccak256 = _keccak256_py
+
+
+def _keccak256_blocks(messages):
+    """keccak-256 of many equal-length messages shorter than one block,
+    as an (N, 32) uint8 array. Each message is one column of the state."""
+    n, length = len(messages), len(messages[0])
+    block = np.zeros((n, _RATE), dtype=np.uint8)
+    block[:, :length] = np.frombuffer(b"".join(messages), dtype=np.uint8).reshape(n, length)
+    block[:, length] ^= 0x01
+    block[:, -1] ^= 0x80
+
+    a = np.zeros((25, n), dtype=np.uint64)
+    a[:_RATE // 8] = block.view("<u8").T
+    one, sixty_three = np.uint64(1), np.uint64(63)
+    rho_pi = [(src, dst, np.uint64(left), np.uint64(right)) for src, dst, left, right in _RHO_PI]
+    for rc in _RC:
+        c = a[0:5] ^ a[5:10] ^ a[10:15] ^ a[15:20] ^ a[20:25]
+        d = np.roll(c, 1, axis=0) ^ ((np.roll(c, -1, axis=0) << one) | (np.roll(c, -1, axis=0) >> sixty_three))
+        a = a ^ np.tile(d, (5, 1))
+        b = np.empty_like(a)
+        b[0] = a[0]
+        for src, dst, left, right in rho_pi:
+            b[dst] = (a[src] << left) | (a[src] >> right)
+        b = b.reshape(5, 5, n)  # [y][x]
+        a = (b ^ (~np.roll(b, -1, axis=1) & np.roll(b, -2, axis=1))).reshape(25, n)
+        a[0] ^= np.uint64(rc)
+    return np.ascontiguousarray(a[:4].T).astype("<u8").view(np.uint8)
+
+
+# ----- EIP-55 -----
+
+@lru_cache(maxsize=None)
+def to_checksum_address(address):
+    """EIP-55 checksum of a 20-byte hex address (with or without 0x).
+    Raises ValueError for anything that is not one."""
+    if not isinstance(address, str) or not _ADDRESS_RE.match(address):
+        raise ValueError(f"Not a 20-byte hex address: {address!r}")
+    hex_addr = address[-40:].lower()
+    digest = keccak256(hex_addr.encode("ascii")).hex()
+    return "0x" + "".join(ch.upper() if int(digest[i], 16) >= 8 else ch
+                          for i, ch in enumerate(hex_addr))
+
+
+def to_checksum_addresses(addresses):
+    """Checksum a list of addresses; malformed entries are returned unchanged."""
+    addresses = list(addresses)
+    valid = {a[-40:].lower() for a in addresses if isinstance(a, str) and _ADDRESS_RE.match(a)}
+    if np is None or not valid:
+        checksummed = {}
+        for hex_addr in valid:
+            checksummed[hex_addr] = to_checksum_address(hex_addr)
+    else:
+        hex_addrs = sorted(valid)
+        digests = _keccak256_blocks([h.encode("ascii") for h in hex_addrs])
+        # nibble i of the digest decides the case of hex char i
+        nibbles = np.stack([digests >> 4, digests & 0x0F], axis=2).reshape(len(hex_addrs), 64)[:, :40]
+        chars = np.frombuffer("".join(hex_addrs).encode("ascii"), dtype=np.uint8).reshape(len(hex_addrs), 40)
+        upper = np.where((nibbles >= 8) & (chars >= ord("a")), chars - 32, chars).astype(np.uint8)
+        checksummed = {h: "0x" + row.tobytes().decode("ascii") for h, row in zip(hex_addrs, upper)}
+
+    return [checksummed[a[-40:].lower()] if isinstance(a, str) and _ADDRESS_RE.match(a) else a
+            for a in addresses]
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Shared Etherscan V2 / Routescan API client.
+
+One client per API (see etherscan() / routescan()) is shared by every job of
+a process. It provides:
+  - a token-bucket limiter sized to the key's quota (ETHERSCAN_RPS /
+    ROUTESCAN_RPS), instead of fixed sleeps between calls,
+  - the keep-alive session from datasets.http_session(), timeouts on every
+    request and exponential backoff on timeouts and 5xx replies; a rate-limit
+    reply instead drains the shared bucket, so every thread backs off once,
+  - pagination helpers for block-range cursors (paginate_blocks: startblock
+    moves to the last block of each full page; paginate_logs for getLogs)
+    and page-number cursors (paginate_pages),
+  - an on-disk cache of immutable pages: a full page whose last row is at
+    least FINALITY_DEPTH blocks below head can never change, so it is stored
+    in cache.db and never fetched again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+from cache_store import CACHE_DB, shared_store
+from datasets import http_session
+
+ETHERSCAN_V2 = "https://api.etherscan.io/v2/api"
+ROUTESCAN_API = "https://api.routescan.io/v2/network/mainnet/evm/80094/etherscan/api"
+BERACHAIN_ID = 80094
+
+ETHERSCAN_RPS = float(os.environ.get("ETHERSCAN_RPS", "4"))  # free keys allow 5 calls/s
+ROUTESCAN_RPS = float(os.environ.get("ROUTESCAN_RPS", "2"))
+FINALITY_DEPTH = 128  # blocks below head after which a page is treated as immutable
+REQUEST_TIMEOUT = 60  # seconds; a 10k-row tokentx page can be slow to render
+MAX_RETRIES = 5
+HEAD_TTL = 60  # seconds to reuse the head block number for cache decisions
+PAGE_CACHE_NS = "explorer_pages"
+
+
+def row_block(row):
+    """Block number of an account row (decimal) or a getLogs row (hex)."""
+    value = row["blockNumber"]
+    return int(value, 16) if value.startswith("0x") else int(value)
+
+
+class ExplorerError(Exception):
+    """The API kept failing (or answered with an error) after all retries."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second, bursts of `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Drain the bucket after a rate-limit reply so every caller backs off."""
+        with self.lock:
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class ExplorerClient:
+    def __init__(self, base_url, api_key="", chain_id=None, rate=ETHERSCAN_RPS,
+                 timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, finality_depth=FINALITY_DEPTH, cache_path=CACHE_DB):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.chain_id = chain_id
+        self.bucket = TokenBucket(rate)
+        self.timeout = timeout
+        self.retries = retries
+        self.finality_depth = finality_depth
+        self.cache_path = cache_path
+        self._head = (None, 0.0)
+        self.stats = {"requests": 0, "cached_pages": 0, "retries": 0}
+
+    # ----- transport -----
+
+    def get(self, **params):
+        """One API call with rate limiting and retries. Returns the JSON body.
+
+        "No transactions found" / "No records found" bodies are returned as
+        status "1" with an empty result list. Raises ExplorerError when the
+        call still fails after all retries.
+        """
+        if self.chain_id is not None:
+            params.setdefault("chainid", self.chain_id)
+        if self.api_key:
+            params.setdefault("apikey", self.api_key)
+
+        last_error, throttled = None, False
+        for attempt in range(self.retries):
+            if attempt:
+                self.stats["retries"] += 1
+                if not throttled:  # a rate-limit reply already drained the shared bucket
+                    time.sleep(min(2 ** attempt, 30))
+            throttled = False
+            self.bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                resp = http_session().get(self.base_url, params=params, timeout=self.timeout)
+                if resp.status_code == 429:
+                    last_error, throttled = "HTTP 429", True
+                    self.bucket.penalize(2 ** attempt)
+                    continue
+                if resp.status_code >= 500:
+                    last_error = f"HTTP {resp.status_code}"
+                    continue
+                data = resp.json()
+            except (requests.RequestException, ValueError) as e:
+                last_error = str(e)
+                continue
+
+            message = f"{data.get('message', '')} {data.get('result', '')}"[:300]
+            if "rate limit" in message.lower():
+                last_error, throttled = message, True
+                self.bucket.penalize(2 ** attempt)
+                continue
+            if "No transactions found" in message or "No records found" in message:
+                return {"status": "1", "message": "OK", "result": []}
+            if params.get("module") == "proxy" or data.get("status") == "1":
+                return data
+            last_error = message
+        raise ExplorerError(f"{params.get('module')}/{params.get('action')}: {last_error}")
+
+    def rows(self, **params):
+        """Result list of an account/logs query (empty list when there are none)."""
+        result = self.get(**params).get("result")
+        if not isinstance(result, list):
+            raise ExplorerError(f"{params.get('action')}: unexpected result {str(result)[:200]}")
+        return result
+
+    def proxy(self, action, **params):
+        """JSON-RPC passthrough (module=proxy), e.g. eth_getTransactionReceipt."""
+        return self.get(module="proxy", action=action, **params).get("result")
+
+    def head_block(self):
+        """Latest block number (reused for HEAD_TTL seconds), or None if unknown."""
+        block, fetched = self._head
+        if block is None or time.monotonic() - fetched > HEAD_TTL:
+            try:
+                block = int(self.proxy("eth_blockNumber"), 16)
+                self._head = (block, time.monotonic())
+            except (ExplorerError, TypeError, ValueError):
+                return block
+        return block
+
+    # ----- immutable page cache -----
+
+    def _store(self):
+        return shared_store(self.cache_path)
+
+    def _page_key(self, params):
+        ident = {k: v for k, v in params.items() if k != "apikey"}
+        ident["_url"] = self.base_url
+        ident["_chain"] = self.chain_id
+        return hashlib.sha1(json.dumps(ident, sort_keys=True).encode()).hexdigest()
+
+    def cached_rows(self, page_size, cache_params=None, **params):
+        """rows(**params) for a page of at most page_size rows, served from the
+        disk cache when an identical page was stored as immutable before.
+        `cache_params` (default: params) identifies the page in the cache."""
+        key = self._page_key(params if cache_params is None else cache_params)
+        cached = self._store().get(PAGE_CACHE_NS, key)
+        if cached is not None:
+            self.stats["cached_pages"] += 1
+            return cached
+
+        rows = self.rows(**params)
+        head = self.head_block() if len(rows) >= page_size else None
+        if head is not None and row_block(rows[-1]) <= head - self.finality_depth:
+            store = self._store()
+            store.put(PAGE_CACHE_NS, key, rows)
+            store.commit()
+        return rows
+
+    # ----- pagination -----
+
+    def paginate_blocks(self, start_block=0, end_block=99999999, page_size=10000, key=None, seen=None,
+                        range_params=("startblock", "endblock"), **params):
+        """Yield pages of new rows for a block-range cursor (sort=asc).
+
+        After a full page the next query starts at that page's last block, so
+        rows of the boundary block come back again; `key(row)` identifies rows
+        already yielded (`seen` seeds it with keys known at start_block).
+        Yields (start_block, new_rows).
+
+        A full page does not depend on endblock, so cached pages are keyed
+        without it and trimmed to end_block when served. `range_params` names
+        the start/end parameters (getLogs uses fromBlock/toBlock).
+        """
+        start_param, end_param = range_params
+        seen = set(seen or ())
+        while True:
+            query = dict(params, page=1, offset=page_size, sort="asc")
+            query[start_param] = start_block
+            rows = self.cached_rows(page_size, cache_params=query, **{end_param: end_block}, **query)
+            within = [row for row in rows if row_block(row) <= end_block]
+            fresh = []
+            for row in within:
+                k = key(row) if key else None
+                if k is None or k not in seen:
+                    if k is not None:
+                        seen.add(k)
+                    fresh.append(row)
+            yield start_block, fresh
+
+            if len(within) < page_size:
+                return
+            last_block = row_block(rows[-1])
+            # More than a page of rows in one block: nothing to do but move past it
+            start_block = last_block if last_block != start_block else last_block + 1
+
+    def paginate_logs(self, start_block=0, end_block=99999999, page_size=1000, **filters):
+        """Yield (start_block, logs) for a logs/getLogs query (address, topic0..3,
+        topicX_Y_opr filters), 1,000 logs per page, deduplicated by tx hash +
+        log index."""
+        return self.paginate_blocks(start_block, end_block, page_size,
+                                    key=lambda log: log["transactionHash"] + log["logIndex"],
+                                    range_params=("fromBlock", "toBlock"),
+                                    module="logs", action="getLogs", **filters)
+
+    def paginate_pages(self, page_size=100, start_page=1, **params):
+        """Yield (page_number, rows) for a page-number cursor (sort=asc).
+
+        Rows are only ever appended after the last page, so earlier full
+        pages are as immutable as block-range pages.
+        """
+        params.setdefault("startblock", 0)
+        params.setdefault("endblock", 99999999)
+        page = start_page
+        while True:
+            rows = self.cached_rows(page_size, page=page, offset=page_size, sort="asc", **params)
+            if rows:
+                yield page, rows
+            if len(rows) < page_size:
+                return
+            page += 1
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _shared(key, factory):
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = factory()
+        return _clients[key]
+
+
+def etherscan(chain_id, api_key):
+    """Process-wide Etherscan V2 client for one chain."""
+    return _shared(("etherscan", chain_id, api_key),
+                   lambda: ExplorerClient(ETHERSCAN_V2, api_key, chain_id, rate=ETHERSCAN_RPS))
+
+
+def routescan():
+    """Process-wide Routescan (Berachain, Etherscan-compatible) client."""
+    return _shared(("routescan",), lambda: ExplorerClient(ROUTESCAN_API, rate=ROUTESCAN_RPS))
@@ -7,9 +7,10 @@ This runs in GitHub Actions so the dashboard doesn't need live API calls.
 
 import json
 import os
-import requests
 from datetime import datetime, timezone
 
+from datasets import http_session
+
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_FILE = os.path.join(DATA_DIR, "defillama_data.json")
 
@@ -18,7 +19,7 @@ def main():
     print("📡 Fetching DeFi Llama data for Dolomite...")
 
     try:
-        resp = requests.get(
+        resp = http_session().get(
             "https://api.llama.fi/protocol/dolomite",
             timeout=30
         )
@@ -15,13 +15,17 @@ Usage:
 Requires BERASCAN_API_KEY environment variable.
 """
 
+import asyncio
 import json
 import os
 import sys
-import time
-import requests
 from datetime import datetime, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from abi_decode import columns, uints
+from log_scanner import LogScanner, ScanError
+from rpc_client import get_client
+from cache_store import CacheStore, CACHE_DB
+import receipt_store
 
 # ===== CONFIG =====
 VEDOLO_CONTRACT = "0xCB86B75EE6133d179a12D550b09FB3cdB1e141D4"
@@ -40,99 +44,75 @@ RPC_URLS = [
     "https://rpc.berachain.com/",
 ]
 ZERO_ADDR = "0x0000000000000000000000000000000000000000"
+MAX_IN_FLIGHT = 8  # concurrent RPC requests
 
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_FILE = os.path.join(DATA_DIR, "early_exits.json")
-CACHE_FILE = os.path.join(DATA_DIR, "early_exits_cache.json")
+LEGACY_CACHE_FILE = os.path.join(DATA_DIR, "early_exits_cache.json")  # imported into CACHE_DB once
+CACHE_NS = "early_exits"  # penalty results by tx hash
+WITHDRAW_SCAN = "vedolo_withdraw"  # log_scanner name of the Withdraw event scan
 
 API_KEY = os.environ.get("BERASCAN_API_KEY", "")
 
 
-def rpc_call(method, params, retries=3):
-    """Make an RPC call with fallback across multiple providers."""
-    for rpc_idx, rpc_url in enumerate(RPC_URLS):
-        for attempt in range(retries):
-            try:
-                resp = requests.post(rpc_url, json={
-                    "jsonrpc": "2.0",
-                    "method": method,
-                    "params": params,
-                    "id": 1
-                }, timeout=20)
-                data = resp.json()
-                if "result" in data:
-                    return data["result"]
-                if "error" in data:
-                    if attempt < retries - 1:
-                        time.sleep(0.5 * (attempt + 1))
-                        continue
-            except Exception as e:
-                if attempt < retries - 1:
-                    time.sleep(0.5 * (attempt + 1))
-    return None
-
-
-def fetch_withdraw_events():
-    """Fetch all Withdraw events from the veDOLO contract using RPC getLogs with pagination."""
-    print("📡 Phase 1: Fetching Withdraw events...")
+def rpc():
+    """Shared pooled RPC client (keep-alive per endpoint, bounded in-flight)."""
+    return get_client(RPC_URLS, max_in_flight=MAX_IN_FLIGHT)
 
-    # Get latest block
-    latest_block = int(rpc_call("eth_blockNumber", []), 16)
-    print(f"  Latest block: {latest_block:,}")
 
-    all_logs = []
-    block = 0
-    step = 10000  # 10K block pages (RPC limit for free tier)
-
-    while block <= latest_block:
-        to_block = min(block + step - 1, latest_block)
+def rpc_call(method, params):
+    """Make an RPC call with fallback across multiple providers."""
+    return rpc().call(method, params)
 
-        result = rpc_call("eth_getLogs", [{
-            "address": VEDOLO_CONTRACT,
-            "topics": [WITHDRAW_TOPIC],
-            "fromBlock": hex(block),
-            "toBlock": hex(to_block)
-        }])
 
-        if result:
-            all_logs.extend(result)
-            if len(result) > 0:
-                print(f"  Block {block:,}-{to_block:,}: {len(result)} events (total: {len(all_logs)})")
+def fetch_withdraw_events(store):
+    """All Withdraw events of the veDOLO contract. Only blocks past the
+    scanner's checkpoint are fetched (adaptive getLogs windows; a cold run
+    backfills history in parallel shards over every RPC endpoint); earlier
+    events come from the cache store."""
+    print("📡 Phase 1: Fetching Withdraw events...")
 
-        block = to_block + 1
+    # Get latest block
+    latest = rpc_call("eth_blockNumber", [])
+    if not latest:
+        raise ScanError("eth_blockNumber failed on every RPC endpoint")
+    latest_block = int(latest, 16)
+    print(f"  Latest block: {latest_block:,}")
 
-        # Small delay to avoid rate limits
-        if block % 100000 == 0:
-            time.sleep(0.1)
+    scanner = LogScanner(rpc(), VEDOLO_CONTRACT, [WITHDRAW_TOPIC], store, name=WITHDRAW_SCAN)
+    all_logs = scanner.scan(head=latest_block, backfill_urls=RPC_URLS)
 
     print(f"  ✅ Found {len(all_logs)} total Withdraw events")
     return all_logs
 
 
-def decode_withdraw_event(log):
-    """Decode a Withdraw event log into structured data."""
-    provider = "0x" + log["topics"][1][26:]  # indexed address
-    data = log.get("data", "0x")[2:]
-
-    token_id = int(data[0:64], 16)
-    value = int(data[64:128], 16) / 1e18  # DOLO returned to user
-    ts = int(data[128:192], 16)
+def decode_withdraw_events(logs):
+    """Decode Withdraw event logs into structured data (one batch decode)."""
+    data = columns([log.get("data", "0x") for log in logs],
+                   [("token_id", "uint256"), ("value", "uint256"), ("ts", "uint256")],
+                   decimals={"value": 18})  # value = DOLO returned to user
+    providers = columns([log["topics"][1] for log in logs], [("provider", "address")])["provider"]  # indexed
 
-    return {
-        "provider": provider.lower(),
+    return [{
+        "provider": provider,
         "token_id": token_id,
         "value": value,
         "timestamp": ts,
         "block": int(log["blockNumber"], 16),
         "tx_hash": log["transactionHash"],
-    }
+    } for log, provider, token_id, value, ts
+        in zip(logs, providers, data["token_id"], data["value"], data["ts"])]
 
 
-def fetch_receipt_and_calc_penalty(tx_hash):
-    """Fetch transaction receipt and calculate penalty from Transfer events."""
-    receipt = rpc_call("eth_getTransactionReceipt", [tx_hash])
-    if not receipt:
-        return None
+async def fetch_receipt_and_calc_penalty(tx_hash, store):
+    """Fetch transaction receipt and calculate penalty from Transfer events.
+    Receipts are kept in the cache store's receipts table, so each is fetched once."""
+    receipt = receipt_store.lookup(store, [tx_hash]).get(tx_hash.lower())
+    if receipt is None:
+        receipt = await rpc().acall("eth_getTransactionReceipt", [tx_hash])
+        if not receipt:
+            return None
+        receipt_store.remember(store, {tx_hash: receipt})
 
     burn_amount = 0.0
     recoup_amount = 0.0
@@ -144,22 +124,15 @@ def fetch_receipt_and_calc_penalty(tx_hash):
     zero_lower = ZERO_ADDR.lower()
     vester_lower = ODOLO_VESTER.lower()
 
-    for log in receipt.get("logs", []):
-        # Only look at DOLO token Transfer events
-        if log["address"].lower() != dolo_lower:
-            continue
-        if not log["topics"] or log["topics"][0] != TRANSFER_TOPIC:
-            continue
-        if len(log["topics"]) < 3:
-            continue
-
-        from_addr = "0x" + log["topics"][1][26:]
-        to_addr = "0x" + log["topics"][2][26:]
-        amount = int(log.get("data", "0x0"), 16) / 1e18
-
-        from_addr_l = from_addr.lower()
-        to_addr_l = to_addr.lower()
+    # Only look at DOLO token Transfer events
+    transfers = [log for log in receipt.get("logs", [])
+                 if log["address"].lower() == dolo_lower
+                 and len(log["topics"]) >= 3 and log["topics"][0] == TRANSFER_TOPIC]
+    addrs = columns([log["topics"][1][2:] + log["topics"][2][2:] for log in transfers],
+                    [("from", "address"), ("to", "address")])
+    amounts = uints([log.get("data", "0x0") for log in transfers], decimals=18)
 
+    for from_addr_l, to_addr_l, amount in zip(addrs["from"], addrs["to"], amounts):
         # Transfer FROM veDOLO contract
         if from_addr_l == vedolo_lower:
             if to_addr_l == zero_lower:
@@ -192,65 +165,53 @@ def main():
     print(f"   {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}")
     print("=" * 60)
 
-    # Load cache
-    cache = {}
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE) as f:
-            cache = json.load(f)
-        print(f"  📦 Loaded {len(cache)} cached tx receipts")
+    store = CacheStore(CACHE_DB)
+    migrated = store.migrate_json(CACHE_NS, LEGACY_CACHE_FILE)
+    if migrated:
+        print(f"  📦 Migrated {migrated} cached tx receipts from {os.path.basename(LEGACY_CACHE_FILE)}")
 
     # Phase 1: Fetch all Withdraw events
-    logs = fetch_withdraw_events()
+    logs = fetch_withdraw_events(store)
     if not logs:
         print("⚠️ No Withdraw events found!")
         sys.exit(0)
 
     # Phase 2: Decode events
     print(f"\n📊 Phase 2: Decoding {len(logs)} Withdraw events...")
-    events = []
-    for log in logs:
-        ev = decode_withdraw_event(log)
-        events.append(ev)
+    events = decode_withdraw_events(logs)
 
     # Phase 3: Fetch receipts and calculate penalties
     print(f"\n💰 Phase 3: Calculating penalties for {len(events)} events...")
 
     # Check which tx_hashes need receipts
+    cache = store.get_many(CACHE_NS, {ev["tx_hash"] for ev in events})
     tx_hashes_needed = [ev["tx_hash"] for ev in events if ev["tx_hash"] not in cache]
     print(f"  Cached: {len(events) - len(tx_hashes_needed)}/{len(events)}")
     print(f"  To fetch: {len(tx_hashes_needed)}")
 
-    # Fetch receipts for uncached transactions (parallel for speed)
+    # Fetch receipts for uncached transactions (concurrent on the shared client)
     if tx_hashes_needed:
-        done = 0
-        errors = 0
-        MAX_WORKERS = 8
-
-        def fetch_one(tx_hash):
-            return tx_hash, fetch_receipt_and_calc_penalty(tx_hash)
-
-        chunks = [tx_hashes_needed[i:i+MAX_WORKERS] for i in range(0, len(tx_hashes_needed), MAX_WORKERS)]
-        for chunk_idx, chunk in enumerate(chunks):
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = [executor.submit(fetch_one, th) for th in chunk]
-                for future in as_completed(futures):
-                    tx_hash, result = future.result()
-                    if result:
-                        cache[tx_hash] = result
-                    else:
-                        errors += 1
-                    done += 1
-
-            if (chunk_idx + 1) % 10 == 0 or (chunk_idx + 1) == len(chunks):
-                print(f"  Progress: {done:,}/{len(tx_hashes_needed):,} (errors: {errors})")
-                with open(CACHE_FILE, "w") as f:
-                    json.dump(cache, f)
-
-            time.sleep(0.05)  # Small delay between batches
-
-        # Final cache save
-        with open(CACHE_FILE, "w") as f:
-            json.dump(cache, f)
+        progress = {"done": 0, "errors": 0}
+
+        async def fetch_one(tx_hash):
+            return tx_hash, await fetch_receipt_and_calc_penalty(tx_hash, store)
+
+        async def fetch_all():
+            for future in asyncio.as_completed([fetch_one(th) for th in tx_hashes_needed]):
+                tx_hash, result = await future
+                if result:
+                    cache[tx_hash] = result
+                    store.put(CACHE_NS, tx_hash, result)
+                else:
+                    progress["errors"] += 1
+                progress["done"] += 1
+
+                if progress["done"] % 80 == 0 or progress["done"] == len(tx_hashes_needed):
+                    print(f"  Progress: {progress['done']:,}/{len(tx_hashes_needed):,} (errors: {progress['errors']})")
+                    store.commit()
+
+        rpc().run(fetch_all())
+    store.close()
 
 
     # Phase 4: Merge data and calculate stats
@@ -7,9 +7,12 @@ in GitHub Actions for reliability.
 
 import json
 import os
-import requests
 from datetime import datetime, timezone
 
+from abi_decode import uints
+from rpc_client import get_client
+from snapshot import PIN_LAG_BLOCKS
+
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_FILE = os.path.join(DATA_DIR, "odolo_contract_data.json")
 
@@ -35,35 +38,22 @@ RPC_URLS = [
 VESTER_PADDED = ODOLO_VESTER.replace("0x", "").lower().zfill(64)
 
 
-def rpc_batch(url, calls, timeout=15):
-    """Execute a batch of eth_call requests."""
-    batch = []
-    for i, (to, data) in enumerate(calls):
-        batch.append({
-            "jsonrpc": "2.0",
-            "method": "eth_call",
-            "params": [{"to": to, "data": data}, "latest"],
-            "id": i + 1
-        })
-
-    resp = requests.post(url, json=batch, timeout=timeout)
-    resp.raise_for_status()
-    results = resp.json()
-
-    if isinstance(results, list):
-        results.sort(key=lambda r: r.get("id", 0))
-        return [r.get("result", "0x0") for r in results]
+def pin_block(url):
+    """Block all reads of this run are pinned to (a few blocks behind head)."""
+    head = get_client([url]).call("eth_blockNumber", [])
+    if not head:
+        raise RuntimeError("eth_blockNumber failed")
+    return max(int(head, 16) - PIN_LAG_BLOCKS, 0)
 
-    # Single response (shouldn't happen with batch, but handle it)
-    return [results.get("result", "0x0")]
 
-
-def decode_uint256(hex_str):
-    """Decode a hex string to integer."""
-    if not hex_str or hex_str in ("0x", "0x0"):
-        return 0
-    clean = hex_str.replace("0x", "")[:64]
-    return int(clean, 16) if clean else 0
+def rpc_batch(url, calls, block):
+    """Execute a batch of eth_call requests at `block` against one endpoint (pooled client)."""
+    results = get_client([url]).batch([
+        ("eth_call", [{"to": to, "data": data}, hex(block)]) for to, data in calls
+    ])
+    if results is None:
+        raise RuntimeError("batch request failed")
+    return [r if r is not None else "0x0" for r in results]
 
 
 def main():
@@ -73,30 +63,34 @@ def main():
         try:
             print(f"   Trying {url}...")
 
+            block = pin_block(url)
+
             # Batch 1: Token data
             batch1 = rpc_batch(url, [
                 (ODOLO_TOKEN, SEL["totalSupply"]),
                 (ODOLO_TOKEN, SEL["decimals"]),
                 (ODOLO_TOKEN, SEL["balanceOf"] + VESTER_PADDED),
-            ])
+            ], block)
 
             # Batch 2: Vester data
             batch2 = rpc_batch(url, [
                 (ODOLO_VESTER, SEL["promisedTokens"]),
                 (ODOLO_VESTER, SEL["pushedTokens"]),
                 (ODOLO_VESTER, SEL["availableTokens"]),
-            ])
+            ], block)
 
-            decimals = decode_uint256(batch1[1]) or 18
+            total_supply, decimals, in_vester, promised, pushed, available = uints(batch1 + batch2)
+            decimals = decimals or 18
             divisor = 10 ** decimals
 
             data = {
-                "totalSupply": decode_uint256(batch1[0]) / divisor,
-                "inVesterBalance": decode_uint256(batch1[2]) / divisor,
-                "promisedTokens": decode_uint256(batch2[0]) / divisor,
-                "pushedTokens": decode_uint256(batch2[1]) / divisor,
-                "availableTokens": decode_uint256(batch2[2]) / divisor,
+                "totalSupply": total_supply / divisor,
+                "inVesterBalance": in_vester / divisor,
+                "promisedTokens": promised / divisor,
+                "pushedTokens": pushed / divisor,
+                "availableTokens": available / divisor,
                 "decimals": decimals,
+                "block": block,
                 "last_updated": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
                 "rpc_source": url,
             }
@@ -107,7 +101,7 @@ def main():
             with open(OUTPUT_FILE, "w") as f:
                 json.dump(data, f, indent=2)
 
-            print(f"   ✅ Saved odolo_contract_data.json")
+            print(f"   ✅ Saved odolo_contract_data.json (block {block:,})")
             print(f"   Total Supply: {data['totalSupply']:,.2f}")
             print(f"   Available in Vester: {data['availableTokens']:,.2f}")
             print(f"   Exercised (pushed): {data['pushedTokens']:,.2f}")
@@ -4,13 +4,15 @@ DOLO Token Holders — ERC-20 holder generator (ETH + Berachain)
 Fetches all ERC-20 Transfer events for DOLO on both chains,
 computes balances, merges holders, and outputs dolo_holders.json.
 """
-import json, time, os, sys
-import requests
+import os, sys
 from datetime import datetime
 
+from etherscan_client import etherscan, ExplorerError
+from eip55 import to_checksum_addresses
+from json_output import write_json
+
 # ===== CONFIG =====
 DOLO_CONTRACT = "0x0F81001eF0A83ecCE5ccebf63EB302c70a39a654"
-ETHERSCAN_V2 = "https://api.etherscan.io/v2/api"
 ZERO = "0x0000000000000000000000000000000000000000"
 
 CHAINS = {
@@ -36,83 +38,18 @@ def fetch_erc20_transfers(chain_key):
     print(f"\n📡 Fetching DOLO transfers on {cfg['name']}...")
 
     all_txs = []
-    seen = set()
-    start_block = 0
-    consecutive_errors = 0
-
-    while True:
-        params = {
-            "chainid": cfg["chain_id"],
-            "module": "account",
-            "action": "tokentx",
-            "contractaddress": DOLO_CONTRACT,
-            "startblock": start_block,
-            "endblock": 99999999,
-            "page": 1,
-            "offset": 10000,
-            "sort": "asc",
-            "apikey": api_key,
-        }
-
-        for retry in range(5):
-            try:
-                resp = requests.get(ETHERSCAN_V2, params=params, timeout=60)
-                data = resp.json()
-
-                if data.get("status") == "1" and isinstance(data.get("result"), list):
-                    results = data["result"]
-                    new_count = 0
-                    for tx in results:
-                        tx_key = tx.get("hash", "") + tx.get("logIndex", "")
-                        if tx_key not in seen:
-                            seen.add(tx_key)
-                            all_txs.append(tx)
-                            new_count += 1
-
-                    print(f"  Block {start_block}+: {len(results)} txs, {new_count} new (total: {len(all_txs)})")
-                    consecutive_errors = 0
-
-                    if len(results) < 10000:
-                        print(f"  ✅ {cfg['name']}: {len(all_txs)} transfers")
-                        return all_txs
-
-                    last_block = int(results[-1].get("blockNumber", start_block))
-                    start_block = last_block if last_block != start_block else last_block + 1
-                    time.sleep(0.3)
-                    break
-
-                elif "rate" in str(data.get("result", "")).lower() or "max rate" in str(data.get("message", "")).lower():
-                    wait_time = 3 * (retry + 1)
-                    print(f"  Rate limited, waiting {wait_time}s...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    if "No transactions" in str(data.get("result", "")):
-                        print(f"  ✅ {cfg['name']}: {len(all_txs)} transfers")
-                        return all_txs
-                    print(f"  ⚠️ API: {data.get('message')}: {str(data.get('result',''))[:200]}")
-                    consecutive_errors += 1
-                    if consecutive_errors >= 3:
-                        print(f"  ❌ Too many consecutive errors, returning {len(all_txs)} transfers so far")
-                        return all_txs
-                    time.sleep(2 * (retry + 1))
-                    continue
-
-            except requests.exceptions.Timeout:
-                print(f"  Timeout (retry {retry+1}/5), waiting {3*(retry+1)}s...")
-                time.sleep(3 * (retry + 1))
-            except Exception as e:
-                print(f"  Error: {e}, retry {retry+1}/5")
-                time.sleep(2 * (retry + 1))
-        else:
-            consecutive_errors += 1
-            print(f"  ❌ Failed after 5 retries at block {start_block}")
-            if consecutive_errors >= 3:
-                print(f"  ❌ Aborting {cfg['name']} — returning {len(all_txs)} transfers")
-                break
-            # Try next block range
-            start_block += 10000
-
+    pages = etherscan(cfg["chain_id"], api_key).paginate_blocks(
+        key=lambda tx: tx.get("hash", "") + tx.get("logIndex", ""),
+        module="account", action="tokentx", contractaddress=DOLO_CONTRACT)
+    try:
+        for page_start, new_txs in pages:
+            all_txs.extend(new_txs)
+            print(f"  Block {page_start}+: {len(new_txs)} new (total: {len(all_txs)})")
+    except ExplorerError as e:
+        print(f"  ❌ {e} — returning {len(all_txs)} transfers so far")
+        return all_txs
+
+    print(f"  ✅ {cfg['name']}: {len(all_txs)} transfers")
     return all_txs
 
 
@@ -177,16 +114,8 @@ def merge_holders(eth_balances, bera_balances):
         h["rank"] = i
 
     # Checksum addresses
-    try:
-        from web3 import Web3
-        for h in holders:
-            try:
-                h["address"] = Web3.to_checksum_address(h["address"])
-            except Exception:
-                pass
-    except ImportError:
-        # Capitalize hex manually (basic checksum)
-        pass
+    for h, address in zip(holders, to_checksum_addresses(h["address"] for h in holders)):
+        h["address"] = address
 
     return holders
 
@@ -235,10 +164,9 @@ def main():
         "holders": holders,
     }
 
-    with open(OUTPUT_JSON, "w") as f:
-        json.dump(output, f, indent=2)
+    json_size = write_json(OUTPUT_JSON, output)
 
-    print(f"\n💾 Saved: dolo_holders.json")
+    print(f"\n💾 Saved: dolo_holders.json ({json_size / 1024:,.0f} KB)")
     print(f"   Total holders: {stats['total_holders']:,}")
     print(f"   ETH only: {eth_only:,}  |  BERA only: {bera_only:,}  |  Both: {both_chains:,}")
     print(f"   Total supply tracked: {total_supply:,.2f} DOLO")
@@ -2,104 +2,82 @@
 """
 Generate exercisers_by_address.json with per-address aggregation AND per-tx details
 including lock duration, oDOLO amount, and price per veDOLO.
+
+Incremental: the previous output carries a last_block checkpoint, and only
+exercises from that block on are folded into the existing per-address
+totals. `--full` rebuilds from scratch.
 """
 
-import requests
-import time
 import json
-from collections import defaultdict
+import math
+import os
+import sys
+import time
+from bisect import bisect_right
 from datetime import datetime
 
-ROUTESCAN_API = "https://api.routescan.io/v2/network/mainnet/evm/80094/etherscan/api"
-VESTER_CONTRACT = "0x3E9b9A16743551DA49b5e136C716bBa7932d2cEc"
-USDC_E_CONTRACT = "0x549943e04f40284185054145c6e4e9568c1d3241".lower()
-ODOLO_CONTRACT = "0x02e513b5b54ee216bf836ceb471507488fc89543".lower()
-TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
-EXERCISE_METHOD_ID = "0xa88f8139"
-USDC_DECIMALS = 6
-ODOLO_DECIMALS = 18
-
-PAGE_SIZE = 100
-RATE_LIMIT_DELAY = 0.2
-
-
-def get_all_transactions():
-    all_txs = []
-    page = 1
-    while True:
-        print(f"  Fetching page {page}...")
-        params = {
-            "module": "account", "action": "txlist",
-            "address": VESTER_CONTRACT,
-            "startblock": 0, "endblock": 99999999,
-            "page": page, "offset": PAGE_SIZE, "sort": "asc"
-        }
-        resp = requests.get(ROUTESCAN_API, params=params)
-        data = resp.json()
-        if data["status"] != "1" or not data["result"]:
-            break
-        txs = data["result"]
-        all_txs.extend(txs)
-        if (page % 10 == 0):
-            print(f"    Total: {len(all_txs)}")
-        if len(txs) < PAGE_SIZE:
-            break
-        page += 1
-        time.sleep(RATE_LIMIT_DELAY)
-    return all_txs
-
-
-def extract_lock_duration(tx):
-    """Extract lock duration in days from tx input data."""
-    inp = tx["input"]
-    if len(inp) < 266:
-        return None
-    params_hex = inp[10:]
-    lock_end = int(params_hex[2*64:3*64], 16)
-    tx_time = int(tx["timeStamp"])
-    duration_seconds = lock_end - tx_time
-    if duration_seconds <= 0 or duration_seconds > 3 * 365 * 86400:
-        return None
-    return round(duration_seconds / 86400, 1)
-
+from vester_index import (exercise_amounts, load as load_vester_index, lock_durations,
+                          unresolved_exercises, with_retries)
+from json_output import write_json
 
-def get_tx_details_from_receipt(tx_hash):
-    """Get USDC.e amount AND oDOLO amount from a tx receipt."""
-    params = {
-        "module": "proxy",
-        "action": "eth_getTransactionReceipt",
-        "txhash": tx_hash
-    }
-    resp = requests.get(ROUTESCAN_API, params=params)
-    data = resp.json()
-    if "result" not in data or data["result"] is None:
-        return None, None
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_FILE = os.path.join(SCRIPT_DIR, "exercisers_by_address.json")
 
-    usdc_amount = None
-    odolo_amount = None
 
-    for log in data["result"].get("logs", []):
-        if len(log["topics"]) < 3 or log["topics"][0] != TRANSFER_TOPIC:
-            continue
+def load_previous():
+    """Previous output with its last_block checkpoint, or None (full rebuild)."""
+    if not os.path.exists(OUTPUT_FILE):
+        return None
+    try:
+        with open(OUTPUT_FILE) as f:
+            previous = json.load(f)
+        previous["last_block"] = int(previous["last_block"])
+        if not isinstance(previous["exercisers"], list):
+            raise ValueError("exercisers is not a list")
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"  ⚠️ No usable checkpoint in {os.path.basename(OUTPUT_FILE)} ({e}) — full rebuild")
+        return None
+    return previous
 
-        token_addr = log["address"].lower()
-        to_addr = "0x" + log["topics"][2][26:].lower()
 
-        # USDC.e payment: from user TO vester
-        if token_addr == USDC_E_CONTRACT and to_addr == VESTER_CONTRACT.lower():
-            usdc_amount = int(log["data"], 16) / (10 ** USDC_DECIMALS)
+def new_address_entry():
+    return {"total_usdc": 0, "exercises": 0, "lock_days_sum": 0,
+            "lock_count": 0, "first": None, "last": None, "txs": []}
 
-        # oDOLO burn: from vester TO 0x0 (burn address) during exercise
-        # The burned oDOLO amount = veDOLO received (1:1)
-        if token_addr == ODOLO_CONTRACT:
-            from_addr = "0x" + log["topics"][1][26:].lower()
-            to_addr_check = "0x" + log["topics"][2][26:].lower()
-            if from_addr == VESTER_CONTRACT.lower() and to_addr_check == "0x0000000000000000000000000000000000000000":
-                raw = log.get("data", "0x")
-                if len(raw) > 2:
-                    odolo_amount = int(raw, 16) / (10 ** ODOLO_DECIMALS)
 
-    return usdc_amount, odolo_amount
+def address_data_from(previous):
+    """Per-address aggregation state rebuilt from a previous output (totals
+    carry over unrounded from total_usdc_exact; lock sums come from the txs)."""
+    address_data = {}
+    for r in previous["exercisers"]:
+        lock_days = [tx["lock_days"] for tx in r["txs"] if tx.get("lock_days") is not None]
+        address_data[r["address"]] = {
+            "total_usdc": r.get("total_usdc_exact", r["total_usdc"]), "exercises": r["exercises"],
+            "lock_days_sum": sum(lock_days), "lock_count": len(lock_days),
+            "first": r["first"], "last": r["last"], "txs": r["txs"],
+        }
+    return address_data
+
+
+def rerank(ranked, totals, changed):
+    """Ranking by total USDC after the addresses in `changed` moved. The list
+    is only rebuilt when an order actually changes. Returns (ranked, moved)."""
+    position = {addr: i for i, addr in enumerate(ranked)}
+    in_place = all(
+        addr in position
+        and (position[addr] == 0 or totals[ranked[position[addr] - 1]] >= totals[addr])
+        and (position[addr] == len(ranked) - 1 or totals[ranked[position[addr] + 1]] <= totals[addr])
+        for addr in changed)
+    if in_place:
+        return ranked, False
+
+    kept = [addr for addr in ranked if addr not in changed]
+    keys = [-totals[addr] for addr in kept]
+    for addr in sorted(changed, key=lambda a: -totals[a]):
+        i = bisect_right(keys, -totals[addr])
+        kept.insert(i, addr)
+        keys.insert(i, -totals[addr])
+    return kept, True
 
 
 def main():
@@ -107,36 +85,50 @@ def main():
     print("oDOLO Exercisers — Enhanced Data Generator")
     print("=" * 60)
 
-    print("\n[1/3] Fetching Vester transactions...")
-    all_txs = get_all_transactions()
-    print(f"  Total: {len(all_txs)}")
-
-    exercise_txs = [
-        tx for tx in all_txs
-        if tx.get("methodId") == EXERCISE_METHOD_ID
-        and tx.get("isError") == "0"
-        and tx.get("txreceipt_status") == "1"
-    ]
-    print(f"\n[2/3] Exercise transactions: {len(exercise_txs)}")
-
-    print("\n[3/3] Scanning receipts for USDC.e + oDOLO amounts + lock durations...")
-    address_data = defaultdict(lambda: {
-        "total_usdc": 0, "exercises": 0, "lock_days_sum": 0,
-        "lock_count": 0, "first": None, "last": None, "txs": []
-    })
+    print("\n[1/3] Syncing the Vester index...")
+    index = load_vester_index()
+
+    previous = None if "--full" in sys.argv else load_previous()
+    if previous is None:
+        address_data, ranked, last_block, known, unresolved = {}, [], 0, set(), set()
+    else:
+        address_data = address_data_from(previous)
+        ranked = [r["address"] for r in previous["exercisers"]]
+        last_block = previous["last_block"]
+        known = {tx["hash"] for d in address_data.values() for tx in d["txs"]}
+        unresolved = set(previous.get("unresolved", []))
+        print(f"  Checkpoint: block {last_block:,} ({len(known):,} exercises aggregated, "
+              f"{len(unresolved)} unresolved)")
+
+    # The checkpoint block is re-checked: more of its txs may have been indexed since.
+    # Exercises whose amounts could not be resolved last time are retried.
+    exercise_txs = with_retries(index, [tx for tx in index["txs"]
+                                        if int(tx["blockNumber"]) >= last_block and tx["hash"] not in known],
+                                unresolved)
+    print(f"\n[2/3] New exercise transactions: {len(exercise_txs)}")
+    if previous is not None and not exercise_txs and index["last_block"] <= last_block:
+        print("  No new exercises. Done.")
+        return
+
+    print("\n[3/3] Matching USDC.e + oDOLO amounts + lock durations...")
+    amounts = exercise_amounts(exercise_txs)
+    changed = set()
     errors = 0
 
+    durations = lock_durations(exercise_txs)
+
     for i, tx in enumerate(exercise_txs):
         tx_hash = tx["hash"]
         addr = tx["from"].lower()
         timestamp = int(tx["timeStamp"])
         date_str = time.strftime("%Y-%m-%d", time.gmtime(timestamp))
 
-        usdc_amount, odolo_amount = get_tx_details_from_receipt(tx_hash)
-        lock_days = extract_lock_duration(tx)
+        usdc_amount, odolo_amount = amounts[tx_hash.lower()]
+        lock_days = round(durations[i] / 86400, 1) if durations[i] is not None else None
 
         if usdc_amount is not None:
-            d = address_data[addr]
+            d = address_data.setdefault(addr, new_address_entry())
+            changed.add(addr)
             d["total_usdc"] += usdc_amount
             d["exercises"] += 1
             if lock_days is not None:
@@ -167,41 +159,47 @@ def main():
         if (i + 1) % 100 == 0 or i == len(exercise_txs) - 1:
             print(f"  [{i+1}/{len(exercise_txs)}] Addresses: {len(address_data)}")
 
-        time.sleep(RATE_LIMIT_DELAY)
-
-    # Build sorted list
-    exercisers = []
-    for addr, d in address_data.items():
-        avg_lock = round(d["lock_days_sum"] / d["lock_count"], 1) if d["lock_count"] > 0 else None
-        exercisers.append({
-            "address": addr,
-            "total_usdc": round(d["total_usdc"], 2),
-            "exercises": d["exercises"],
-            "avg_lock_days": avg_lock,
-            "first": d["first"],
-            "last": d["last"],
-            "txs": d["txs"]
-        })
+    # Rank addresses (only re-sorted if a ranking moved); records are built while streaming them to disk
+    totals = {addr: round(d["total_usdc"], 2) for addr, d in address_data.items()}
+    if previous is None:
+        ranked = sorted(address_data, key=lambda a: totals[a], reverse=True)
+    else:
+        ranked, moved = rerank(ranked, totals, changed)
+        print(f"  {len(changed)} addresses updated, ranking {'re-sorted' if moved else 'unchanged'}")
 
-    exercisers.sort(key=lambda x: x["total_usdc"], reverse=True)
+    def exerciser_records():
+        for addr in ranked:
+            d = address_data[addr]
+            avg_lock = round(d["lock_days_sum"] / d["lock_count"], 1) if d["lock_count"] > 0 else None
+            yield {
+                "address": addr,
+                "total_usdc": totals[addr],
+                "total_usdc_exact": d["total_usdc"],  # unrounded running total for the next run
+                "exercises": d["exercises"],
+                "avg_lock_days": avg_lock,
+                "first": d["first"],
+                "last": d["last"],
+                "txs": d["txs"]
+            }
 
     result = {
         "updated": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "total_addresses": len(exercisers),
-        "total_usdc": round(sum(e["total_usdc"] for e in exercisers), 2),
-        "total_exercises": sum(e["exercises"] for e in exercisers),
-        "exercisers": exercisers
+        "last_block": max(index["last_block"], last_block),
+        "total_addresses": len(ranked),
+        "total_usdc": round(math.fsum(d["total_usdc"] for d in address_data.values()), 2),
+        "total_exercises": sum(d["exercises"] for d in address_data.values()),
+        "unresolved": unresolved_exercises(exercise_txs, amounts),  # retried next run
+        "exercisers": exerciser_records()
     }
 
-    with open("exercisers_by_address.json", "w") as f:
-        json.dump(result, f, indent=2)
+    write_json(OUTPUT_FILE, result)
 
     print(f"\n{'=' * 60}")
     print(f"DONE!")
-    print(f"  Unique addresses:  {len(exercisers)}")
+    print(f"  Unique addresses:  {len(ranked)}")
     print(f"  Total USDC.e:      ${result['total_usdc']:,.2f}")
     print(f"  Total exercises:   {result['total_exercises']}")
-    print(f"  Errors:            {errors}")
+    print(f"  Errors:            {errors} (retried next run)")
     print(f"  Saved to exercisers_by_address.json")
 
 
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Append-only history of veDOLO holder stats (stdlib sqlite3).
+
+update_data.py appends one run per update:
+  - runs:    run_id, block, unix timestamp
+  - stats:   one row per (metric, run) — every numeric value of the
+             vedolo_holders.json "stats" object (total_locked_dolo,
+             total_vote_weight, unique_holders, ...)
+  - changes: per-holder position, written only when it differs from the
+             holder's previous position (delta encoding); a holder that
+             exits gets a row with nft_count 0
+
+Vote weight decays every block, so it is kept as a stats series only; the
+per-holder rows track what changes on lock/transfer events.
+
+The db is kept on the holder-history branch (latest copy only, see the
+workflow). vedolo_holders.json records history_runs, and update_data.py
+refuses to run when the db is missing or holds fewer runs than that
+(instead of silently starting a new history).
+
+Reading:
+    python3 holder_history.py metric total_locked_dolo
+    python3 holder_history.py holder 0xabc...
+"""
+
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_DB = os.path.join(DATA_DIR, "holder_history.db")
+
+POSITION_FIELDS = ("nft_count", "total_dolo", "earliest_lock_end", "latest_lock_end")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    block  INTEGER,
+    ts     INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    metric TEXT    NOT NULL,
+    run_id INTEGER NOT NULL,
+    value  REAL    NOT NULL,
+    PRIMARY KEY (metric, run_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS changes (
+    address           TEXT    NOT NULL,
+    run_id            INTEGER NOT NULL,
+    nft_count         INTEGER NOT NULL,
+    total_dolo        REAL    NOT NULL,
+    earliest_lock_end INTEGER NOT NULL,
+    latest_lock_end   INTEGER NOT NULL,
+    PRIMARY KEY (address, run_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS latest (
+    address           TEXT PRIMARY KEY,
+    nft_count         INTEGER NOT NULL,
+    total_dolo        REAL    NOT NULL,
+    earliest_lock_end INTEGER NOT NULL,
+    latest_lock_end   INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class HolderHistory:
+    def __init__(self, path=HISTORY_DB):
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+
+    def append(self, block, ts, stats, holders):
+        """Record one run. Returns (run_id, changed_holders), or (None, 0) if
+        this block is already recorded (e.g. a resumed run)."""
+        if block is not None and self._db.execute(
+                "SELECT 1 FROM runs WHERE block = ?", (block,)).fetchone():
+            return None, 0
+
+        with self._db:
+            run_id = self._db.execute("INSERT INTO runs (block, ts) VALUES (?, ?)", (block, ts)).lastrowid
+            self._db.executemany(
+                "INSERT INTO stats (metric, run_id, value) VALUES (?, ?, ?)",
+                [(k, run_id, v) for k, v in stats.items()
+                 if isinstance(v, (int, float)) and not isinstance(v, bool)])
+
+            previous = {row[0]: row[1:] for row in self._db.execute("SELECT * FROM latest")}
+            current = {h["address"].lower(): tuple(h.get(f, 0) for f in POSITION_FIELDS) for h in holders}
+            exited = (0,) * len(POSITION_FIELDS)
+
+            changed = [(addr, pos) for addr, pos in current.items() if previous.get(addr) != pos]
+            changed += [(addr, exited) for addr in previous if addr not in current]
+            self._db.executemany(
+                "INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?)",
+                [(addr, run_id, *pos) for addr, pos in changed])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?, ?)",
+                [(addr, *pos) for addr, pos in changed if pos != exited])
+            self._db.executemany(
+                "DELETE FROM latest WHERE address = ?",
+                [(addr,) for addr, pos in changed if pos == exited])
+        return run_id, len(changed)
+
+    def run_count(self):
+        return self._db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def metrics(self):
+        return [m for (m,) in self._db.execute("SELECT DISTINCT metric FROM stats ORDER BY metric")]
+
+    def metric_series(self, metric, since=None):
+        """[(ts, block, value), ...] for one stats metric, oldest first."""
+        return self._db.execute(
+            "SELECT r.ts, r.block, s.value FROM stats s JOIN runs r USING (run_id) "
+            "WHERE s.metric = ? AND r.ts >= ? ORDER BY s.run_id",
+            (metric, since or 0)).fetchall()
+
+    def holder_trajectory(self, address):
+        """[(ts, block, {nft_count, total_dolo, earliest_lock_end, latest_lock_end}), ...]
+        — one entry per run in which the holder's position changed."""
+        rows = self._db.execute(
+            "SELECT r.ts, r.block, c.nft_count, c.total_dolo, c.earliest_lock_end, c.latest_lock_end "
+            "FROM changes c JOIN runs r USING (run_id) WHERE c.address = ? ORDER BY c.run_id",
+            (address.lower(),)).fetchall()
+        return [(ts, block, dict(zip(POSITION_FIELDS, pos))) for ts, block, *pos in rows]
+
+    def close(self):
+        self._db.close()
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] not in ("metric", "holder"):
+        print("Usage: holder_history.py metric <name> | holder <address>")
+        sys.exit(1)
+
+    history = HolderHistory()
+    if sys.argv[1] == "metric":
+        series = history.metric_series(sys.argv[2])
+        if not series:
+            print(f"No data for {sys.argv[2]!r}. Metrics: {', '.join(history.metrics())}")
+        for ts, block, value in series:
+            print(f"{datetime.utcfromtimestamp(ts):%Y-%m-%d %H:%M}  {block or '-':>10}  {value:>18,.4f}")
+    else:
+        for ts, block, pos in history.holder_trajectory(sys.argv[2]):
+            print(f"{datetime.utcfromtimestamp(ts):%Y-%m-%d %H:%M}  {block or '-':>10}  "
+                  f"{pos['nft_count']:>4} NFT  {pos['total_dolo']:>14,.2f} DOLO")
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Streaming, compact JSON writer for the dashboard's output artifacts.
+
+write_json() encodes incrementally and flushes to disk in FLUSH_BYTES
+pieces, so generators and iterators anywhere in the document are written
+as JSON arrays record by record instead of being materialised first.
+Output uses compact separators and floats rounded to `float_digits`
+(NaN/inf become null). The file is written to a temp path and swapped in
+with os.replace(), so the dashboard never sees a half-written file.
+
+Optional pre-compressed siblings (vedolo_holders.json.gz / .br) are
+written in the same pass: pass compress=("gz", "br") or set
+JSON_COMPRESS=gz,br. Brotli needs the `brotli` package and is skipped
+when it is not installed.
+"""
+
+import gzip
+import json
+import math
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FLUSH_BYTES = 64 * 1024
+FLOAT_DIGITS = 6
+DEFAULT_COMPRESS = tuple(c for c in os.environ.get("JSON_COMPRESS", "").split(",") if c)
+
+_encode_str = json.encoder.encode_basestring_ascii
+
+
+class _Sink:
+    """Buffered writer that tees into the plain file and compressed siblings."""
+
+    def __init__(self, path, compress):
+        self.targets = [(path, path + ".tmp")]
+        self.raw = open(path + ".tmp", "w", encoding="utf-8")
+        self.gz = None
+        self.br = None
+        if "gz" in compress:
+            self.targets.append((path + ".gz", path + ".gz.tmp"))
+            self.gz_file = open(path + ".gz.tmp", "wb")
+            # mtime=0 keeps the archive byte-identical when the JSON is unchanged
+            self.gz = gzip.GzipFile(os.path.basename(path), "wb", 9, self.gz_file, mtime=0)
+        if "br" in compress:
+            if brotli is None:
+                print(f"   ⚠️ brotli not installed — skipping {os.path.basename(path)}.br")
+            else:
+                self.targets.append((path + ".br", path + ".br.tmp"))
+                self.br_file = open(path + ".br.tmp", "wb")
+                self.br = brotli.Compressor(mode=brotli.MODE_TEXT)
+        self.buf = []
+        self.size = 0
+
+    def write(self, s):
+        self.buf.append(s)
+        self.size += len(s)
+        if self.size >= FLUSH_BYTES:
+            self.flush()
+
+    def flush(self):
+        chunk = "".join(self.buf)
+        self.buf, self.size = [], 0
+        self.raw.write(chunk)
+        if self.gz or self.br:
+            data = chunk.encode("utf-8")
+            if self.gz:
+                self.gz.write(data)
+            if self.br:
+                self.br_file.write(self.br.process(data))
+
+    def close(self, commit=True):
+        if commit:
+            self.flush()
+        self.raw.close()
+        if self.gz:
+            self.gz.close()
+            self.gz_file.close()
+        if self.br:
+            if commit:
+                self.br_file.write(self.br.finish())
+            self.br_file.close()
+        for final, tmp in self.targets:
+            if commit:
+                os.replace(tmp, final)
+            elif os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def _write_value(out, value, digits):
+    if isinstance(value, str):
+        out.write(_encode_str(value))
+    elif value is None or value is True or value is False:
+        out.write("null" if value is None else "true" if value else "false")
+    elif isinstance(value, int):
+        out.write(int.__repr__(value))
+    elif isinstance(value, float):
+        out.write(repr(round(float(value), digits)) if math.isfinite(value) else "null")
+    elif isinstance(value, dict):
+        out.write("{")
+        first = True
+        for k, v in value.items():
+            if not first:
+                out.write(",")
+            first = False
+            out.write(_encode_str(str(k)))
+            out.write(":")
+            _write_value(out, v, digits)
+        out.write("}")
+    else:
+        # lists, tuples, generators and any other iterable stream as arrays
+        out.write("[")
+        first = True
+        for item in value:
+            if not first:
+                out.write(",")
+            first = False
+            _write_value(out, item, digits)
+        out.write("]")
+
+
+def write_json(path, obj, float_digits=FLOAT_DIGITS, compress=DEFAULT_COMPRESS):
+    """Stream obj to path as compact JSON (plus optional .gz/.br siblings).
+
+    Any iterable value (e.g. a generator of holder records) is consumed
+    lazily and written as an array. Returns the size of the plain file.
+    """
+    sink = _Sink(path, compress)
+    try:
+        _write_value(sink, obj, float_digits)
+    except BaseException:
+        sink.close(commit=False)
+        raise
+    sink.close()
+    return os.path.getsize(path)
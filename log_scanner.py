@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Adaptive eth_getLogs scanner with a persisted block checkpoint.
+
+LogScanner walks [from_block, head] for one (address, topics) filter:
+  - the window widens (x2) while ranges come back sparse and narrows when
+    they get dense, so empty history costs a handful of calls,
+  - a provider limit error ("more than 10000 results", "block range too
+    large", response size) splits the window in half and retries it,
+  - a failed call (all endpoints) is retried with backoff on a smaller
+    window; after MAX_FAILURES in a row the scan raises ScanError instead of
+    silently skipping the range.
+
+Logs go to the `logs` table of cache.db (cache_store.py) in chain order and
+the last fully scanned block is checkpointed in kv (ns "log_scans"), kept
+FINALITY_DEPTH blocks behind the head so reorged logs are re-scanned. The
+next run only scans new blocks; scan() returns every stored log.
+
+A cold (or far behind) scan is backfilled in parallel instead: the gap is
+cut into SHARD_BLOCKS shards that workers on every endpoint scan at the same
+time, each endpoint held to its own ENDPOINT_RPS token bucket. A shard's logs
+are committed together with its "done" mark, so an interrupted backfill
+resumes with the shards still missing. Works for any (address, topics)
+filter:
+
+    logs = scan_logs(RPC_URLS, VEDOLO_CONTRACT, [WITHDRAW_TOPIC], store)
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from etherscan_client import TokenBucket
+from rpc_client import get_client
+
+INITIAL_SPAN = 10_000
+MAX_SPAN = 2_000_000
+TARGET_LOGS = 2_000  # narrow the window when one returns more than this
+MAX_FAILURES = 6
+FINALITY_DEPTH = 128
+CHECKPOINT_NS = "log_scans"
+
+SHARD_BLOCKS = 250_000
+BACKFILL_MIN_BLOCKS = 1_000_000  # gaps at least this long are backfilled in shards
+SHARDS_PER_ENDPOINT = 2  # shards scanned at once on one endpoint
+ENDPOINT_RPS = float(os.environ.get("LOG_SCAN_RPS", "5"))  # per-endpoint request rate while backfilling
+SHARD_RETRIES = 2  # failed shards before an endpoint stops taking new ones
+
+_RATE_LIMIT = re.compile(r"rate|too many requests|capacity|credits", re.I)
+_TOO_BIG = re.compile(r"more than|too many|too large|exceed|limit|range|size|results|timeout|timed out", re.I)
+_RANGE_CAP = re.compile(r"range|block", re.I)
+
+
+class ScanError(Exception):
+    pass
+
+
+def scan_id(address, topics):
+    """Stable name of a (address, topics) filter."""
+    spec = json.dumps([address.lower(), [t.lower() if isinstance(t, str) else t for t in topics]])
+    return hashlib.sha1(spec.encode()).hexdigest()[:16]
+
+
+class LogScanner:
+    def __init__(self, client, address, topics, store, name=None, limiter=None,
+                 initial_span=INITIAL_SPAN, max_span=MAX_SPAN, finality_depth=FINALITY_DEPTH):
+        self.client = client
+        self.limiter = limiter
+        self.address = address
+        self.topics = list(topics)
+        self.store = store
+        self.name = name or scan_id(address, topics)
+        self.finality_depth = finality_depth
+        state = store.get(CHECKPOINT_NS, self.name) or {}
+        self.last_block = state.get("last_block", -1)
+        self.max_span = state.get("max_span", max_span)
+        self.span = min(state.get("span", initial_span), self.max_span)
+        self.calls = 0
+
+    def _split_error(self, error):
+        """True if an error body means "ask for less" rather than "try again"."""
+        message = str(error.get("message", "")) if isinstance(error, dict) else str(error)
+        return bool(_TOO_BIG.search(message)) and not _RATE_LIMIT.search(message)
+
+    async def get_logs(self, from_block, to_block):
+        """eth_getLogs for one window: (logs, None), (None, error) or (None, None) on failure."""
+        if self.limiter:
+            await asyncio.get_running_loop().run_in_executor(None, self.limiter.acquire)
+        self.calls += 1
+        response = await self.client.arequest("eth_getLogs", [{
+            "address": self.address, "topics": self.topics,
+            "fromBlock": hex(from_block), "toBlock": hex(to_block)}])
+        if response is None:
+            return None, None
+        if "error" in response:
+            return None, response["error"]
+        return response.get("result") or [], None
+
+    async def ascan_range(self, from_block, to_block, on_window=None):
+        """Scan [from_block, to_block] adaptively; calls on_window(start, end, logs)
+        for every completed window, in block order. Returns the log count."""
+        block, failures, total = from_block, 0, 0
+        while block <= to_block:
+            end = min(block + self.span - 1, to_block)
+            logs, error = await self.get_logs(block, end)
+
+            if logs is None and error is not None and self._split_error(error):
+                if end == block:
+                    raise ScanError(f"eth_getLogs rejects single block {block:,}: {error}")
+                if _RANGE_CAP.search(str(error)):
+                    self.max_span = max(1, min(self.max_span, (end - block + 1) // 2))
+                self.span = max(1, (end - block + 1) // 2)
+                continue
+            if logs is None:
+                failures += 1
+                if failures >= MAX_FAILURES:
+                    raise ScanError(f"eth_getLogs {block:,}-{end:,} failed {failures} times: {error}")
+                self.span = max(1, self.span // 2)
+                await asyncio.sleep(min(2 ** failures * 0.5, 30))
+                continue
+
+            failures = 0
+            total += len(logs)
+            if on_window:
+                on_window(block, end, logs)
+            if len(logs) > TARGET_LOGS:
+                self.span = max(1, self.span // 2)
+            elif len(logs) < TARGET_LOGS // 4:
+                self.span = min(self.max_span, self.span * 2)
+            block = end + 1
+        return total
+
+    def _save(self, head):
+        state = {"last_block": self.last_block, "span": self.span, "max_span": self.max_span, "head": head}
+        self.store.put(CHECKPOINT_NS, self.name, state)
+        self.store.commit()
+
+    def scan(self, head=None, from_block=0, backfill_urls=None):
+        """Scan everything past the checkpoint up to head (latest block if None)
+        and return all stored logs of this filter, in chain order. With
+        backfill_urls, a long gap (or an unfinished backfill) is scanned as
+        parallel shards over those endpoints first."""
+        if head is None:
+            latest = self.client.call("eth_blockNumber", [])
+            if not latest:
+                raise ScanError("eth_blockNumber failed")
+            head = int(latest, 16)
+        safe = max(head - self.finality_depth, -1)
+        start = max(self.last_block + 1, from_block)
+        plan = self.store.get(CHECKPOINT_NS, self.name + ":backfill")
+        resume = plan is not None and plan["start"] == start
+        if not resume:
+            # Logs past the checkpoint were not final yet — drop and re-scan them
+            # (an unfinished backfill only holds completed, final shards there)
+            self.store.drop_logs(self.name, after_block=self.last_block)
+        if backfill_urls and (resume or safe - start + 1 >= BACKFILL_MIN_BLOCKS):
+            end = plan["end"] if resume else safe
+            backfill(backfill_urls, self.address, self.topics, self.store, self.name, start, end)
+            self.last_block = end
+            self.store.put(CHECKPOINT_NS, self.name + ":backfill", None)
+            self._save(head)
+            start = end + 1
+
+        def on_window(window_start, window_end, logs):
+            self.store.put_logs(self.name, logs)
+            if logs:
+                print(f"  Block {window_start:,}-{window_end:,}: {len(logs)} events")
+            if min(window_end, safe) > self.last_block:
+                self.last_block = min(window_end, safe)
+                self._save(head)
+
+        if start <= head:
+            print(f"  🔭 Scanning blocks {start:,}-{head:,} (checkpoint {self.last_block:,}, window {self.span:,})")
+            found = self.client.run(self.ascan_range(start, head, on_window))
+            self.store.commit()
+            print(f"  ✅ {found:,} new events in {self.calls:,} getLogs calls")
+        return self.store.get_logs(self.name, from_block)
+
+
+def backfill(urls, address, topics, store, name, start, end, shard_blocks=SHARD_BLOCKS, rate=ENDPOINT_RPS):
+    """Scan [start, end] as shards spread over every endpoint in urls and
+    store the logs under `name`. The shard plan and completed shards live
+    in kv, so calling it again after a crash only scans what is missing.
+    Raises ScanError if shards are left over (every endpoint kept failing)."""
+    key = name + ":backfill"
+    plan = store.get(CHECKPOINT_NS, key)
+    if not plan or plan["start"] != start:
+        plan = {"start": start, "end": end, "shard_blocks": shard_blocks, "done": []}
+        store.put(CHECKPOINT_NS, key, plan)
+        store.commit()
+    end, shard_blocks = plan["end"], plan["shard_blocks"]
+    shards = [(i, a, min(a + shard_blocks - 1, end)) for i, a in enumerate(range(start, end + 1, shard_blocks))]
+    done = set(plan["done"])
+    todo = queue.Queue()
+    for shard in shards:
+        if shard[0] not in done:
+            todo.put(shard)
+    print(f"  🧩 Backfilling blocks {start:,}-{end:,}: {todo.qsize()}/{len(shards)} shards "
+          f"over {len(urls)} endpoints")
+
+    lock = threading.Lock()
+    failures = {url: 0 for url in urls}
+
+    def worker(url, bucket):
+        client = get_client([url])
+        while failures[url] < SHARD_RETRIES:
+            try:
+                i, a, b = todo.get_nowait()
+            except queue.Empty:
+                return
+            logs = []
+            scanner = LogScanner(client, address, topics, store, name=name, limiter=bucket)
+            try:
+                client.run(scanner.ascan_range(a, b, lambda _a, _b, window: logs.extend(window)))
+            except ScanError as e:
+                print(f"  ⚠️ Shard {a:,}-{b:,} failed on {url}: {e}")
+                with lock:
+                    failures[url] += 1
+                todo.put((i, a, b))
+                continue
+            with lock:
+                store.put_logs(name, logs)
+                done.add(i)
+                store.put(CHECKPOINT_NS, key, dict(plan, done=sorted(done)))
+                store.commit()
+                print(f"  [{len(done)}/{len(shards)}] Blocks {a:,}-{b:,}: {len(logs)} events "
+                      f"({scanner.calls} calls, {url})")
+
+    workers = [(url, TokenBucket(rate)) for url in urls]
+    with ThreadPoolExecutor(max_workers=len(workers) * SHARDS_PER_ENDPOINT) as pool:
+        # each worker runs in a copy of the caller's context (e.g. run_jobs' job name)
+        for future in [pool.submit(contextvars.copy_context().run, worker, url, bucket)
+                       for url, bucket in workers for _ in range(SHARDS_PER_ENDPOINT)]:
+            future.result()
+    if len(done) < len(shards):
+        raise ScanError(f"backfill incomplete: {len(shards) - len(done)} shards left (the next run resumes them)")
+
+
+def scan_logs(urls, address, topics, store, name=None, head=None):
+    """Every log of one (address, topics) filter up to head, in chain order:
+    a parallel shard backfill over all urls when the store is far behind,
+    then the adaptive incremental scan."""
+    return LogScanner(get_client(urls), address, topics, store, name).scan(head, backfill_urls=urls)
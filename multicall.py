@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Multicall3 helpers — pack many read-only calls into a single eth_call.
+
+Multicall3 is deployed at the same address on every EVM chain (incl. Berachain).
+aggregate3((address target, bool allowFailure, bytes callData)[]) returns
+(bool success, bytes returnData)[], so one failing sub-call does not revert
+the whole batch.
+"""
+
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3_SELECTOR = "0x82ad56cb"  # aggregate3((address,bool,bytes)[])
+
+
+def _word(value):
+    return value.to_bytes(32, "big")
+
+
+def encode_aggregate3(calls):
+    """ABI-encode aggregate3 calldata for [(target, calldata_hex), ...].
+
+    Every sub-call is sent with allowFailure=true.
+    """
+    heads = []
+    tails = []
+    offset = 32 * len(calls)
+    for target, data in calls:
+        payload = bytes.fromhex(data[2:] if data.startswith("0x") else data)
+        padded = payload + b"\x00" * (-len(payload) % 32)
+        tail = (
+            _word(int(target, 16))
+            + _word(1)  # allowFailure
+            + _word(96)  # offset of callData within the tuple
+            + _word(len(payload))
+            + padded
+        )
+        heads.append(_word(offset))
+        tails.append(tail)
+        offset += len(tail)
+
+    body = _word(32) + _word(len(calls)) + b"".join(heads) + b"".join(tails)
+    return AGGREGATE3_SELECTOR + body.hex()
+
+
+def decode_aggregate3(result_hex):
+    """Decode aggregate3 return data into [(success, return_bytes), ...]."""
+    raw = bytes.fromhex(result_hex[2:] if result_hex.startswith("0x") else result_hex)
+    if len(raw) < 64:
+        return []
+
+    array_start = int.from_bytes(raw[0:32], "big")
+    count = int.from_bytes(raw[array_start:array_start + 32], "big")
+    base = array_start + 32
+
+    out = []
+    for i in range(count):
+        tuple_start = base + int.from_bytes(raw[base + 32 * i:base + 32 * (i + 1)], "big")
+        success = raw[tuple_start + 31] == 1
+        data_start = tuple_start + int.from_bytes(raw[tuple_start + 32:tuple_start + 64], "big")
+        length = int.from_bytes(raw[data_start:data_start + 32], "big")
+        out.append((success, raw[data_start + 32:data_start + 32 + length]))
+    return out
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store of mined transaction receipts.
+
+A mined receipt never changes, so each one is fetched once and kept in the
+`receipts` table of cache.db (cache_store.py), keyed by tx hash. Only what
+the decoders read is stored: status, block number and, per log, address /
+topics / data as one compact JSON array instead of the full RPC object.
+
+Receipts come back in the shape of eth_getTransactionReceipt:
+    {"status": 1, "blockNumber": 123, "logs": [{"address", "topics", "data"}, ...]}
+
+    get_receipts(hashes)               # bulk: stored ones + the rest via Routescan
+    lookup(store, hashes) / remember(store, {hash: raw_receipt})
+"""
+
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_store import shared_store
+from etherscan_client import ExplorerError, routescan
+
+RECEIPT_CHUNK = 100  # receipts fetched (and committed) per step
+
+
+def _int(value, default=0):
+    if value is None:
+        return default
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def compact(receipt):
+    """(block, status, logs_json) row for a raw RPC receipt."""
+    logs = [[log["address"].lower(), log.get("topics", []), log.get("data", "0x")]
+            for log in receipt.get("logs", [])]
+    return (_int(receipt.get("blockNumber")), _int(receipt.get("status"), 1),
+            json.dumps(logs, separators=(",", ":")))
+
+
+def expand(row):
+    block, status, logs = row
+    return {"status": status, "blockNumber": block,
+            "logs": [{"address": a, "topics": t, "data": d} for a, t, d in json.loads(logs)]}
+
+
+def lookup(store, tx_hashes):
+    """{tx_hash (lower-case): receipt} for the hashes already stored."""
+    return {h: expand(row) for h, row in store.get_receipts(tx_hashes).items()}
+
+
+def remember(store, receipts):
+    """Store {tx_hash: raw receipt} (not committed yet); returns them expanded."""
+    rows = {h.lower(): compact(r) for h, r in receipts.items() if r}
+    store.put_receipts(rows)
+    return {h: expand(row) for h, row in rows.items()}
+
+
+def explorer_receipt(tx_hash):
+    """Fetch one receipt through the Routescan proxy (None if not mined)."""
+    receipt = routescan().proxy("eth_getTransactionReceipt", txhash=tx_hash)
+    return receipt if isinstance(receipt, dict) else None
+
+
+def _fetch_one(fetch, tx_hash):
+    """(tx_hash, receipt or None, error or None) — one failed hash never
+    aborts the rest of the batch."""
+    try:
+        return tx_hash, fetch(tx_hash), None
+    except ExplorerError as e:
+        return tx_hash, None, e
+
+
+def get_receipts(tx_hashes, fetch=explorer_receipt, store=None, workers=1):
+    """{tx_hash (lower-case): receipt or None} — stored receipts first, the
+    rest via fetch(tx_hash), kept for good. Missing receipts are fetched in
+    chunks of RECEIPT_CHUNK (concurrently with workers > 1; the explorer
+    client's token bucket still caps the request rate) and each chunk is
+    committed as soon as it completes, so an interrupted run keeps what it
+    fetched. Hashes whose fetch failed come back as None and are retried on
+    the next call."""
+    store = store or shared_store()
+    hashes = list(dict.fromkeys(h.lower() for h in tx_hashes))
+    found = lookup(store, hashes)
+    missing = [h for h in hashes if h not in found]
+    failed = 0
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 and len(missing) > 1 else None
+    try:
+        for start in range(0, len(missing), RECEIPT_CHUNK):
+            chunk = missing[start:start + RECEIPT_CHUNK]
+            if pool:
+                # workers run in a copy of the caller's context (e.g. run_jobs' job name)
+                futures = [pool.submit(contextvars.copy_context().run, _fetch_one, fetch, h) for h in chunk]
+                results = [future.result() for future in futures]
+            else:
+                results = [_fetch_one(fetch, h) for h in chunk]
+            failed += sum(1 for _, _, error in results if error)
+            found.update(remember(store, {h: r for h, r, _ in results if r}))
+            store.commit()
+            if len(missing) > RECEIPT_CHUNK:
+                print(f"  [{min(start + RECEIPT_CHUNK, len(missing))}/{len(missing)}] receipts fetched"
+                      f" (failed: {failed})")
+    finally:
+        if pool:
+            pool.shutdown()
+    if failed:
+        print(f"  ⚠️ {failed} receipts could not be fetched — retried on the next run")
+    return {h: found.get(h) for h in hashes}
+
+
+def get_receipt(tx_hash, fetch=explorer_receipt, store=None):
+    return get_receipts([tx_hash], fetch, store)[tx_hash.lower()]
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Shared JSON-RPC client for the Berachain data jobs.
+
+One keep-alive connection pool per endpoint, shared by every phase of a run,
+and an asyncio front end that caps the number of requests in flight. aiohttp
+is not a dependency of this repo, so the transport is a pooled
+requests.Session per endpoint driven from the event loop's executor.
+
+Async API:    await client.acall(method, params) / await client.abatch(calls)
+              await client.arequest(method, params)  # raw result/error body
+Blocking API: client.call(...) / client.request(...) / client.batch(...) / client.run(coro)
+
+Requests are spread over an EndpointPool that scores every endpoint on
+latency, error rate and 429s: healthy endpoints share the load (weighted by
+score), a request still pending after the endpoint's p90 latency is hedged to
+a second endpoint (first good answer wins), and endpoints that keep failing
+are ejected for a cool-down period.
+
+Each endpoint also has an AIMD controller for its concurrency and batch size:
+both grow while responses are clean and fast, and are halved on 429s,
+timeouts or partial batch responses. client.stream() feeds a bounded work
+queue sized from those limits and yields results as each chunk completes.
+
+Use get_client(urls, max_in_flight) to share one client (and its pools) per
+endpoint list and in-flight cap.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_MAX_IN_FLIGHT = 8
+
+HEDGE_PERCENTILE = 0.9  # hedge once a request outlives this latency percentile
+HEDGE_MIN_DELAY = 0.25  # seconds — never hedge sooner than this
+HEDGE_DEFAULT_DELAY = 2.0  # seconds — before an endpoint has latency samples
+EJECT_AFTER_FAILURES = 3  # consecutive failures (errors, 429s, timeouts)
+EJECT_SECONDS = 60
+
+AIMD_START_LIMIT = 2  # concurrent requests per endpoint at start
+AIMD_START_SCALE = 0.25  # fraction of the caller's max batch size at start
+AIMD_MIN_SCALE = 0.05
+AIMD_SCALE_STEP = 0.05  # additive batch growth per clean response
+AIMD_SLOW_SECONDS = 5.0  # a clean response slower than this does not grow the limits
+
+# Response outcomes. REJECTED is a JSON-RPC error body (provider limits such
+# as response size, gas cap or per-second quota) — it shrinks AIMD like a 429.
+OK, PARTIAL, THROTTLED, TIMEOUT, REJECTED, FAILED = "ok", "partial", "throttled", "timeout", "rejected", "failed"
+
+
+def reverted(error):
+    """True if a JSON-RPC error body is an execution revert — a valid answer
+    about the call, not a sign that the endpoint is overloaded."""
+    if not isinstance(error, dict):
+        return False
+    return error.get("code") == 3 or "revert" in str(error.get("message", "")).lower()
+
+
+class AimdController:
+    """Additive-increase / multiplicative-decrease concurrency and batch size."""
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = float(min(AIMD_START_LIMIT, max_limit))
+        self.scale = AIMD_START_SCALE
+
+    def on_clean(self, latency):
+        if latency > AIMD_SLOW_SECONDS:
+            return
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)  # ~+1 per window
+        self.scale = min(1.0, self.scale + AIMD_SCALE_STEP)
+
+    def on_congestion(self):
+        self.limit = max(1.0, self.limit / 2)
+        self.scale = max(AIMD_MIN_SCALE, self.scale / 2)
+
+    def slots(self):
+        return int(self.limit)
+
+
+class EndpointHealth:
+    """Rolling latency / error / throttle stats for one endpoint."""
+
+    def __init__(self, url, max_limit):
+        self.url = url
+        self.aimd = AimdController(max_limit)
+        self.in_flight = 0
+        self.latencies = deque(maxlen=100)
+        self.error_rate = 0.0  # EWMA of failures (0..1)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    def record(self, latency, outcome):
+        self.requests += 1
+        if outcome in (OK, PARTIAL):
+            self.error_rate = 0.8 * self.error_rate
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+        else:
+            self.error_rate = 0.8 * self.error_rate + 0.2
+            self.errors += 1
+            self.throttled += outcome == THROTTLED
+            # A JSON-RPC error body means the endpoint is up — shrink, don't eject
+            self.consecutive_failures += outcome != REJECTED
+            if self.consecutive_failures >= EJECT_AFTER_FAILURES:
+                self.ejected_until = time.monotonic() + EJECT_SECONDS
+                self.consecutive_failures = 0
+
+        if outcome == OK:
+            self.aimd.on_clean(latency)
+        elif outcome in (PARTIAL, THROTTLED, TIMEOUT, REJECTED):
+            self.aimd.on_congestion()
+
+    def healthy(self):
+        return time.monotonic() >= self.ejected_until
+
+    def has_capacity(self):
+        return self.in_flight < self.aimd.slots()
+
+    def latency_percentile(self, pct):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(pct * len(ordered)), len(ordered) - 1)]
+
+    def score(self):
+        """Lower is better: median latency inflated by the recent error rate.
+        None until the endpoint has answered at least once."""
+        median = self.latency_percentile(0.5)
+        if median is None:
+            return None if self.error_rate == 0 else 1.0 * (1 + 4 * self.error_rate)
+        return max(median, 0.001) * (1 + 4 * self.error_rate)
+
+
+class EndpointPool:
+    """Health-scored endpoint selection with ejection and per-endpoint AIMD."""
+
+    def __init__(self, urls, max_limit):
+        self.health = {url: EndpointHealth(url, max_limit) for url in urls}
+
+    def _live(self):
+        healthy = [h for h in self.health.values() if h.healthy()]
+        return healthy or [min(self.health.values(), key=lambda h: h.ejected_until)]
+
+    def pick(self, exclude=()):
+        """Weighted-random healthy endpoint with a free AIMD slot (weight
+        1/score), so concurrent requests spread across providers. When none
+        are healthy, the endpoint whose ejection ends soonest is used.
+        Returns None if no candidate has capacity."""
+        candidates = [h for h in self._live() if h.url not in exclude and h.has_capacity()]
+        if not candidates:
+            return None
+        scores = [h.score() for h in candidates]
+        known = [sc for sc in scores if sc is not None]
+        optimistic = min(known) if known else 1.0  # untried endpoints get explored
+        weights = [1.0 / (sc if sc is not None else optimistic) for sc in scores]
+        return random.choices(candidates, weights=weights)[0].url
+
+    def hedge_delay(self, url):
+        p = self.health[url].latency_percentile(HEDGE_PERCENTILE)
+        return HEDGE_DEFAULT_DELAY if p is None else max(p, HEDGE_MIN_DELAY)
+
+    def concurrency(self):
+        return sum(h.aimd.slots() for h in self._live())
+
+    def batch_scale(self):
+        """Smallest batch scale among live endpoints — a chunk may be served
+        (or hedged) by any of them."""
+        return min(h.aimd.scale for h in self._live())
+
+    def report(self):
+        out = []
+        for h in self.health.values():
+            p50 = h.latency_percentile(0.5)
+            out.append({
+                "url": h.url,
+                "requests": h.requests,
+                "errors": h.errors,
+                "throttled": h.throttled,
+                "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "limit": h.aimd.slots(),
+                "batch_scale": round(h.aimd.scale, 2),
+                "ejected": not h.healthy(),
+            })
+        return out
+
+
+class RpcClient:
+    def __init__(self, urls, max_in_flight=DEFAULT_MAX_IN_FLIGHT, timeout=30, retries=3):
+        self.urls = list(urls)
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.retries = retries
+        self.pool = EndpointPool(self.urls, max_in_flight)
+
+        self._sessions = {}
+        for url in self.urls:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            s.headers["Content-Type"] = "application/json"
+            self._sessions[url] = s
+
+        # Hedged requests can briefly hold two workers for one logical request
+        self._executor = ThreadPoolExecutor(max_workers=2 * max_in_flight)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._capacity = None  # asyncio.Condition, created on the loop thread
+
+    # ----- sizing hints for callers -----
+
+    def batch_size(self, max_size):
+        """Current AIMD batch size for a chunk of at most max_size calls."""
+        return max(1, int(max_size * self.pool.batch_scale()))
+
+    def concurrency(self):
+        """Number of requests the live endpoints currently accept in flight."""
+        return max(1, min(self.max_in_flight, self.pool.concurrency()))
+
+    # ----- transport -----
+
+    def _post(self, url, payload):
+        try:
+            resp = self._sessions[url].post(url, json=payload, timeout=self.timeout)
+        except requests.exceptions.Timeout:
+            return TIMEOUT, None
+        if resp.status_code == 429:
+            return THROTTLED, None
+        resp.raise_for_status()
+        return OK, resp.json()
+
+    async def _acquire(self, exclude=(), wait=True):
+        """Reserve a slot on the best endpoint with spare AIMD capacity
+        (never more than max_in_flight requests in total)."""
+        async with self._capacity:
+            while True:
+                in_flight = sum(h.in_flight for h in self.pool.health.values())
+                url = self.pool.pick(exclude) if in_flight < self.max_in_flight else None
+                if url is not None:
+                    self.pool.health[url].in_flight += 1
+                    return url
+                if not wait:
+                    return None
+                await self._capacity.wait()
+
+    async def _release(self, url):
+        async with self._capacity:
+            self.pool.health[url].in_flight -= 1
+            self._capacity.notify_all()
+
+    async def _attempt(self, url, payload, judge):
+        """One POST to an acquired endpoint, recorded in its health/AIMD state."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            status, body = await loop.run_in_executor(self._executor, self._post, url, payload)
+            outcome = judge(body) if status == OK else status
+        except asyncio.CancelledError:
+            await self._release(url)
+            raise
+        except Exception:
+            body, outcome = None, FAILED
+        await self._release(url)
+        self.pool.health[url].record(time.monotonic() - started, outcome)
+        return body if outcome in (OK, PARTIAL) else None
+
+    async def _hedged(self, payload, judge):
+        """Send to the best endpoint; if it is slower than its p90 latency,
+        race a copy on a second endpoint and take the first good answer."""
+        primary = await self._acquire()
+        tasks = {asyncio.ensure_future(self._attempt(primary, payload, judge))}
+        done, _ = await asyncio.wait(tasks, timeout=self.pool.hedge_delay(primary))
+        if not done:
+            backup = await self._acquire(exclude={primary}, wait=False)
+            if backup is not None:
+                tasks.add(asyncio.ensure_future(self._attempt(backup, payload, judge)))
+
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.result() is not None:
+                    for other in tasks:
+                        other.cancel()
+                    return task.result()
+        return None
+
+    async def _send(self, payload, judge):
+        """POST payload (hedged, health-scored endpoint choice) with retries.
+        `judge(body)` classifies a response as OK, PARTIAL, REJECTED or
+        FAILED; the body is returned for OK/PARTIAL, else None after all
+        retries."""
+        if self._capacity is None:
+            self._capacity = asyncio.Condition()
+
+        attempts = self.retries * len(self.urls)
+        for attempt in range(attempts):
+            body = await self._hedged(payload, judge)
+            if body is not None:
+                return body
+            if attempt < attempts - 1:
+                await asyncio.sleep(0.25 * (attempt // len(self.urls) + 1))
+        return None
+
+    # ----- async API -----
+
+    async def acall(self, method, params):
+        """Single JSON-RPC call. Returns the result, or None on failure."""
+        payload = {"jsonrpc": "2.0", "method": method, "params": params, "id": 1}
+        def judge(body):
+            if isinstance(body, dict) and "result" in body:
+                return OK
+            return REJECTED if isinstance(body, dict) and "error" in body else FAILED
+
+        body = await self._send(payload, judge)
+        return body["result"] if body else None
+
+    async def arequest(self, method, params):
+        """Single JSON-RPC call that hands error bodies back instead of
+        retrying them, for callers that react to provider limits themselves
+        (e.g. split an eth_getLogs range). Returns the response object
+        ({"result": ...} or {"error": ...}), or None if every attempt failed."""
+        payload = {"jsonrpc": "2.0", "method": method, "params": params, "id": 1}
+        def judge(body):
+            if isinstance(body, dict) and "result" in body:
+                return OK
+            return PARTIAL if isinstance(body, dict) and "error" in body else FAILED
+
+        return await self._send(payload, judge)
+
+    async def abatch(self, calls):
+        """JSON-RPC batch of [(method, params), ...].
+
+        Returns results aligned with `calls` (None for entries that errored),
+        or None if the whole batch failed. A batch with missing entries or
+        non-revert errors counts as partial and shrinks the endpoint's AIMD
+        limits; a sub-call that reverted is an answer, not an overload.
+        """
+        if not calls:
+            return []
+        payload = [{"jsonrpc": "2.0", "method": m, "params": p, "id": i}
+                   for i, (m, p) in enumerate(calls)]
+
+        def judge(body):
+            if not isinstance(body, list):
+                return FAILED
+            good = sum(1 for r in body if isinstance(r, dict)
+                       and ("result" in r or reverted(r.get("error"))))
+            return OK if good == len(calls) else PARTIAL
+
+        body = await self._send(payload, judge)
+        if body is None:
+            return None
+        results = [None] * len(calls)
+        for r in body:
+            idx = r.get("id") if isinstance(r, dict) else None
+            if isinstance(idx, int) and 0 <= idx < len(calls):
+                results[idx] = r.get("result")
+        return results
+
+    async def stream(self, fetch, items, max_size):
+        """Run the coroutine fetch(chunk) over items, yielding each result as
+        soon as its chunk completes (completion order, not input order).
+
+        A producer cuts chunks of batch_size(max_size) into a bounded work
+        queue and max_in_flight workers drain it, so the pipeline never idles
+        waiting for the slowest chunk of a window; _acquire() still holds the
+        actual concurrency to the endpoints' AIMD limits.
+        """
+        work = asyncio.Queue(maxsize=1)  # chunks are sized right before dispatch
+        results = asyncio.Queue()
+        done = object()
+        workers = min(self.max_in_flight, len(items)) or 1
+
+        async def produce():
+            i = 0
+            while i < len(items):
+                size = self.batch_size(max_size)
+                await work.put(items[i:i + size])
+                i += size
+            for _ in range(workers):
+                await work.put(None)
+
+        async def consume():
+            try:
+                while (chunk := await work.get()) is not None:
+                    await results.put(await fetch(chunk))
+            finally:
+                results.put_nowait(done)
+
+        consumers = [asyncio.ensure_future(consume()) for _ in range(workers)]
+        tasks = consumers + [asyncio.ensure_future(produce())]
+        try:
+            finished = 0
+            while finished < workers:
+                result = await results.get()
+                if result is not done:
+                    yield result
+                    continue
+                finished += 1
+                for task in consumers:
+                    if task.done() and not task.cancelled() and task.exception():
+                        raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # ----- blocking API -----
+
+    def run(self, coro):
+        """Run a coroutine on the client's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def call(self, method, params):
+        return self.run(self.acall(method, params))
+
+    def request(self, method, params):
+        return self.run(self.arequest(method, params))
+
+    def batch(self, calls):
+        return self.run(self.abatch(calls))
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+        for s in self._sessions.values():
+            s.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(urls, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Process-wide shared client for this endpoint list and in-flight cap
+    (callers asking for different caps get separate clients)."""
+    key = (tuple(urls), max_in_flight)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = RpcClient(urls, max_in_flight=max_in_flight)
+        return _clients[key]
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Run the dashboard data jobs as one dependency graph in a single process.
+
+Jobs whose dependencies are done run concurrently on a thread pool, so the
+wall-clock time is that of the longest dependency chain. Running in one
+process lets the jobs share the pooled RPC clients (rpc_client.get_client),
+the REST session and in-memory datasets such as the Vester txlist
+(datasets.py). Each output line is prefixed with its job name: the name is a
+context variable, so it follows the job onto the shared RPC event loops
+(run_coroutine_threadsafe copies the caller's context) and into the
+receipt/backfill worker pools, which submit in a copy of it.
+
+Usage:
+    python -m run_jobs                      # every job
+    python -m run_jobs --only hourly        # a group (or comma-separated jobs/groups)
+    python -m run_jobs --exclude defillama
+    python -m run_jobs --list
+"""
+
+import argparse
+import contextvars
+import importlib
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# name -> (module whose main() runs the job, jobs it depends on)
+JOBS = {
+    "vedolo": ("update_data", []),
+    "defillama": ("fetch_defillama", []),
+    "odolo_contract": ("fetch_odolo_contract", []),
+    "exercised_usd": ("update_exercised_usd", []),
+    "avg_lock": ("calculate_avg_lock", ["exercised_usd"]),  # reads exercised_usd.json
+    "exercisers": ("generate_exercisers", []),
+    "dolo_holders": ("generate_dolo_holders", []),
+    "early_exits": ("fetch_early_exits", []),
+}
+
+GROUPS = {
+    "hourly": ["vedolo", "defillama", "odolo_contract"],
+    "odolo": ["exercised_usd", "avg_lock", "exercisers", "odolo_contract"],
+    "holders": ["dolo_holders"],
+}
+
+MAX_WORKERS = 4
+
+JOB = contextvars.ContextVar("job", default=None)
+
+
+class _JobOutput:
+    """sys.stdout replacement that prefixes each line with the job of the
+    current context (JOB), whichever thread it is written from."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.pending = {}  # job -> unfinished last line
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        job = JOB.get()
+        if job is None:
+            return self.stream.write(text)
+        with self.lock:
+            *lines, self.pending[job] = (self.pending.get(job, "") + text).split("\n")
+            if lines:
+                self.stream.write("".join(f"[{job}] {line}\n" for line in lines))
+        return len(text)
+
+    def flush(self):
+        job = JOB.get()
+        with self.lock:
+            pending = self.pending.pop(job, "") if job is not None else ""
+            if pending:
+                self.stream.write(f"[{job}] {pending}\n")
+        self.stream.flush()
+
+
+def resolve(names):
+    """Expand comma-separated job and group names into a set of job names."""
+    jobs = set()
+    for name in filter(None, (n.strip() for n in names.split(","))):
+        if name in GROUPS:
+            jobs.update(GROUPS[name])
+        elif name in JOBS:
+            jobs.add(name)
+        else:
+            raise SystemExit(f"Unknown job or group: {name!r} (see --list)")
+    return jobs
+
+
+def run_job(name, output):
+    """Import the job's module and run its main(). Returns (ok, seconds)."""
+    token = JOB.set(name)
+    started = time.monotonic()
+    try:
+        importlib.import_module(JOBS[name][0]).main()
+        ok = True
+    except SystemExit as e:
+        ok = e.code in (None, 0)  # the scripts exit(0) when there is nothing to do
+        if not ok:
+            print(f"❌ exited with status {e.code}")
+    except Exception as e:
+        traceback.print_exc(file=sys.stdout)
+        print(f"❌ {type(e).__name__}: {e}")
+        ok = False
+    finally:
+        output.flush()
+        JOB.reset(token)
+    return ok, time.monotonic() - started
+
+
+def run(selected, workers=MAX_WORKERS):
+    """Run the selected jobs in dependency order. Returns {name: (status, seconds)}."""
+    # Dependencies outside the selection are assumed to be satisfied already
+    deps = {name: [d for d in JOBS[name][1] if d in selected] for name in selected}
+    results = {}
+    output = _JobOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            while len(results) < len(selected):
+                for name in sorted(selected):
+                    if name in results or name in running.values():
+                        continue
+                    if any(results.get(d, ("",))[0] in ("failed", "skipped") for d in deps[name]):
+                        results[name] = ("skipped", 0.0)
+                    elif all(d in results for d in deps[name]):
+                        running[pool.submit(run_job, name, output)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ok, seconds = future.result()
+                    results[running.pop(future)] = ("ok" if ok else "failed", seconds)
+    finally:
+        sys.stdout = output.stream
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the dashboard data jobs as a dependency graph.")
+    parser.add_argument("--only", default="", help="comma-separated jobs or groups to run")
+    parser.add_argument("--exclude", default="", help="comma-separated jobs or groups to skip")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="jobs run at the same time")
+    parser.add_argument("--list", action="store_true", help="list jobs and groups")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (module, deps) in JOBS.items():
+            print(f"  {name:<15} {module + '.py':<26} {'after ' + ', '.join(deps) if deps else ''}")
+        for group, names in GROUPS.items():
+            print(f"  @{group:<14} {', '.join(names)}")
+        return
+
+    selected = (resolve(args.only) if args.only else set(JOBS)) - resolve(args.exclude)
+    if not selected:
+        print("No jobs selected.")
+        return
+
+    print(f"🚀 Running {len(selected)} jobs: {', '.join(sorted(selected))}")
+    started = time.monotonic()
+    results = run(selected, args.workers)
+
+    print(f"\n⏱️  Finished in {time.monotonic() - started:.1f}s")
+    for name in sorted(results, key=lambda n: -results[n][1]):
+        status, seconds = results[name]
+        icon = {"ok": "✅", "failed": "❌", "skipped": "⏭️"}[status]
+        print(f"   {icon} {name:<15} {seconds:>7.1f}s  {status}")
+
+    if any(status != "ok" for status, _ in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
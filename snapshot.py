@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Block-pinned snapshot for one data run.
+
+Every eth_call of a run is sent with the same block tag (a few blocks behind
+head, so every endpoint has it) instead of "latest", so all reads describe
+one consistent chain state. Results at a pinned block are immutable and are
+cached in the CacheStore under (block, to, calldata): if a run dies, the
+next run resumes the same snapshot and only reads what is still missing.
+"""
+
+PIN_LAG_BLOCKS = 5  # stay behind head so lagging endpoints already have the block
+RESUME_MAX_AGE_BLOCKS = 1800  # ~1 h of Berachain blocks; older unfinished snapshots are dropped
+SNAPSHOT_KEY = "snapshot"  # meta key: {"block", "complete"}
+
+
+class Snapshot:
+    def __init__(self, store, block, resumed=False):
+        self.store = store
+        self.block = block
+        self.resumed = resumed
+
+    @classmethod
+    def pin(cls, store, head):
+        """Resume the last unfinished snapshot if it is recent, else pin head - lag.
+
+        `head` is the current block number (None if unknown: reads then go to
+        "latest" and nothing is cached)."""
+        if head is None:
+            return cls(store, None)
+        state = store.get("meta", SNAPSHOT_KEY)
+        if state and not state["complete"] and 0 <= head - state["block"] <= RESUME_MAX_AGE_BLOCKS:
+            return cls(store, state["block"], resumed=True)
+
+        block = max(head - PIN_LAG_BLOCKS, 0)
+        store.drop_reads(keep_block=block)
+        store.put("meta", SNAPSHOT_KEY, {"block": block, "complete": False})
+        store.commit()
+        return cls(store, block)
+
+    @property
+    def tag(self):
+        """Block tag for eth_call / eth_getBlockByNumber."""
+        return hex(self.block) if self.block is not None else "latest"
+
+    def cached(self, calls):
+        """{(to, calldata): result_hex} for the calls already read in this snapshot."""
+        if self.block is None:
+            return {}
+        found = self.store.get_reads(self.block, calls)
+        return {(to, data): found[(to.lower(), data)] for to, data in calls if (to.lower(), data) in found}
+
+    def remember(self, results):
+        """Cache {(to, calldata): result_hex} read at this snapshot's block."""
+        if self.block is not None and results:
+            self.store.put_reads(self.block, results)
+
+    def complete(self):
+        """Mark the snapshot finished; its cached reads are no longer needed."""
+        if self.block is not None:
+            self.store.put("meta", SNAPSHOT_KEY, {"block": self.block, "complete": True})
+            self.store.drop_reads()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Mergeable streaming statistics for positive-valued metrics.
+
+StreamStats keeps, in a few kB of JSON-serialisable state:
+  - count / sum / min / max,
+  - a log-bucketed quantile sketch (DDSketch-style): value x goes to bin
+    ceil(log_gamma(x)), so any quantile is within ACCURACY relative error,
+  - exact counts for configured buckets [(label, upper_bound), ...],
+  - per-day counts, from which rolling windows and monthly counts are derived.
+
+States built from disjoint batches merge by adding counts, so a daily job
+only feeds in the new observations (see calculate_avg_lock.py).
+"""
+
+import math
+from datetime import datetime, timedelta, timezone
+
+ACCURACY = 0.01  # relative error bound of sketch quantiles
+WINDOWS_DAYS = (7, 30, 90)
+
+
+class StreamStats:
+    def __init__(self, buckets=(), accuracy=ACCURACY):
+        self.buckets = [(label, float(upper)) for label, upper in buckets]
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.zeros = 0  # values <= 0 (kept out of the log sketch)
+        self.bins = {}
+        self.bucket_counts = [0] * len(self.buckets)
+        self.days = {}
+
+    def add(self, value, when=None):
+        """Record one value; `when` (unix seconds) feeds the time windows."""
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value > 0:
+            i = math.ceil(math.log(value, self.gamma))
+            self.bins[i] = self.bins.get(i, 0) + 1
+        else:
+            self.zeros += 1
+        for b, (_, upper) in enumerate(self.buckets):
+            if value < upper:
+                self.bucket_counts[b] += 1
+                break
+        if when is not None:
+            day = datetime.fromtimestamp(when, timezone.utc).strftime("%Y-%m-%d")
+            self.days[day] = self.days.get(day, 0) + 1
+
+    def merge(self, other):
+        if (other.buckets, other.accuracy) != (self.buckets, self.accuracy):
+            raise ValueError("cannot merge stats with different buckets or accuracy")
+        self.count += other.count
+        self.total += other.total
+        for attr, pick in (("min", min), ("max", max)):
+            values = [v for v in (getattr(self, attr), getattr(other, attr)) if v is not None]
+            setattr(self, attr, pick(values) if values else None)
+        self.zeros += other.zeros
+        for i, n in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + n
+        self.bucket_counts = [a + b for a, b in zip(self.bucket_counts, other.bucket_counts)]
+        for day, n in other.days.items():
+            self.days[day] = self.days.get(day, 0) + n
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return min(self.min, 0.0)
+        for i in sorted(self.bins):
+            seen += self.bins[i]
+            if rank < seen:
+                estimate = 2 * self.gamma ** i / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def windows(self, now=None):
+        """Counts over the last WINDOWS_DAYS days and per calendar month."""
+        today = (now or datetime.now(timezone.utc)).date()
+        out = {}
+        for days in WINDOWS_DAYS:
+            since = (today - timedelta(days=days - 1)).isoformat()
+            out[f"last_{days}d"] = sum(n for day, n in self.days.items() if day >= since)
+        monthly = {}
+        for day, n in sorted(self.days.items()):
+            monthly[day[:7]] = monthly.get(day[:7], 0) + n
+        out["monthly"] = monthly
+        return out
+
+    def summary(self, digits=2, now=None):
+        """Dashboard-ready summary (rounded to `digits`)."""
+        def r(v):
+            return None if v is None else round(v, digits)
+        out = {
+            "count": self.count,
+            "mean": r(self.total / self.count) if self.count else None,
+            "min": r(self.min),
+            "p10": r(self.quantile(0.1)),
+            "median": r(self.quantile(0.5)),
+            "p90": r(self.quantile(0.9)),
+            "max": r(self.max),
+        }
+        if self.buckets:
+            out["buckets"] = {label: n for (label, _), n in zip(self.buckets, self.bucket_counts)}
+        out["windows"] = self.windows(now)
+        return out
+
+    # ----- persistence -----
+
+    def to_dict(self):
+        return {
+            "buckets": [[label, upper if math.isfinite(upper) else None] for label, upper in self.buckets],
+            "accuracy": self.accuracy, "count": self.count, "total": self.total,
+            "min": self.min, "max": self.max, "zeros": self.zeros,
+            "bins": {str(i): n for i, n in self.bins.items()},
+            "bucket_counts": self.bucket_counts, "days": self.days,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls([(label, math.inf if upper is None else upper) for label, upper in state["buckets"]],
+                    state["accuracy"])
+        stats.count, stats.total = state["count"], state["total"]
+        stats.min, stats.max, stats.zeros = state["min"], state["max"], state["zeros"]
+        stats.bins = {int(i): n for i, n in state["bins"].items()}
+        stats.bucket_counts = list(state["bucket_counts"])
+        stats.days = dict(state["days"])
+        return stats
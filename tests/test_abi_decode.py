@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+import abi_decode
+from abi_decode import VECTOR_MIN, _scalar_columns, columns, uints
+
+pytestmark = pytest.mark.skipif(abi_decode.np is None, reason="needs NumPy")
+
+TYPES = [("amount", "uint256"), ("delta", "int256"), None, ("owner", "address"), ("tag", "bytes32")]
+
+
+def payloads(n, seed=7):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        words = [
+            rng.choice([0, 1, rng.getrandbits(64), rng.getrandbits(128), rng.getrandbits(256)]),
+            rng.getrandbits(256),  # int256: about half negative
+            rng.getrandbits(256),
+            rng.getrandbits(160),
+            rng.getrandbits(256),
+        ]
+        body = "".join(f"{w:064x}" for w in words)
+        if i % 17 == 0:
+            body = body[:100]  # short payload: zero-padded, not valid
+        out.append("0x" + "a9059cbb" + body)
+    return out
+
+
+def assert_same(vector, scalar):
+    assert vector.keys() == scalar.keys()
+    for name in vector:
+        if name in ("amount", "delta") and isinstance(scalar[name][0], float):
+            assert vector[name] == pytest.approx(scalar[name], rel=1e-12)
+        else:
+            assert vector[name] == scalar[name]
+
+
+def test_columns_vector_matches_scalar():
+    data = payloads(VECTOR_MIN * 3)
+    assert_same(columns(data, TYPES, skip=4), _scalar_columns(data, TYPES, 4, {}))
+
+
+def test_columns_decimals_vector_matches_scalar():
+    data = payloads(VECTOR_MIN * 2, seed=8)
+    decimals = {"amount": 18, "delta": 6}
+    assert_same(columns(data, TYPES, skip=4, decimals=decimals), _scalar_columns(data, TYPES, 4, decimals))
+
+
+def test_columns_bytes_payloads():
+    data = payloads(VECTOR_MIN)
+    raw = [bytes.fromhex(p[2:]) for p in data]
+    assert columns(raw, TYPES, skip=4) == columns(data, TYPES, skip=4)
+
+
+def test_valid_flags():
+    cols = columns(payloads(VECTOR_MIN), TYPES, skip=4)
+    assert cols["valid"] == [i % 17 != 0 for i in range(VECTOR_MIN)]
+
+
+def test_signed_values():
+    data = ["0x" + "f" * 64, "0x" + "0" * 63 + "5", "0x8" + "0" * 63] * VECTOR_MIN
+    cols = columns(data, [("v", "int256")])
+    assert cols["v"][:3] == [-1, 5, -(1 << 255)]
+
+
+def test_uints_vector_matches_scalar():
+    data = ["0x", "0x5", None, "0x" + "0" * 46 + "de0b6b3a7640000", "0x" + "f" * 64] * VECTOR_MIN
+    small = data[:5]
+    assert uints(data)[:5] == uints(small) == [0, 5, 0, 10 ** 18, (1 << 256) - 1]
+    assert uints(data, decimals=18)[:5] == pytest.approx(uints(small, decimals=18), rel=1e-12)
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+import eip55
+
+# From the EIP-55 specification
+VECTORS = [
+    "0x52908400098527886E0F7030069857D2E4169EE7",
+    "0x8617E340B3D01FA5F11F306F4090FD50E238070D",
+    "0xde709f2102306220921060314715629080e2fb77",
+    "0x27b1fdb04752bbc536007a920d24acb045561c26",
+    "0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed",
+    "0xfB6916095ca1df60bB79Ce92cE3Ea74c37c5d359",
+    "0xdbF03B407c01E7cD3CBea99509d93f8DDDC8C6FB",
+    "0xD1220A0cf47c7B9Be7A2E6BA89F429762e7b9aDb",
+]
+
+KECCAK_EMPTY = "c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"
+
+
+def random_addresses(n, seed=55):
+    rng = random.Random(seed)
+    return ["0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40)) for _ in range(n)]
+
+
+def test_keccak_empty():
+    assert eip55.keccak256(b"").hex() == KECCAK_EMPTY
+    assert eip55._keccak256_py(b"").hex() == KECCAK_EMPTY
+
+
+def test_keccak_multi_block():
+    data = bytes(range(256)) * 3  # several rate-sized blocks
+    assert eip55._keccak256_py(data) == eip55.keccak256(data)
+
+
+@pytest.mark.parametrize("address", VECTORS)
+def test_checksum_vectors(address):
+    assert eip55.to_checksum_address(address.lower()) == address
+    assert eip55.to_checksum_address(address.upper().replace("0X", "0x")) == address
+    assert eip55.to_checksum_address(address[2:]) == address
+
+
+@pytest.mark.parametrize("bad", ["", "0x1234", "0x" + "g" * 40, None, 42])
+def test_checksum_rejects_malformed(bad):
+    with pytest.raises(ValueError):
+        eip55.to_checksum_address(bad)
+
+
+def test_batch_matches_scalar():
+    addresses = VECTORS + random_addresses(300)
+    assert eip55.to_checksum_addresses(addresses) == [eip55.to_checksum_address(a) for a in addresses]
+
+
+def test_batch_leaves_malformed_untouched():
+    addresses = [VECTORS[0].lower(), "not an address", None, "0x1234", VECTORS[1].lower()]
+    assert eip55.to_checksum_addresses(addresses) == [VECTORS[0], "not an address", None, "0x1234", VECTORS[1]]
+
+
+def test_batch_without_numpy(monkeypatch):
+    addresses = VECTORS + random_addresses(50)
+    expected = eip55.to_checksum_addresses(addresses)
+    monkeypatch.setattr(eip55, "np", None)
+    assert eip55.to_checksum_addresses(addresses) == expected
+
+
+@pytest.mark.skipif(eip55.np is None, reason="needs NumPy")
+def test_vectorised_keccak_matches_scalar():
+    messages = [a[2:].encode("ascii") for a in random_addresses(100)]
+    digests = eip55._keccak256_blocks(messages)
+    assert [bytes(row) for row in digests] == [eip55._keccak256_py(m) for m in messages]
@@ -0,0 +1,55 @@
+import pytest
+
+import etherscan_client
+from etherscan_client import ExplorerClient
+
+
+class Reply:
+    def __init__(self, status_code, body=None):
+        self.status_code, self.body = status_code, body
+
+    def json(self):
+        return self.body
+
+
+class Session:
+    def __init__(self, replies):
+        self.replies = list(replies)
+
+    def get(self, url, params=None, timeout=None):
+        return self.replies.pop(0)
+
+
+def run(monkeypatch, replies):
+    """client.get() against canned replies, on a fake clock; returns (body, sleeps)."""
+    sleeps, clock = [], [1_000.0]
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    session = Session(replies)
+    monkeypatch.setattr(etherscan_client, "http_session", lambda: session)
+    monkeypatch.setattr(etherscan_client.time, "sleep", sleep)
+    monkeypatch.setattr(etherscan_client.time, "monotonic", lambda: clock[0])
+    client = ExplorerClient("http://explorer.invalid", rate=4)
+    body = client.get(module="account", action="txlist")
+    return body, sleeps
+
+
+OK = Reply(200, {"status": "1", "message": "OK", "result": [1]})
+
+
+def test_rate_limit_backs_off_through_the_bucket_only(monkeypatch):
+    body, sleeps = run(monkeypatch, [Reply(429), Reply(200, {"status": "0", "message": "NOTOK",
+                                                             "result": "Max rate limit reached"}), OK])
+    assert body["result"] == [1]
+    # Only the drained bucket waits: 1s after the first penalty (2**0 s), 2s after
+    # the second — no fixed 2s/4s sleeps on top
+    assert sum(sleeps) == pytest.approx(3.0)
+
+
+def test_server_error_sleeps(monkeypatch):
+    body, sleeps = run(monkeypatch, [Reply(502), OK])
+    assert body["result"] == [1]
+    assert sleeps == [2]
@@ -0,0 +1,27 @@
+import pytest
+
+import fetch_early_exits
+import update_data
+from eip55 import keccak256
+
+TRANSFER = "Transfer(address,address,uint256)"
+
+
+def topic(signature):
+    return "0x" + keccak256(signature.encode("ascii")).hex()
+
+
+@pytest.mark.parametrize("constant, signature", [
+    (update_data.DEPOSIT_TOPIC, "Deposit(address,uint256,uint256,uint256,uint8,uint256)"),
+    (fetch_early_exits.WITHDRAW_TOPIC, "Withdraw(address,uint256,uint256,uint256)"),
+    (fetch_early_exits.TRANSFER_TOPIC, TRANSFER),
+])
+def test_topic_matches_signature(constant, signature):
+    assert constant == topic(signature)
+
+
+def test_lock_changes_read_the_token_id_from_deposit_data(monkeypatch):
+    deposit = {"topics": [update_data.DEPOSIT_TOPIC, "0x" + "00" * 12 + "ab" * 20, "0x" + f"{1_800_000_000:064x}"],
+               "data": "0x" + "".join(f"{w:064x}" for w in (42, 10 ** 18, 3, 1_700_000_000))}
+    monkeypatch.setattr(update_data, "rpc_call", lambda method, params: [deposit])
+    assert update_data.fetch_lock_changes(0, 5) == {42}
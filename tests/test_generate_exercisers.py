@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from generate_exercisers import rerank
+
+
+def ranking(totals):
+    return sorted(totals, key=lambda a: -totals[a])
+
+
+def test_unchanged_order_is_kept():
+    totals = {"a": 30, "b": 20, "c": 10}
+    ranked = ranking(totals)
+    totals["b"] = 25  # still between a and c
+    result, moved = rerank(ranked, totals, {"b"})
+    assert result is ranked and not moved
+
+
+def test_moved_address_is_reinserted():
+    totals = {"a": 30, "b": 20, "c": 10}
+    ranked = ranking(totals)
+    totals["c"] = 35
+    assert rerank(ranked, totals, {"c"}) == (["c", "a", "b"], True)
+
+
+def test_new_address_is_inserted():
+    totals = {"a": 30, "b": 20}
+    ranked = ranking(totals)
+    totals["n"] = 25
+    assert rerank(ranked, totals, {"n"}) == (["a", "n", "b"], True)
+
+
+def test_ties_keep_existing_addresses_first():
+    totals = {"a": 30, "b": 20, "c": 10}
+    ranked = ranking(totals)
+    totals["c"] = 20
+    totals["n"] = 30
+    assert rerank(ranked, totals, {"c", "n"}) == (["a", "n", "b", "c"], True)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_updates_stay_sorted(seed):
+    rng = random.Random(seed)
+    totals = {f"0x{i:040x}": round(rng.uniform(0, 1_000), 2) for i in range(200)}
+    ranked = ranking(totals)
+    changed = set(rng.sample(sorted(totals), 15))
+    for i in range(5):
+        changed.add(f"0xnew{i}")
+    for addr in changed:
+        totals[addr] = totals.get(addr, 0) + round(rng.uniform(0, 500), 2)
+
+    result, _ = rerank(ranked, totals, changed)
+    assert sorted(result) == sorted(totals)
+    assert all(totals[x] >= totals[y] for x, y in zip(result, result[1:]))
@@ -0,0 +1,59 @@
+from multicall import AGGREGATE3_SELECTOR, decode_aggregate3, encode_aggregate3
+
+CALLS = [
+    ("0x" + "11" * 20, "0x70a08231" + "00" * 12 + "22" * 20),  # balanceOf(address)
+    ("0x" + "33" * 20, "0x18160ddd"),  # totalSupply(), not word-aligned
+    ("0x" + "44" * 20, "0x"),  # empty calldata
+]
+
+
+def word(value):
+    return value.to_bytes(32, "big")
+
+
+def decode_calls(calldata):
+    """[(target, allowFailure, calldata_hex)] from aggregate3 calldata."""
+    raw = bytes.fromhex(calldata[len(AGGREGATE3_SELECTOR):])
+    start = int.from_bytes(raw[:32], "big")
+    count = int.from_bytes(raw[start:start + 32], "big")
+    base, out = start + 32, []
+    for i in range(count):
+        t = base + int.from_bytes(raw[base + 32 * i:base + 32 * (i + 1)], "big")
+        target = "0x" + raw[t + 12:t + 32].hex()
+        allow = int.from_bytes(raw[t + 32:t + 64], "big")
+        d = t + int.from_bytes(raw[t + 64:t + 96], "big")
+        length = int.from_bytes(raw[d:d + 32], "big")
+        out.append((target, allow, "0x" + raw[d + 32:d + 32 + length].hex()))
+    return out
+
+
+def encode_results(results):
+    """aggregate3 return data for [(success, return_bytes)]."""
+    heads, tails, offset = [], [], 32 * len(results)
+    for success, data in results:
+        tail = word(int(success)) + word(64) + word(len(data)) + data + b"\x00" * (-len(data) % 32)
+        heads.append(word(offset))
+        tails.append(tail)
+        offset += len(tail)
+    return "0x" + (word(32) + word(len(results)) + b"".join(heads) + b"".join(tails)).hex()
+
+
+def test_encode_round_trip():
+    calldata = encode_aggregate3(CALLS)
+    assert calldata.startswith(AGGREGATE3_SELECTOR)
+    assert (len(calldata) - len(AGGREGATE3_SELECTOR)) % 64 == 0
+    assert decode_calls(calldata) == [(target, 1, data) for target, data in CALLS]
+
+
+def test_encode_accepts_calldata_without_0x():
+    assert encode_aggregate3([(CALLS[0][0], CALLS[0][1][2:])]) == encode_aggregate3([CALLS[0]])
+
+
+def test_decode_round_trip():
+    results = [(True, word(10 ** 18)), (False, b""), (True, b"\x01\x02\x03"), (True, word(1) + word(2))]
+    assert decode_aggregate3(encode_results(results)) == results
+
+
+def test_decode_empty():
+    assert decode_aggregate3("0x") == []
+    assert decode_aggregate3(encode_results([])) == []
@@ -0,0 +1,44 @@
+import pytest
+
+from rpc_client import AIMD_START_SCALE, OK, RpcClient, get_client
+
+URL = "http://rpc.invalid"
+
+
+@pytest.fixture
+def client():
+    client = RpcClient([URL])
+    yield client
+    client.close()
+
+
+def answer(client, body):
+    client._post = lambda url, payload: (OK, body)
+    return client.batch([("eth_call", [{}, "latest"])] * len(body))
+
+
+def test_reverted_sub_call_is_not_congestion(client):
+    results = answer(client, [{"id": 0, "result": "0x01"},
+                              {"id": 1, "error": {"code": 3, "message": "execution reverted"}}])
+    assert results == ["0x01", None]
+    assert client.pool.health[URL].aimd.scale > AIMD_START_SCALE
+
+
+def test_errored_sub_call_is_partial(client):
+    results = answer(client, [{"id": 0, "result": "0x01"},
+                              {"id": 1, "error": {"code": -32005, "message": "limit exceeded"}}])
+    assert results == ["0x01", None]
+    assert client.pool.health[URL].aimd.scale < AIMD_START_SCALE
+
+
+def test_missing_sub_call_is_partial(client):
+    client._post = lambda url, payload: (OK, [{"id": 0, "result": "0x01"}])
+    assert client.batch([("eth_call", []), ("eth_call", [])]) == ["0x01", None]
+    assert client.pool.health[URL].aimd.scale < AIMD_START_SCALE
+
+
+def test_shared_client_per_in_flight_cap():
+    urls = ["http://shared.invalid"]
+    assert get_client(urls, max_in_flight=4) is get_client(urls, max_in_flight=4)
+    wide = get_client(urls, max_in_flight=16)
+    assert wide.max_in_flight == 16 and get_client(urls, max_in_flight=4).max_in_flight == 4
@@ -0,0 +1,80 @@
+import math
+import random
+
+import pytest
+
+from stream_stats import ACCURACY, StreamStats
+
+BUCKETS = [("< 10", 10), ("10-100", 100), ("100+", math.inf)]
+
+
+def sample(n, seed=1):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(3, 2) for _ in range(n)]
+
+
+def build(values, start=1_700_000_000):
+    stats = StreamStats(BUCKETS)
+    for i, v in enumerate(values):
+        stats.add(v, start + i * 3600)
+    return stats
+
+
+@pytest.mark.parametrize("q", [0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1])
+def test_quantile_relative_error(q):
+    values = sample(5_000)
+    exact = sorted(values)[math.floor(q * (len(values) - 1))]
+    estimate = build(values).quantile(q)
+    assert abs(estimate - exact) <= ACCURACY * exact * (1 + 1e-9)
+
+
+def test_quantile_with_zeros():
+    stats = build([0, 0, 0, 5, 50])
+    assert stats.quantile(0) == 0
+    assert stats.quantile(0.5) == 0
+    assert stats.quantile(1) == pytest.approx(50, rel=ACCURACY)
+
+
+def test_empty():
+    stats = StreamStats()
+    assert stats.quantile(0.5) is None
+    assert stats.summary()["mean"] is None
+
+
+def test_exact_counts():
+    values = sample(1_000)
+    stats = build(values)
+    assert stats.count == len(values)
+    assert stats.total == pytest.approx(sum(values))
+    assert (stats.min, stats.max) == (min(values), max(values))
+    assert stats.bucket_counts == [sum(1 for v in values if v < 10),
+                                   sum(1 for v in values if 10 <= v < 100),
+                                   sum(1 for v in values if v >= 100)]
+    assert sum(stats.days.values()) == len(values)
+
+
+def test_merge_matches_single_pass():
+    values = sample(3_000)
+    whole = build(values).to_dict()
+    merged = build(values[:1_000]).merge(build(values[1_000:], start=1_700_000_000 + 1_000 * 3600)).to_dict()
+    assert merged.pop("total") == pytest.approx(whole.pop("total"))
+    assert merged == whole
+
+
+def test_merge_empty():
+    stats = build(sample(10))
+    before = stats.to_dict()
+    assert stats.merge(StreamStats(BUCKETS)).to_dict() == before
+    assert StreamStats(BUCKETS).merge(stats).to_dict() == before
+
+
+def test_merge_rejects_other_buckets():
+    with pytest.raises(ValueError):
+        StreamStats(BUCKETS).merge(StreamStats())
+
+
+def test_dict_round_trip():
+    stats = build(sample(500))
+    restored = StreamStats.from_dict(stats.to_dict())
+    assert restored.to_dict() == stats.to_dict()
+    assert restored.quantile(0.9) == stats.quantile(0.9)
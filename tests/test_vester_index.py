@@ -0,0 +1,66 @@
+import vester_index
+from vester_index import (ODOLO_CONTRACT, TRANSFER_TOPIC, USDC_E_CONTRACT, VESTER_CONTRACT, ZERO_ADDRESS,
+                          decode_exercise_receipts, transfer_amounts)
+
+USER = "0x" + "ab" * 20
+
+
+def topic(address):
+    return "0x" + address[2:].lower().rjust(64, "0")
+
+
+def transfer(token, from_addr, to_addr, value, tx_hash, index, block=100):
+    return {"address": token, "topics": [TRANSFER_TOPIC, topic(from_addr), topic(to_addr)],
+            "data": f"0x{value:064x}", "transactionHash": tx_hash, "logIndex": hex(index) if index else "0x",
+            "blockNumber": hex(block)}
+
+
+RECEIPTS = {
+    "0x01": [  # one payment, one burn
+        transfer(USDC_E_CONTRACT, USER, VESTER_CONTRACT, 150 * 10 ** 6, "0x01", 0),
+        transfer(ODOLO_CONTRACT, VESTER_CONTRACT, ZERO_ADDRESS, 1_000 * 10 ** 18, "0x01", 1),
+    ],
+    "0x02": [  # two payment legs (only the first counts) and a USDC.e transfer out of the Vester
+        transfer(USDC_E_CONTRACT, USER, VESTER_CONTRACT, 100 * 10 ** 6, "0x02", 0),
+        transfer(USDC_E_CONTRACT, VESTER_CONTRACT, USER, 7 * 10 ** 6, "0x02", 1),
+        transfer(USDC_E_CONTRACT, USER, VESTER_CONTRACT, 25 * 10 ** 6, "0x02", 2),
+        transfer(ODOLO_CONTRACT, VESTER_CONTRACT, ZERO_ADDRESS, 500 * 10 ** 18, "0x02", 3),
+    ],
+    "0x03": [  # no payment
+        transfer(ODOLO_CONTRACT, VESTER_CONTRACT, ZERO_ADDRESS, 1 * 10 ** 18, "0x03", 0),
+    ],
+}
+
+
+class FakeExplorer:
+    def paginate_logs(self, from_block, to_block, address, **filters):
+        topics = {k: v for k, v in filters.items() if k.startswith("topic") and "opr" not in k}
+        logs = [log for logs in RECEIPTS.values() for log in logs
+                if log["address"] == address
+                and all(log["topics"][int(k[5:])] == v for k, v in topics.items())]
+        yield from_block, list(reversed(logs))  # order must not matter
+
+
+def test_receipts_take_the_first_matching_transfer():
+    amounts = decode_exercise_receipts({h: {"logs": logs} for h, logs in RECEIPTS.items()} | {"0x04": None})
+    assert amounts == {"0x01": (150.0, 1_000.0), "0x02": (100.0, 500.0),
+                       "0x03": (None, 1.0), "0x04": (None, None)}
+
+
+def test_logs_and_receipts_agree(monkeypatch):
+    monkeypatch.setattr(vester_index, "routescan", FakeExplorer)
+    logged = {h: tuple(v) for h, v in transfer_amounts(0, 200).items()}
+    assert logged == decode_exercise_receipts({h: {"logs": logs} for h, logs in RECEIPTS.items()})
+
+
+def test_logs_outside_the_range_are_ignored(monkeypatch):
+    monkeypatch.setattr(vester_index, "routescan", FakeExplorer)
+    assert transfer_amounts(101, 200) == {}
+
+
+def test_unresolved_exercises_are_retried():
+    index = {"txs": [{"hash": h} for h in ("0xA1", "0xA2", "0xA3", "0xA4")]}
+    amounts = {"0xa3": (10.0, 1.0), "0xa4": (None, 2.0)}
+    assert vester_index.unresolved_exercises(index["txs"][2:], amounts) == ["0xA4"]
+    retried = vester_index.with_retries(index, index["txs"][3:], ["0xA1", "0xA4"])
+    assert [tx["hash"] for tx in retried] == ["0xA1", "0xA4"]
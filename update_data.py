@@ -1,20 +1,33 @@
 #!/usr/bin/env python3
 """
 veDOLO Dashboard — Auto-updater (Etherscan V2 API)
-Phase 1: Fetches all NFT transfers via Etherscan V2 tokennfttx (paginated, 100% accurate).
-Phase 2: Fetches locked DOLO amounts from Berachain RPC (batched, cached).
+Phase 1: Syncs NFT transfers via Etherscan V2 tokennfttx (incremental from a checkpoint).
+Phase 2: Fetches locked DOLO amounts from Berachain RPC (Multicall3, cached).
+Phase 3: Computes vote weights locally from the lock data (sample-verified on-chain).
 Outputs: vedolo_holders.json, vedolo_holders.csv
+
+Usage:
+    python3 update_data.py          # incremental transfer sync
+    python3 update_data.py --full   # rebuild the transfer log from block 0
 """
-import json, time, os, csv, sys
-import requests
+import asyncio, json, time, os, csv, sys
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from rpc_client import get_client
+from datasets import http_session
+from etherscan_client import etherscan, ExplorerError
+from cache_store import CacheStore, CACHE_DB
+from json_output import write_json
+from snapshot import Snapshot
+from holder_history import HolderHistory, HISTORY_DB
+from eip55 import to_checksum_addresses
+from multicall import MULTICALL3, encode_aggregate3, decode_aggregate3
+from abi_decode import columns, uints
+from vote_weight import compute_vote_weights, compare_vote_weights, sample_tokens
 
 # ===== CONFIG =====
 VEDOLO_CONTRACT = "0xCB86B75EE6133d179a12D550b09FB3cdB1e141D4"
-ETHERSCAN_V2 = "https://api.etherscan.io/v2/api"
 CHAIN_ID = 80094  # Berachain
-RPC_URL = "https://berachain.drpc.org/"
 RPC_URLS = [
     "https://berachain.drpc.org/",
     "https://rpc.berachain.com/",
@@ -22,153 +35,240 @@ RPC_URLS = [
 ]
 LOCKED_SELECTOR = "0xb45a3c0e"  # locked(uint256)
 BALANCE_OF_NFT_SELECTOR = "0xe7e242d4"  # balanceOfNFT(uint256) — current vote weight
-
-BATCH_SIZE = 50
-MAX_WORKERS = 4
+ZERO = "0x0000000000000000000000000000000000000000"
+
+# Lock-change events that alter locked(tokenId). veDOLO is a Velodrome V1-shaped
+# VotingEscrow (tokenId in the event data, as Withdraw in fetch_early_exits.py):
+# it has no Merge/Split events — merge() emits Deposit (MERGE_TYPE) for the kept
+# token and burns the other one, which the transfer log already drops.
+DEPOSIT_TOPIC = "0xff04ccafc360e16b67d682d17bd9503c4c6b9a131f6be6325762dc9ffc7de624"  # Deposit(address,uint256,uint256,uint256,uint8,uint256) — create/increase amount/increase unlock/merge
+LOCK_EVENT_TOPICS = [DEPOSIT_TOPIC]
+LOCK_EVENTS_STEP = 10000  # eth_getLogs block range (RPC limit for free tier)
+
+# Upper bounds — the RPC client's per-endpoint AIMD controller picks the
+# actual batch size and concurrency from how the providers are responding.
+BATCH_SIZE = 100  # calls per JSON-RPC batch (fallback path)
+MULTICALL_SIZE = 1000  # sub-calls packed into one Multicall3 aggregate3 eth_call
+MAX_IN_FLIGHT = 16  # concurrent RPC requests across the shared connection pools
+VOTE_VERIFY_SAMPLE = 200  # tokens spot-checked against balanceOfNFT each run
+VOTE_MAX_DRIFTED = 0.05  # fall back to full RPC if more than 5% of the sample drifts
+VOTE_VERIFY_CHUNK = 50  # sampled tokens per background balanceOfNFT check
+CHECKPOINT_SECONDS = 30  # save the lock cache at least this often while streaming...
+CHECKPOINT_BYTES = 2_000_000  # ...or once this much new cache data has piled up
+CACHE_ENTRY_BYTES = 48  # approx. on-disk size of one cached lock row
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
-CACHE_FILE = os.path.join(DATA_DIR, "locked_cache.json")
+LEGACY_CACHE_FILE = os.path.join(DATA_DIR, "locked_cache.json")  # imported into CACHE_DB once
+LEGACY_CACHE_STATE_FILE = os.path.join(DATA_DIR, "locked_cache_state.json")
 OUTPUT_JSON = os.path.join(DATA_DIR, "vedolo_holders.json")
 OUTPUT_CSV = os.path.join(DATA_DIR, "vedolo_holders.csv")
+TRANSFERS_FILE = os.path.join(DATA_DIR, "nft_transfers.json")
+OWNERSHIP_FILE = os.path.join(DATA_DIR, "ownership_state.json")
+# Fields of tokennfttx rows kept in the transfer log (all build_ownership needs)
+TRANSFER_FIELDS = ("blockNumber", "transactionIndex", "hash", "tokenID", "from", "to")
 
 API_KEY = os.environ.get("BERASCAN_API_KEY", "")
 
 
 # ===== PHASE 1: Fetch all NFT transfers via Etherscan V2 API =====
 
-def fetch_all_nft_transfers():
-    """Fetch complete NFT transfer history using startblock/endblock pagination.
+def fetch_nft_transfers(start_block=0, seen=None, end_block=99999999):
+    """Fetch NFT transfers in [start_block, end_block] using startblock/endblock pagination.
     
-    Etherscan V2 caps page*offset <= 10,000. To get ALL transactions,
-    we paginate by block range: fetch 10k sorted asc, then use the last
-    block number as the next startblock.
+    Etherscan V2 caps page*offset <= 10,000, so the explorer client pages by
+    block range (see ExplorerClient.paginate_blocks). `seen` holds hash+tokenID
+    keys already known at start_block so the boundary block is not duplicated.
     """
-    print("📡 Phase 1: Fetching NFT transfers via Etherscan V2 API...")
-
     if not API_KEY:
         print("❌ BERASCAN_API_KEY not set! Cannot fetch data.")
         sys.exit(1)
 
     all_txs = []
-    seen_hashes = set()  # Deduplicate txs spanning block boundaries
-    start_block = 0
-
-    while True:
-        params = {
-            "chainid": CHAIN_ID,
-            "module": "account",
-            "action": "tokennfttx",
-            "contractaddress": VEDOLO_CONTRACT,
-            "startblock": start_block,
-            "endblock": 99999999,
-            "page": 1,
-            "offset": 10000,
-            "sort": "asc",
-            "apikey": API_KEY,
-        }
+    pages = etherscan(CHAIN_ID, API_KEY).paginate_blocks(
+        start_block, end_block, key=transfer_key, seen=seen,
+        module="account", action="tokennfttx", contractaddress=VEDOLO_CONTRACT)
+    try:
+        for page_start, new_txs in pages:
+            all_txs.extend(new_txs)
+            print(f"  Block {page_start}+: {len(new_txs)} new (total: {len(all_txs)})")
+    except ExplorerError as e:
+        print(f"  ⚠️ API: {e}")
+        if not (all_txs or seen):
+            sys.exit(1)
+        return all_txs
+
+    print(f"  ✅ Fetched {len(all_txs)} new NFT transfers")
+    return all_txs
 
-        for retry in range(3):
-            try:
-                resp = requests.get(ETHERSCAN_V2, params=params, timeout=30)
-                data = resp.json()
-
-                if data.get("status") == "1" and isinstance(data.get("result"), list):
-                    results = data["result"]
-
-                    # Deduplicate (same block may appear in consecutive calls)
-                    new_count = 0
-                    for tx in results:
-                        tx_key = tx.get("hash", "") + tx.get("tokenID", "")
-                        if tx_key not in seen_hashes:
-                            seen_hashes.add(tx_key)
-                            all_txs.append(tx)
-                            new_count += 1
-
-                    print(f"  Block {start_block}+: {len(results)} txs, {new_count} new (total: {len(all_txs)})")
-
-                    if len(results) < 10000:
-                        # Got all remaining transfers
-                        print(f"  ✅ Fetched all {len(all_txs)} NFT transfers")
-                        return all_txs
-
-                    # Move startblock to the last block in results
-                    last_block = int(results[-1].get("blockNumber", start_block))
-                    if last_block == start_block:
-                        # Edge case: >10k txs in same block. Skip to next block.
-                        start_block = last_block + 1
-                    else:
-                        start_block = last_block
-
-                    time.sleep(0.25)  # Rate limit
-                    break
-
-                elif "rate" in str(data.get("result", "")).lower() or "max rate" in str(data.get("message", "")).lower():
-                    print(f"  Rate limited, waiting {2*(retry+1)}s...")
-                    time.sleep(2 * (retry + 1))
-                    continue
-
-                else:
-                    if data.get("message") == "No transactions found" or (
-                        isinstance(data.get("result"), str) and "No transactions" in data["result"]):
-                        print(f"  ✅ Fetched all {len(all_txs)} NFT transfers")
-                        return all_txs
-                    print(f"  ⚠️ API: {data.get('message')}: {str(data.get('result',''))[:100]}")
-                    if all_txs:
-                        return all_txs
-                    sys.exit(1)
-
-            except Exception as e:
-                print(f"  Error: {e}, retry {retry+1}/3")
-                time.sleep(2 * (retry + 1))
-        else:
-            print(f"  ❌ Failed after 3 retries at block {start_block}")
-            break
 
-    return all_txs
+def transfer_key(tx):
+    """Dedup key for one NFT transfer (a tx can move several tokens)."""
+    return tx.get("hash", "") + tx.get("tokenID", "")
 
 
+def load_transfer_log():
+    """Load the persisted transfer log. Returns None if missing or corrupt."""
+    if not os.path.exists(TRANSFERS_FILE):
+        return None
+    try:
+        with open(TRANSFERS_FILE) as f:
+            log = json.load(f)
+        last_block = int(log["last_block"])
+        transfers = log["transfers"]
+        if not isinstance(transfers, list):
+            raise ValueError("transfers is not a list")
+        max_block = max((int(t["blockNumber"]) for t in transfers), default=0)
+        if max_block != last_block:
+            raise ValueError(f"checkpoint {last_block} != last transfer block {max_block}")
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"  ⚠️ Transfer log corrupt ({e}) — doing a full rebuild")
+        return None
+    return {"last_block": last_block, "transfers": transfers}
+
+
+def save_transfer_log(transfers):
+    """Persist the compact transfer log with its last-synced-block checkpoint."""
+    log = {
+        "last_block": max((int(t["blockNumber"]) for t in transfers), default=0),
+        "transfers": [{k: t.get(k, "") for k in TRANSFER_FIELDS} for t in transfers],
+    }
+    tmp = TRANSFERS_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(log, f, separators=(",", ":"))
+    os.replace(tmp, TRANSFERS_FILE)
 
 
-def build_ownership(txs):
-    """Build current ownership map from NFT transfers."""
-    print("\n📊 Building ownership map...")
-    ZERO = "0x0000000000000000000000000000000000000000"
+def sync_nft_transfers(full_resync=False, end_block=99999999):
+    """Bring the persisted transfer log up to end_block and return (all_txs, new_txs).
+
+    Only blocks from the checkpoint onwards are fetched. The checkpoint block
+    itself is re-fetched (a 10k page may have cut it short) and deduplicated
+    against the transfers already logged for it.
+    """
+    print("📡 Phase 1: Syncing NFT transfers via Etherscan V2 API...")
+
+    log = None if full_resync else load_transfer_log()
+    if log is None:
+        print("  Full rebuild from block 0")
+        new_txs = fetch_nft_transfers(0, end_block=end_block)
+        all_txs = new_txs
+    else:
+        last_block = log["last_block"]
+        boundary = {transfer_key(t) for t in log["transfers"]
+                    if int(t["blockNumber"]) == last_block}
+        print(f"  Checkpoint: block {last_block:,} ({len(log['transfers']):,} transfers logged)")
+        new_txs = fetch_nft_transfers(last_block, seen=boundary, end_block=end_block)
+        all_txs = log["transfers"] + new_txs
+
+    if new_txs or log is None:
+        save_transfer_log(all_txs)
+    print(f"  ✅ {len(new_txs):,} new, {len(all_txs):,} total NFT transfers")
+    return all_txs, new_txs
+
+
+def new_ownership_state():
+    """Empty ownership state: token -> owner, owner -> tokens, minted set, burn count."""
+    return {"transfer_count": 0, "owners": {}, "holders": {}, "minted": set(), "burned": 0}
+
+
+def load_ownership_state():
+    """Load the persisted ownership state. Returns None if missing or corrupt."""
+    if not os.path.exists(OWNERSHIP_FILE):
+        return None
+    try:
+        with open(OWNERSHIP_FILE) as f:
+            raw = json.load(f)
+        return {
+            "transfer_count": int(raw["transfer_count"]),
+            "owners": {int(tid): owner for tid, owner in raw["owners"].items()},
+            "holders": {owner: set(tids) for owner, tids in raw["holders"].items()},
+            "minted": set(raw["minted"]),
+            "burned": int(raw["burned"]),
+        }
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"  ⚠️ Ownership state corrupt ({e}) — replaying full history")
+        return None
+
+
+def save_ownership_state(state):
+    raw = {
+        "transfer_count": state["transfer_count"],
+        "owners": {str(tid): owner for tid, owner in state["owners"].items()},
+        "holders": {owner: sorted(tids) for owner, tids in state["holders"].items()},
+        "minted": sorted(state["minted"]),
+        "burned": state["burned"],
+    }
+    tmp = OWNERSHIP_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(raw, f, separators=(",", ":"))
+    os.replace(tmp, OWNERSHIP_FILE)
 
-    # Sort by block number and transaction index for correct ordering
-    txs.sort(key=lambda t: (int(t.get("blockNumber", 0)), int(t.get("transactionIndex", 0))))
 
-    ownership = {}  # token_id -> current_owner
-    all_minted = set()
+def apply_transfers(state, txs):
+    """Apply transfers to the ownership state as deltas.
+
+    Only the sender's and receiver's token sets are touched, and the burn
+    count is adjusted on the fly, so the cost is proportional to len(txs).
+    """
+    # Sort by block number and transaction index for correct ordering
+    txs = sorted(txs, key=lambda t: (int(t.get("blockNumber", 0)), int(t.get("transactionIndex", 0))))
+    owners = state["owners"]
+    holders = state["holders"]
 
     for tx in txs:
         token_id = int(tx.get("tokenID", 0))
         from_addr = tx.get("from", "").lower()
         to_addr = tx.get("to", "").lower()
 
-        if from_addr == ZERO.lower():
-            all_minted.add(token_id)
+        if from_addr == ZERO:
+            state["minted"].add(token_id)
 
-        ownership[token_id] = to_addr
+        prev = owners.get(token_id)
+        if prev == to_addr:
+            continue
+        if prev == ZERO:
+            state["burned"] -= 1
+        elif prev is not None:
+            tids = holders[prev]
+            tids.discard(token_id)
+            if not tids:
+                del holders[prev]
+
+        if to_addr == ZERO:
+            state["burned"] += 1
+        else:
+            holders.setdefault(to_addr, set()).add(token_id)
+        owners[token_id] = to_addr
 
-    # Count stats
-    burned = sum(1 for addr in ownership.values() if addr == ZERO.lower())
+    state["transfer_count"] += len(txs)
+    return state
 
-    active_owners = {}
-    for tid, owner in ownership.items():
-        if owner == ZERO.lower():
-            continue
-        if owner not in active_owners:
-            active_owners[owner] = []
-        active_owners[owner].append(tid)
+
+def build_ownership(txs, new_txs=None):
+    """Build current ownership map from NFT transfers.
+
+    When `new_txs` is given and the persisted state already covers the rest
+    of `txs`, only `new_txs` are applied; otherwise the full history is replayed.
+    """
+    print("\n📊 Building ownership map...")
+
+    state = load_ownership_state() if new_txs is not None else None
+    if state is not None and state["transfer_count"] == len(txs) - len(new_txs):
+        print(f"  Applying {len(new_txs):,} new transfers to saved state")
+        apply_transfers(state, new_txs)
+    else:
+        print(f"  Replaying {len(txs):,} transfers")
+        state = apply_transfers(new_ownership_state(), txs)
+    save_ownership_state(state)
 
     stats = {
-        "total_minted": len(all_minted),
-        "total_burned": burned,
-        "active_nfts": len(all_minted) - burned,
-        "unique_holders": len(active_owners),
+        "total_minted": len(state["minted"]),
+        "total_burned": state["burned"],
+        "active_nfts": len(state["minted"]) - state["burned"],
+        "unique_holders": len(state["holders"]),
     }
 
     holders = []
-    for addr, tids in active_owners.items():
+    for addr, tids in state["holders"].items():
         holders.append({
             "address": addr,
             "nft_count": len(tids),
@@ -183,209 +283,405 @@ def build_ownership(txs):
 
 # ===== PHASE 2: Fetch locked DOLO + PHASE 3: Fetch vote weights =====
 
-def make_batch_call(token_ids):
+def rpc():
+    """Shared pooled RPC client for all phases of this run."""
+    return get_client(RPC_URLS, max_in_flight=MAX_IN_FLIGHT)
+
+
+def rpc_call(method, params):
+    """Single JSON-RPC call with fallback across RPC_URLS. Returns None on failure."""
+    return rpc().call(method, params)
+
+
+_snapshot = Snapshot(None, None)  # reads "latest" until main() pins a block
+
+
+def snapshot():
+    """The block snapshot every chain read of this run is pinned to."""
+    return _snapshot
+
+
+def pin_snapshot(store):
+    """Pin this run's reads to one block (resuming an unfinished run's block)."""
+    global _snapshot
+    head = rpc_call("eth_blockNumber", [])
+    _snapshot = Snapshot.pin(store, int(head, 16) if head else None)
+    if _snapshot.block is None:
+        print("⚠️  Could not read head block — chain reads use \"latest\"")
+    else:
+        print(f"📌 Snapshot block {_snapshot.block:,}{' (resumed)' if _snapshot.resumed else ''}")
+    return _snapshot
+
+
+def token_calls(selector, token_ids):
+    return [("eth_call", [{"to": VEDOLO_CONTRACT, "data": selector + hex(tid)[2:].zfill(64)}, snapshot().tag])
+            for tid in token_ids]
+
+
+def decode_locked(returns):
+    """locked() return data (hex or bytes) -> [{"amount", "end"} or None if too short].
+    amount is an int128, sign-extended to a full word."""
+    cols = columns(returns, [("amount", "int256"), ("end", "uint256")], decimals={"amount": 18})
+    return [{"amount": amount, "end": end} if valid else None
+            for amount, end, valid in zip(cols["amount"], cols["end"], cols["valid"])]
+
+
+async def make_batch_call(token_ids):
     """Batch RPC call for locked(uint256)."""
-    s = requests.Session()
-    batch = []
-    for i, tid in enumerate(token_ids):
-        encoded = hex(tid)[2:].zfill(64)
-        batch.append({
-            "jsonrpc": "2.0",
-            "method": "eth_call",
-            "params": [{"to": VEDOLO_CONTRACT, "data": LOCKED_SELECTOR + encoded}, "latest"],
-            "id": i
-        })
+    results = await rpc().abatch(token_calls(LOCKED_SELECTOR, token_ids))
+    if results is None:
+        return {tid: {"amount": 0, "end": 0, "error": True} for tid in token_ids}
 
-    out = {}
-    for retry in range(3):
-        try:
-            resp = s.post(RPC_URL, json=batch, timeout=15,
-                          headers={"Content-Type": "application/json"})
-            if resp.status_code == 429:
-                time.sleep(1 * (retry + 1))
-                continue
-            resp.raise_for_status()
-            results = resp.json()
-            for r in results:
-                idx = r["id"]
-                tid = token_ids[idx]
-                if "result" in r and r["result"] and len(r["result"]) >= 66:
-                    raw = r["result"]
-                    amount_raw = int(raw[2:66], 16)
-                    if amount_raw >= 2**127:
-                        amount_raw -= 2**128
-                    end_raw = int(raw[66:130], 16)
-                    out[tid] = {"amount": amount_raw / 1e18, "end": end_raw}
-                else:
-                    out[tid] = {"amount": 0, "end": 0}
-            return out
-        except Exception as e:
-            if retry < 2:
-                time.sleep(0.5 * (retry + 1))
-
-    for tid in token_ids:
-        if tid not in out:
-            out[tid] = {"amount": 0, "end": 0, "error": True}
+    return {tid: lock or {"amount": 0, "end": 0} for tid, lock in zip(token_ids, decode_locked(results))}
+
+
+async def make_multicall(selector, token_ids):
+    """Multicall3 aggregate3 read of selector(uint256) for every token ID.
+
+    Returns {token_id: return_bytes} for the sub-calls that succeeded.
+    Failed sub-calls (or a failed aggregate call) are simply absent.
+    Sub-calls already read in this run's snapshot are served from the cache.
+    """
+    calls = [(VEDOLO_CONTRACT, selector + hex(tid)[2:].zfill(64)) for tid in token_ids]
+    known = snapshot().cached(calls)
+    todo = [(tid, call) for tid, call in zip(token_ids, calls) if call not in known]
+    out = {tid: bytes.fromhex(known[call][2:]) for tid, call in zip(token_ids, calls) if call in known}
+    if not todo:
+        return out
+
+    result = await rpc().acall("eth_call", [
+        {"to": MULTICALL3, "data": encode_aggregate3([call for _, call in todo])}, snapshot().tag])
+    if not result:
+        return out
+    fresh = {}
+    for (tid, call), (ok, ret) in zip(todo, decode_aggregate3(result)):
+        if ok:
+            out[tid] = ret
+            fresh[call] = "0x" + ret.hex()
+    snapshot().remember(fresh)
     return out
 
 
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE) as f:
-            return json.load(f)
-    return {}
+async def make_locked_multicall(token_ids):
+    """locked(uint256) for a chunk of tokens in one eth_call.
+    Sub-calls that fail fall back to make_batch_call()."""
+    returns = await make_multicall(LOCKED_SELECTOR, token_ids)
+    out = {tid: lock for tid, lock in zip(returns, decode_locked(list(returns.values()))) if lock}
 
+    failed = [tid for tid in token_ids if tid not in out]
+    size = rpc().batch_size(BATCH_SIZE)
+    for part in await asyncio.gather(*(make_batch_call(failed[i:i+size])
+                                       for i in range(0, len(failed), size))):
+        out.update(part)
+    return out
 
-def save_cache(cache):
-    tmp = CACHE_FILE + ".tmp"
-    with open(tmp, "w") as f:
-        json.dump(cache, f)
-    os.replace(tmp, CACHE_FILE)
 
+async def make_vote_multicall(token_ids):
+    """balanceOfNFT(uint256) for a chunk of tokens in one eth_call.
+    Sub-calls that fail fall back to make_vote_batch_call(); tokens whose
+    read failed there too are absent from the result."""
+    out = {}
+    for tid, ret in (await make_multicall(BALANCE_OF_NFT_SELECTOR, token_ids)).items():
+        if len(ret) >= 32:
+            out[tid] = int.from_bytes(ret[0:32], "big") / 1e18
+
+    failed = [tid for tid in token_ids if tid not in out]
+    size = rpc().batch_size(BATCH_SIZE)
+    for part in await asyncio.gather(*(make_vote_batch_call(failed[i:i+size])
+                                       for i in range(0, len(failed), size))):
+        out.update(part)
+    return out
 
-def fetch_locked_dolo(all_token_ids):
-    """Fetch locked DOLO for all token IDs."""
-    print(f"\n🔒 Phase 2: Fetching locked DOLO for {len(all_token_ids):,} tokens...")
 
-    cache = load_cache()
-    cached_ids = {int(k) for k in cache.keys()}
+def open_cache():
+    """Open the lock cache store, importing the legacy JSON cache on first use."""
+    store = CacheStore(CACHE_DB)
+    migrated = store.migrate_locks_json(LEGACY_CACHE_FILE)
+    if migrated:
+        print(f"  📦 Migrated {migrated:,} cached locks from {os.path.basename(LEGACY_CACHE_FILE)}")
+        try:
+            with open(LEGACY_CACHE_STATE_FILE) as f:
+                save_cache_checkpoint(store, int(json.load(f)["last_block"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    return store
+
+
+def load_cache_checkpoint(store):
+    """Block up to which lock-change events are reflected in the cache (None if unknown)."""
+    return store.get("meta", "locks_last_block")
+
+
+def save_cache_checkpoint(store, block):
+    store.put("meta", "locks_last_block", block)
+    store.commit()
+
+
+def fetch_lock_changes(from_block, to_block):
+    """Token IDs whose lock changed in [from_block, to_block], or None if a range failed."""
+    touched = set()
+    block = from_block
+    while block <= to_block:
+        end = min(block + LOCK_EVENTS_STEP - 1, to_block)
+        logs = rpc_call("eth_getLogs", [{
+            "address": VEDOLO_CONTRACT,
+            "topics": [LOCK_EVENT_TOPICS],
+            "fromBlock": hex(block),
+            "toBlock": hex(end)
+        }])
+        if logs is None:
+            print(f"  ⚠️ eth_getLogs failed for blocks {block:,}-{end:,}")
+            return None
+        for log in logs:
+            if log["topics"][0] == DEPOSIT_TOPIC:
+                touched.add(int(log["data"][2:66], 16))  # tokenId is the first data word
+        block = end + 1
+    return touched
+
+
+class Checkpointer:
+    """Calls save() once CHECKPOINT_SECONDS have passed or roughly
+    CHECKPOINT_BYTES of new results have piled up since the last save."""
+
+    def __init__(self, save, seconds=CHECKPOINT_SECONDS, max_bytes=CHECKPOINT_BYTES):
+        self.save = save
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.pending = 0
+        self.last = time.monotonic()
+
+    def add(self, nbytes):
+        """Account for nbytes of new data; returns True if a checkpoint was written."""
+        self.pending += nbytes
+        if self.pending >= self.max_bytes or time.monotonic() - self.last >= self.seconds:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        if self.pending:
+            self.save()
+        self.pending = 0
+        self.last = time.monotonic()
+
+
+def plan_lock_refresh(all_token_ids, store):
+    """Load the cached locks and work out which tokens need a locked() read.
+
+    Cached entries are refreshed only for tokens touched by a lock-change
+    event (deposit, increase amount/unlock time, merge, split) since the
+    last checkpoint, up to the snapshot block; tokens never seen before are
+    fetched as usual. Returns (cache, to_fetch, scanned_to) — scanned_to is
+    None if the scan must be retried.
+    """
+    cache = store.get_locks(all_token_ids)
+    cached_ids = {int(k) for k, v in cache.items() if "error" not in v}
     missing = [tid for tid in all_token_ids if tid not in cached_ids]
-    print(f"  Cached: {len(all_token_ids) - len(missing):,}/{len(all_token_ids):,}")
-    print(f"  To fetch: {len(missing):,}")
 
-    if missing:
-        chunks = [missing[i:i+BATCH_SIZE] for i in range(0, len(missing), BATCH_SIZE)]
-        errors = 0
-        done = 0
-        chunk_idx = 0
-
-        while chunk_idx < len(chunks):
-            window = chunks[chunk_idx:chunk_idx + MAX_WORKERS]
-
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = {executor.submit(make_batch_call, c): ci for ci, c in enumerate(window)}
-                for future in as_completed(futures):
-                    for tid, data_item in future.result().items():
-                        cache[str(tid)] = data_item
-                        done += 1
-                        if "error" in data_item:
-                            errors += 1
-
-            chunk_idx += len(window)
-            if chunk_idx % 50 == 0 or chunk_idx >= len(chunks):
-                pct = (done / len(missing)) * 100
-                print(f"  Progress: {pct:.0f}% ({done:,}/{len(missing):,}) | Errors: {errors}")
-                save_cache(cache)
-            time.sleep(0.15)
-
-        save_cache(cache)
-        print(f"  ✅ Done. Errors: {errors}/{len(missing):,}")
-    else:
-        print("  ✅ All cached!")
+    head = snapshot().block
+    checkpoint = load_cache_checkpoint(store)
+    stale = []
+    if head is None:
+        print("  ⚠️ No snapshot block — skipping lock-change scan")
+    elif checkpoint is None:
+        if cached_ids:
+            print("  No lock-change checkpoint — refreshing every cached token once")
+            stale = [tid for tid in all_token_ids if tid in cached_ids]
+    elif head > checkpoint:
+        touched = fetch_lock_changes(checkpoint + 1, head)
+        if touched is None:
+            head = None  # keep the old checkpoint; retry the scan next run
+        else:
+            stale = [tid for tid in all_token_ids if tid in cached_ids and tid in touched]
+            print(f"  Lock changes since block {checkpoint:,}: {len(touched):,} tokens")
 
-    return cache
+    missing += stale
+    print(f"  Cached: {len(all_token_ids) - len(missing):,}/{len(all_token_ids):,}")
+    print(f"  To fetch: {len(missing):,} ({len(stale):,} refreshed)")
+    return cache, missing, head
+
+
+class VoteStage:
+    """Phase 3 as a pipeline stage: evaluates the ve curve for each batch of
+    locks as it lands and spot-checks sampled tokens on-chain meanwhile."""
+
+    def __init__(self, all_token_ids, timestamp):
+        self.timestamp = timestamp
+        self.weights = {}
+        self.sample = sample_tokens(all_token_ids, VOTE_VERIFY_SAMPLE)
+        self._sampled = set(self.sample)
+        self._to_verify = []
+        self._checks = []
+
+    def feed(self, token_ids, locks):
+        self.weights.update(compute_vote_weights(token_ids, locks, self.timestamp))
+        self._to_verify += [tid for tid in token_ids if tid in self._sampled]
+        if len(self._to_verify) >= VOTE_VERIFY_CHUNK:
+            self._verify()
+
+    def _verify(self):
+        if self._to_verify:
+            self._checks.append(asyncio.ensure_future(make_vote_multicall(self._to_verify)))
+            self._to_verify = []
+
+    async def finish(self):
+        """Wait for the outstanding on-chain checks; returns the drift report.
+        Only successful reads are compared: a failed check (or a sub-call
+        that failed) leaves its tokens unchecked rather than reading as 0."""
+        self._verify()
+        onchain = {}
+        for result in await asyncio.gather(*self._checks, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"  ⚠️ On-chain vote check failed: {result}")
+                continue
+            onchain.update((tid, weight) for tid, weight in result.items() if weight is not None)
+        return compare_vote_weights(self.weights, onchain, self.sample)
 
 
-def make_vote_batch_call(token_ids):
-    """True JSON-RPC batch call for balanceOfNFT(uint256) — much faster than individual calls."""
-    s = requests.Session()
-    batch = []
-    for i, tid in enumerate(token_ids):
-        encoded = hex(tid)[2:].zfill(64)
-        batch.append({
-            "jsonrpc": "2.0",
-            "method": "eth_call",
-            "params": [{"to": VEDOLO_CONTRACT, "data": BALANCE_OF_NFT_SELECTOR + encoded}, "latest"],
-            "id": i
-        })
+async def stream_locks_and_votes(all_token_ids, store, cache, missing, timestamp):
+    """Stream locked() chunks into the cache store and on into the vote stage.
 
-    out = {}
-    for rpc_url in RPC_URLS:
-        for retry in range(3):
-            try:
-                resp = s.post(rpc_url, json=batch, timeout=30,
-                              headers={"Content-Type": "application/json"})
-                if resp.status_code == 429:
-                    time.sleep(1 * (retry + 1))
-                    continue
-                resp.raise_for_status()
-                results = resp.json()
-                if not isinstance(results, list):
-                    time.sleep(0.5 * (retry + 1))
-                    continue
-                for r in results:
-                    idx = r.get("id", 0)
-                    if idx < len(token_ids):
-                        tid = token_ids[idx]
-                        if "result" in r and r["result"] and len(r["result"]) > 2:
-                            val = int(r["result"], 16)
-                            out[tid] = val / 1e18
-                        else:
-                            out[tid] = 0.0
-                # Fill any missing
-                for tid in token_ids:
-                    if tid not in out:
-                        out[tid] = 0.0
-                return out
-            except Exception as e:
-                if retry < 2:
-                    time.sleep(0.5 * (retry + 1))
-        # If this RPC failed, try next one
-        if out:
-            return out
-
-    # Final fallback: all zeros
-    for tid in token_ids:
-        if tid not in out:
-            out[tid] = 0.0
-    return out
+    Returns (vote_weights, drift_report, fetch_errors)."""
+    votes = VoteStage(all_token_ids, timestamp)
+    refresh = set(missing)
+    votes.feed([tid for tid in all_token_ids if tid not in refresh], cache)
 
+    done = errors = 0
+    checkpoint = Checkpointer(store.commit)
+    async for result in rpc().stream(make_locked_multicall, missing, MULTICALL_SIZE):
+        store.put_locks(result)
+        for tid, data_item in result.items():
+            cache[str(tid)] = data_item
+            if "error" in data_item:
+                errors += 1
+        done += len(result)
+        votes.feed(list(result), cache)
+        if checkpoint.add(len(result) * CACHE_ENTRY_BYTES):
+            print(f"  Progress: {done / len(missing):.0%} ({done:,}/{len(missing):,}) | Errors: {errors}")
+    checkpoint.flush()
 
-def fetch_vote_weights(all_token_ids):
-    """Fetch current vote weights for all tokens using true JSON-RPC batch calls.
-    Much faster than individual calls — sends BATCH_SIZE calls per request."""
-    print(f"\n⚖️  Phase 3: Fetching vote weights for {len(all_token_ids):,} tokens...")
+    return votes.weights, await votes.finish(), errors
 
-    vote_weights = {}
-    chunks = [all_token_ids[i:i+BATCH_SIZE] for i in range(0, len(all_token_ids), BATCH_SIZE)]
-    done = 0
-    chunk_idx = 0
 
-    while chunk_idx < len(chunks):
-        window = chunks[chunk_idx:chunk_idx + MAX_WORKERS]
+def fetch_locks_and_votes(all_token_ids, store):
+    """Phases 2 + 3 as one streaming pipeline.
 
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {executor.submit(make_vote_batch_call, c): ci for ci, c in enumerate(window)}
-            for future in as_completed(futures):
-                for tid, weight in future.result().items():
-                    vote_weights[tid] = weight
-                    done += 1
+    locked() results flow from the RPC workers straight into the cache and
+    the local vote-weight stage, so Phase 3 is done (bar its on-chain
+    sample check) as soon as the last lock lands. Returns (cache, vote_weights).
+    """
+    print(f"\n🔒 Phase 2: Fetching locked DOLO for {len(all_token_ids):,} tokens...")
+    cache, missing, scanned_to = plan_lock_refresh(all_token_ids, store)
 
-        chunk_idx += len(window)
-        pct = (done / len(all_token_ids)) * 100 if all_token_ids else 100
-        print(f"  Progress: {pct:.0f}% ({done:,}/{len(all_token_ids):,})")
-        time.sleep(0.1)
+    timestamp = get_chain_timestamp()
+    vote_weights, report, errors = rpc().run(
+        stream_locks_and_votes(all_token_ids, store, cache, missing, timestamp))
+    if missing:
+        print(f"  ✅ Done. Errors: {errors}/{len(missing):,}")
+    else:
+        print("  ✅ All cached!")
+    if scanned_to is not None:
+        save_cache_checkpoint(store, scanned_to)
+
+    print(f"\n⚖️  Phase 3: Computing vote weights for {len(all_token_ids):,} tokens...")
+    print(f"  Evaluated ve decay at block time {timestamp}")
+    drifted = report["drifted"]
+    print(f"  Verified {report['checked']}/{report['sampled']} sampled tokens on-chain | "
+          f"Drifted: {len(drifted)} | Max drift: {report['max_rel_drift']:.4%}")
+
+    if report["checked"] and len(drifted) / report["checked"] > VOTE_MAX_DRIFTED:
+        print(f"  ⚠️ Local weights drift on {len(drifted)} tokens — fetching all on-chain")
+        onchain = fetch_vote_weights_rpc(all_token_ids)
+        if len(onchain) < len(all_token_ids):
+            print(f"  ⚠️ {len(all_token_ids) - len(onchain):,} on-chain reads failed — keeping their local weights")
+        vote_weights.update(onchain)
+        return cache, vote_weights
+
+    for d in drifted:  # only sampled tokens whose on-chain read succeeded can drift
+        vote_weights[d["id"]] = d["onchain"]
+
+    print(f"  ✅ Done. {len(vote_weights):,} vote weights computed.")
+    return cache, vote_weights
+
+
+async def make_vote_batch_call(token_ids):
+    """True JSON-RPC batch call for balanceOfNFT(uint256) — much faster than individual calls.
+    Failed reads are left out (never reported as a 0 weight)."""
+    results = await rpc().abatch(token_calls(BALANCE_OF_NFT_SELECTOR, token_ids))
+    if results is None:
+        return {}
+    read = [(tid, raw) for tid, raw in zip(token_ids, results) if raw and len(raw) > 2]
+    return dict(zip([tid for tid, _ in read], uints([raw for _, raw in read], decimals=18)))
+
+
+def fetch_vote_weights_rpc(all_token_ids):
+    """Fetch current vote weights for all tokens via Multicall3.
+    Packs up to MULTICALL_SIZE balanceOfNFT calls into each eth_call.
+    Tokens whose read failed are absent from the result."""
+    vote_weights = {}
 
+    async def collect():
+        async for result in rpc().stream(make_vote_multicall, all_token_ids, MULTICALL_SIZE):
+            vote_weights.update(result)
+            pct = (len(vote_weights) / len(all_token_ids)) * 100
+            print(f"  Progress: {pct:.0f}% ({len(vote_weights):,}/{len(all_token_ids):,})")
+
+    rpc().run(collect())
     print(f"  ✅ Done. {len(vote_weights):,} vote weights fetched.")
     return vote_weights
 
 
+def get_chain_timestamp():
+    """Timestamp of the snapshot block (falls back to wall clock)."""
+    block = rpc_call("eth_getBlockByNumber", [snapshot().tag, False])
+    if block and block.get("timestamp"):
+        return int(block["timestamp"], 16)
+    return int(time.time())
+
+
+def open_history():
+    """Open the holder history. Exits if the last output recorded more runs
+    than the db holds — the db was lost or is stale, and appending would
+    quietly start a new history."""
+    expected = 0
+    try:
+        with open(OUTPUT_JSON) as f:
+            expected = int(json.load(f).get("history_runs", 0))
+    except (OSError, ValueError, TypeError, AttributeError):
+        pass
+    if expected and not os.path.exists(HISTORY_DB):
+        print(f"❌ {os.path.basename(HISTORY_DB)} is missing but {os.path.basename(OUTPUT_JSON)} "
+              f"records {expected:,} history runs — restore it before updating.")
+        sys.exit(1)
+    history = HolderHistory(HISTORY_DB)
+    if history.run_count() < expected:
+        print(f"❌ {os.path.basename(HISTORY_DB)} holds {history.run_count():,} runs but "
+              f"{os.path.basename(OUTPUT_JSON)} records {expected:,} — restore the latest copy before updating.")
+        sys.exit(1)
+    return history
+
+
 # ===== MAIN =====
 
-def main():
+def main(full_resync=False):
     print("=" * 60)
     print("🔄 veDOLO Dashboard — Data Update (Etherscan V2)")
     print(f"   {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
     print("=" * 60)
 
-    # Phase 1: Fetch all NFT transfers
-    txs = fetch_all_nft_transfers()
+    # Pin every chain read (and the Etherscan sync) to one block
+    store = open_cache()
+    history = open_history()
+    snap = pin_snapshot(store)
+
+    # Phase 1: Sync NFT transfers (incremental from the persisted log)
+    txs, new_txs = sync_nft_transfers(full_resync, end_block=snap.block if snap.block is not None else 99999999)
 
     if not txs:
         print("⚠️  No transfers found! Keeping existing data.")
         sys.exit(0)
 
-    holders, stats = build_ownership(txs)
+    holders, stats = build_ownership(txs, None if full_resync else new_txs)
 
     if not holders:
         print("⚠️  No holders found!")
@@ -394,11 +690,14 @@ def main():
     # Collect all active token IDs
     all_token_ids = sorted({tid for h in holders for tid in h["token_ids"]})
 
-    # Phase 2: Fetch locked DOLO
-    cache = fetch_locked_dolo(all_token_ids)
+    # Phase 2 + 3: Locked DOLO streamed into vote weights (always fresh — decays over time)
+    cache, vote_weights = fetch_locks_and_votes(all_token_ids, store)
 
-    # Phase 3: Fetch vote weights (always fresh — decays over time)
-    vote_weights = fetch_vote_weights(all_token_ids)
+    print("\n🌐 RPC endpoints:")
+    for h in rpc().pool.report():
+        print(f"   {h['url']:<42} {h['requests']:>5} req  {h['errors']:>4} err  {h['throttled']:>4} 429  "
+              f"p50 {h['p50_ms'] if h['p50_ms'] is not None else '-':>5} ms  "
+              f"limit {h['limit']:>2}  batch x{h['batch_scale']}{'  (ejected)' if h['ejected'] else ''}")
 
     # Merge locked DOLO + vote weights into holders
     print("\n📊 Merging data...")
@@ -407,7 +706,6 @@ def main():
     for holder in holders:
         holder_dolo = 0
         holder_vote = 0
-        token_details = []
         earliest_end = float('inf')
         latest_end = 0
 
@@ -421,13 +719,11 @@ def main():
             if end > 0:
                 earliest_end = min(earliest_end, end)
                 latest_end = max(latest_end, end)
-            token_details.append({"id": tid, "dolo": round(amt, 2), "end": end, "vote_weight": round(vw, 4)})
 
         holder["total_dolo"] = round(holder_dolo, 2)
         holder["total_vote_weight"] = round(holder_vote, 4)
         holder["earliest_lock_end"] = earliest_end if earliest_end != float('inf') else 0
         holder["latest_lock_end"] = latest_end
-        holder["token_details"] = token_details
         total_locked_dolo += holder_dolo
         total_vote_weight += holder_vote
 
@@ -437,29 +733,35 @@ def main():
         h["rank"] = i
 
     # Checksum addresses
-    try:
-        from web3 import Web3
-        for h in holders:
-            try:
-                h["address"] = Web3.to_checksum_address(h["address"])
-            except Exception:
-                pass
-    except ImportError:
-        pass
+    for h, address in zip(holders, to_checksum_addresses(h["address"] for h in holders)):
+        h["address"] = address
 
     stats["total_locked_dolo"] = round(total_locked_dolo, 2)
     stats["total_vote_weight"] = round(total_vote_weight, 4)
 
+    # Append this run to the holder history (stats series + per-holder deltas)
+    run_id, changed = history.append(snap.block, int(time.time()), stats, holders)
+    history_runs = history.run_count()
+    history.close()
+
+    def token_details(holder):
+        for tid in holder["token_ids"]:
+            ld = cache.get(str(tid), {"amount": 0, "end": 0})
+            yield {"id": tid, "dolo": round(ld.get("amount", 0), 2), "end": ld.get("end", 0),
+                   "vote_weight": round(vote_weights.get(tid, 0), 4)}
+
+    # Per-token details are built while the records stream to disk, not kept per holder
     output = {
         "contract": VEDOLO_CONTRACT,
         "network": "berachain",
+        "block": snap.block,
         "timestamp": datetime.utcnow().isoformat(),
+        "history_runs": history_runs,
         "stats": stats,
-        "holders": holders,
+        "holders": (dict(h, token_details=token_details(h)) for h in holders),
     }
 
-    with open(OUTPUT_JSON, "w") as f:
-        json.dump(output, f, indent=2)
+    json_size = write_json(OUTPUT_JSON, output)
 
     with open(OUTPUT_CSV, "w", newline="") as f:
         writer = csv.writer(f)
@@ -474,15 +776,22 @@ def main():
                 ";".join(str(t) for t in h["token_ids"])
             ])
 
-    print(f"\n💾 Saved: vedolo_holders.json + .csv")
+    print(f"\n💾 Saved: vedolo_holders.json ({json_size / 1024:,.0f} KB) + .csv")
     print(f"   Locked DOLO: {total_locked_dolo:,.2f}")
     print(f"   Vote Weight: {total_vote_weight:,.2f}")
     print(f"   Holders: {len(holders):,}")
 
+    if run_id is None:
+        print(f"   History: block {snap.block:,} already recorded")
+    else:
+        print(f"   History: run #{run_id} appended ({changed:,} holder changes)")
+
     print(f"\n🏆 TOP 5:")
     for h in holders[:5]:
         print(f"   #{h['rank']:<4} {h['address'][:12]}… {h['nft_count']:>4} NFT  {h['total_dolo']:>14,.2f} DOLO  {h.get('total_vote_weight',0):>12,.2f} veDOLO")
 
+    snap.complete()
+    store.close()
     print("\n✅ Update complete!")
 
     # Auto-generate dolo_price.json for GitHub Pages (no CORS proxy needed)
@@ -494,13 +803,13 @@ def update_dolo_price():
     print("\n💰 Updating dolo_price.json...")
     price_file = os.path.join(DATA_DIR, "dolo_price.json")
     try:
-        cg = requests.get(
+        cg = http_session().get(
             "https://api.coingecko.com/api/v3/simple/price"
             "?ids=dolomite&vs_currencies=usd"
             "&include_market_cap=true&include_24hr_vol=true&include_24hr_change=true",
             timeout=15
         ).json()
-        coins = requests.get(
+        coins = http_session().get(
             "https://api.coingecko.com/api/v3/coins/dolomite"
             "?localization=false&tickers=false&community_data=false&developer_data=false",
             timeout=15
@@ -526,4 +835,4 @@ def update_dolo_price():
 
 
 if __name__ == "__main__":
-    main()
+    main(full_resync="--full" in sys.argv)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Local index of oDOLO Vester exercise transactions.
+
+vester_index.json keeps every successful closePositionAndBuyTokens tx on the
+Vester contract (compact fields only) plus a last-block checkpoint. Each sync
+fetches only the Vester txlist from the checkpoint onwards; the checkpoint
+block itself is re-fetched and deduplicated against the tx hashes already
+seen in it (`boundary`).
+
+All oDOLO scripts read exercise_txs(). Within one run_jobs process the
+index is synced once and shared (datasets.shared).
+
+exercise_amounts() gives the USDC.e paid and oDOLO burned per exercise.
+By default ("logs" source) it pulls every USDC.e Transfer to the Vester and
+every oDOLO Transfer from the Vester to 0x0 over the exercises' block range
+with a few paged getLogs queries and joins them to the txs by hash. Txs the
+logs miss (or every tx, with EXERCISE_SOURCE=receipts) are decoded from
+their receipts instead. Both paths take the FIRST matching transfer of a
+tx, by log index (USDC.e to the Vester, oDOLO from the Vester to 0x0) —
+the rule exercised_usd.json has always been built with — so they agree
+with each other whatever order the logs arrive in.
+
+lock_durations() reads the lock end from the exercise calldata. Amounts and
+durations are decoded a whole batch at once (abi_decode.py).
+
+Usage:
+    python3 vester_index.py          # sync the index
+    python3 vester_index.py --full   # rebuild from block 0
+"""
+
+import json
+import os
+import sys
+
+from abi_decode import columns, uints
+from datasets import shared
+from etherscan_client import routescan, row_block
+from receipt_store import get_receipts
+
+VESTER_CONTRACT = "0x3E9b9A16743551DA49b5e136C716bBa7932d2cEc"
+EXERCISE_METHOD_ID = "0xa88f8139"  # closePositionAndBuyTokens
+USDC_E_CONTRACT = "0x549943e04f40284185054145c6e4e9568c1d3241"
+ODOLO_CONTRACT = "0x02e513b5b54ee216bf836ceb471507488fc89543"
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+USDC_DECIMALS = 6
+ODOLO_DECIMALS = 18
+EXERCISE_SOURCE = os.environ.get("EXERCISE_SOURCE", "logs")  # "logs" or "receipts"
+RECEIPT_WORKERS = 8  # concurrent receipt requests for the receipt path
+PAGE_SIZE = 100
+TX_FIELDS = ("blockNumber", "timeStamp", "hash", "from", "input")
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_FILE = os.path.join(DATA_DIR, "vester_index.json")
+
+
+def is_exercise(tx):
+    return (tx.get("methodId") == EXERCISE_METHOD_ID
+            and tx.get("isError") == "0"
+            and tx.get("txreceipt_status") == "1")
+
+
+def load_index():
+    """Load the persisted index. Returns None if missing or corrupt."""
+    if not os.path.exists(INDEX_FILE):
+        return None
+    try:
+        with open(INDEX_FILE) as f:
+            index = json.load(f)
+        index["last_block"] = int(index["last_block"])
+        if not isinstance(index["txs"], list) or not isinstance(index["boundary"], list):
+            raise ValueError("txs/boundary is not a list")
+        if any(int(tx["blockNumber"]) > index["last_block"] for tx in index["txs"]):
+            raise ValueError("tx past the checkpoint")
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"  ⚠️ Vester index corrupt ({e}) — doing a full rebuild")
+        return None
+    return index
+
+
+def save_index(index):
+    tmp = INDEX_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(tmp, INDEX_FILE)
+
+
+def sync(full_resync=False):
+    """Bring the index up to the explorer's head and return it."""
+    index = None if full_resync else load_index()
+    if index is None:
+        index = {"last_block": 0, "boundary": [], "txs": []}
+        print("  📚 Vester index: full rebuild from block 0")
+    else:
+        print(f"  📚 Vester index: {len(index['txs']):,} exercises up to block {index['last_block']:,}")
+
+    last_block, boundary = index["last_block"], set(index["boundary"])
+    new_txs, fetched = [], 0
+    for _, txs in routescan().paginate_blocks(index["last_block"], page_size=PAGE_SIZE, key=lambda tx: tx["hash"],
+                                              seen=boundary, module="account", action="txlist",
+                                              address=VESTER_CONTRACT):
+        fetched += len(txs)
+        for tx in txs:
+            block = int(tx["blockNumber"])
+            if block > last_block:
+                last_block, boundary = block, set()
+            boundary.add(tx["hash"])
+            if is_exercise(tx):
+                new_txs.append({k: tx.get(k, "") for k in TX_FIELDS})
+
+    if fetched:
+        index = {"last_block": last_block, "boundary": sorted(boundary), "txs": index["txs"] + new_txs}
+        save_index(index)
+    print(f"  ✅ Vester index: {fetched:,} new txs, {len(new_txs):,} new exercises "
+          f"({len(index['txs']):,} total, block {index['last_block']:,})")
+    return index
+
+
+def _topic(address):
+    return "0x" + address[2:].lower().rjust(64, "0")
+
+
+def _amounts(datas, decimals):
+    """Transfer values of a batch of log data fields (None for empty data)."""
+    return [None if len(data) <= 2 else value / 10 ** decimals
+            for data, value in zip(datas, uints(datas))]
+
+
+def _first(entry, slot, value):
+    """Keep the first transfer seen for entry[slot]; callers go in log order."""
+    if entry[slot] is None:
+        entry[slot] = value
+
+
+def lock_durations(txs):
+    """Lock duration in seconds per exercise tx (lock_end, the third
+    closePositionAndBuyTokens argument, minus the tx time); None when the
+    input is short or the duration is outside (0, 3 years]."""
+    cols = columns([tx["input"] for tx in txs], [None, None, ("lock_end", "uint256"), None], skip=4)
+    out = []
+    for tx, lock_end, valid in zip(txs, cols["lock_end"], cols["valid"]):
+        duration = lock_end - int(tx["timeStamp"]) if valid else 0
+        out.append(duration if 0 < duration <= 3 * 365 * 86400 else None)  # sanity: max 3 years
+    return out
+
+
+def decode_exercise_receipts(receipts):
+    """{tx_hash: (USDC.e paid to the Vester, oDOLO burned by the Vester)} for
+    {tx_hash: receipt}, None where absent; of several matching transfers in
+    one tx the first (receipt log order) counts. The burned oDOLO equals the
+    veDOLO received (1:1). The Transfer logs of all receipts are decoded in
+    one batch."""
+    transfers = [(tx_hash, log) for tx_hash, receipt in receipts.items() if receipt
+                 for log in receipt.get("logs", [])
+                 if len(log.get("topics", [])) >= 3 and log["topics"][0] == TRANSFER_TOPIC]
+    cols = columns([log["topics"][1][2:] + log["topics"][2][2:] for _, log in transfers],
+                   [("from", "address"), ("to", "address")])
+    datas = [log.get("data", "0x") for _, log in transfers]
+    usdc_values, odolo_values = _amounts(datas, USDC_DECIMALS), _amounts(datas, ODOLO_DECIMALS)
+
+    out = {tx_hash: [None, None] for tx_hash in receipts}
+    vester, zero = VESTER_CONTRACT.lower(), ZERO_ADDRESS
+    for i, (tx_hash, log) in enumerate(transfers):
+        token, from_addr, to_addr = log["address"].lower(), cols["from"][i], cols["to"][i]
+        if token == USDC_E_CONTRACT and to_addr == vester:
+            _first(out[tx_hash], 0, usdc_values[i])
+        elif token == ODOLO_CONTRACT and from_addr == vester and to_addr == zero:
+            _first(out[tx_hash], 1, odolo_values[i])
+    return {tx_hash: tuple(amounts) for tx_hash, amounts in out.items()}
+
+
+def transfer_amounts(from_block, to_block):
+    """{tx_hash: [usdc_paid, odolo_burned]} from the USDC.e -> Vester and
+    oDOLO Vester -> 0x0 Transfer logs in [from_block, to_block]; the first
+    transfer of a tx by log index counts, like decode_exercise_receipts()."""
+    amounts = {}
+    queries = [
+        (0, USDC_DECIMALS, dict(address=USDC_E_CONTRACT, topic0=TRANSFER_TOPIC,
+                                topic0_2_opr="and", topic2=_topic(VESTER_CONTRACT))),
+        (1, ODOLO_DECIMALS, dict(address=ODOLO_CONTRACT, topic0=TRANSFER_TOPIC,
+                                 topic0_1_opr="and", topic1=_topic(VESTER_CONTRACT),
+                                 topic1_2_opr="and", topic2=_topic(ZERO_ADDRESS))),
+    ]
+    for slot, decimals, filters in queries:
+        logs = [log for _, page in routescan().paginate_logs(from_block, to_block, **filters)
+                for log in page if from_block <= row_block(log) <= to_block]
+        logs.sort(key=lambda log: (row_block(log), int(log["logIndex"][2:] or "0", 16)))  # Etherscan sends "0x" for 0
+        for log, value in zip(logs, _amounts([log.get("data", "0x") for log in logs], decimals)):
+            _first(amounts.setdefault(log["transactionHash"].lower(), [None, None]), slot, value)
+    return amounts
+
+
+def exercise_amounts(txs, source=None):
+    """{tx_hash (lower-case): (usdc_paid, odolo_burned)} for exercise txs.
+
+    Joins range-scanned Transfer logs by tx hash; txs without a USDC.e
+    payment log fall back to their (stored) receipts.
+    """
+    source = source or EXERCISE_SOURCE
+    hashes = [tx["hash"].lower() for tx in txs]
+    amounts = {}
+    if source == "logs" and txs:
+        blocks = [int(tx["blockNumber"]) for tx in txs]
+        logged = transfer_amounts(min(blocks), max(blocks))
+        amounts = {h: tuple(logged[h]) for h in hashes if h in logged and logged[h][0] is not None}
+        print(f"  🔎 Transfer logs matched {len(amounts):,}/{len(hashes):,} exercises")
+
+    missing = [h for h in hashes if h not in amounts]
+    if missing:
+        print(f"  🧾 Decoding {len(missing):,} exercises from receipts")
+        receipts = get_receipts(missing, workers=RECEIPT_WORKERS)
+        amounts.update(decode_exercise_receipts({h: receipts[h] for h in missing}))
+    return amounts
+
+
+def with_retries(index, new_txs, unresolved):
+    """new_txs plus the indexed exercises whose hashes are in `unresolved`
+    (amounts an earlier run could not resolve, see unresolved_exercises()),
+    in index order."""
+    pending = {tx["hash"] for tx in new_txs} | set(unresolved)
+    return [tx for tx in index["txs"] if tx["hash"] in pending]
+
+
+def unresolved_exercises(txs, amounts):
+    """Sorted hashes of the txs without a USDC.e amount in `amounts`. Callers
+    persist them next to their checkpoint and pass them to with_retries() on
+    the next run, so a failed fetch is not lost once the checkpoint moves on."""
+    return sorted(tx["hash"] for tx in txs if amounts.get(tx["hash"].lower(), (None, None))[0] is None)
+
+
+def load():
+    """The synced index, shared by every oDOLO job of this process."""
+    return shared("vester_index", sync)
+
+
+def exercise_txs():
+    """All successful exercise txs, oldest first."""
+    return load()["txs"]
+
+
+if __name__ == "__main__":
+    sync(full_resync="--full" in sys.argv)
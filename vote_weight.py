@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Local veDOLO vote-weight engine.
+
+A veNFT's voting power is a deterministic function of its lock:
+    weight(t) = amount / MAXTIME * max(end - t, 0)
+(slope = amount / MAXTIME, bias decays linearly to 0 at `end`), so it can be
+evaluated for every token from the locked() data we already cache instead of
+calling balanceOfNFT() per token. verify_vote_weights() (or sample_tokens() +
+compare_vote_weights() when the checks are streamed) spot-checks a random
+sample against the chain and reports the drift.
+"""
+
+import random
+
+import numpy as np
+
+MAXTIME = 2 * 365 * 86400  # 2-year max lock (veDOLO iMAXTIME)
+
+
+def compute_vote_weights(token_ids, locks, timestamp):
+    """Evaluate the ve decay curve for all tokens in one vectorized pass.
+
+    `locks` maps str(token_id) -> {"amount": DOLO, "end": unix_ts} (the
+    CacheStore.get_locks() format). Returns {token_id: vote_weight}.
+    """
+    token_ids = list(token_ids)
+    amounts = np.fromiter((locks.get(str(tid), {}).get("amount", 0) for tid in token_ids),
+                          dtype=np.float64, count=len(token_ids))
+    ends = np.fromiter((locks.get(str(tid), {}).get("end", 0) for tid in token_ids),
+                       dtype=np.float64, count=len(token_ids))
+
+    remaining = np.maximum(ends - timestamp, 0)
+    weights = np.where(amounts > 0, amounts / MAXTIME * remaining, 0.0)
+    return dict(zip(token_ids, weights.tolist()))
+
+
+def sample_tokens(token_ids, sample_size=200, seed=None):
+    """Random subset of token_ids to spot-check on-chain."""
+    population = list(token_ids)
+    return random.Random(seed).sample(population, min(sample_size, len(population)))
+
+
+def compare_vote_weights(vote_weights, onchain, sample, tolerance=0.001):
+    """Drift report for `sample` given on-chain weights {token_id: weight}.
+
+    A token counts as drifted when |local - chain| exceeds `tolerance`
+    relative to the chain value (or 1e-6 veDOLO absolute for near-zero
+    weights). Sampled tokens missing from `onchain` are not checked.
+    """
+    drifted = []
+    max_rel = 0.0
+    for tid in sample:
+        if tid not in onchain:
+            continue
+        local, chain = vote_weights[tid], onchain[tid]
+        diff = abs(local - chain)
+        rel = diff / chain if chain > 0 else (0.0 if diff < 1e-6 else float("inf"))
+        max_rel = max(max_rel, rel)
+        if rel > tolerance:
+            drifted.append({"id": tid, "local": local, "onchain": chain})
+
+    return {
+        "sampled": len(sample),
+        "checked": sum(1 for tid in sample if tid in onchain),
+        "drifted": drifted,
+        "max_rel_drift": max_rel,
+    }
+
+
+def verify_vote_weights(vote_weights, fetch_onchain, sample_size=200, tolerance=0.001, seed=None):
+    """Compare a random sample of local weights against on-chain balanceOfNFT.
+
+    `fetch_onchain(token_ids)` must return {token_id: weight}.
+    """
+    sample = sample_tokens(vote_weights, sample_size, seed)
+    onchain = fetch_onchain(sample) if sample else {}
+    return compare_vote_weights(vote_weights, onchain, sample, tolerance)